@@ -0,0 +1,246 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import partitions
+from .caching import invalidate_users
+from .filters import history_params, parse_account
+from .models import AccountTransaction, Transaction, UserTransaction
+from .partitions import DATE_FIELD, month_start, next_month
+
+# Archived models, with the columns whose values are listed next to each
+# month's file so readers can skip months without rows for them.
+ARCHIVED = {
+    Transaction: ("sender_id", "receiver_id"),
+    AccountTransaction: ("account_id",),
+    UserTransaction: ("user_id",),
+}
+# Lookups naming the users whose cached reads include a model's rows.
+OWNERS = {
+    Transaction: ("sender__user_id", "receiver__user_id"),
+    AccountTransaction: ("account__user_id",),
+    UserTransaction: ("user_id",),
+}
+DELETE_BATCH_SIZE = 1000
+
+
+def cutoff(now):
+    """Start of the oldest month that stays in the database."""
+    start = month_start(now)
+    for _ in range(settings.ARCHIVE["HOT_MONTHS"]):
+        start = month_start(start - timedelta(days=1))
+    return start
+
+
+def _directory(model):
+    return Path(settings.ARCHIVE["DIR"]) / model._meta.db_table
+
+
+def _paths(model, start):
+    directory, month = _directory(model), f"{start:%Y-%m}"
+    return directory / f"{month}.ndjson.gz", directory / f"{month}.keys.json"
+
+
+def archived_months(model):
+    """Month starts that have an archive file, oldest first."""
+    directory = _directory(model)
+    if not directory.is_dir():
+        return []
+    return sorted(
+        datetime.strptime(path.name[:7], "%Y-%m").replace(tzinfo=timezone.utc)
+        for path in directory.glob("*.ndjson.gz")
+    )
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _dumps(row):
+    return json.dumps(row, default=_encode, separators=(",", ":"))
+
+
+def _lines(path):
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _write_aside(path, write):
+    """Write and sync a temporary file beside ``path``; returns its path.
+
+    Renaming it over ``path`` afterwards means readers never see a partial
+    file.
+    """
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    return temporary
+
+
+def write_month(model, start, rows):
+    """Write ``rows`` (``.values()`` dicts) as the archive of ``start``'s month.
+
+    Rows already archived for the month are kept unless ``rows`` has the
+    same id, so a month can be archived again after late rows or an
+    interrupted run. Returns the ids written from ``rows``.
+    """
+    data_path, keys_path = _paths(model, start)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    key_fields = ARCHIVED[model]
+    keys = {field: set() for field in key_fields}
+    ids = []
+
+    def write(f):
+        with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as out:
+            for row in rows:
+                out.write(_dumps(row).encode() + b"\n")
+                ids.append(row["id"])
+                for field in key_fields:
+                    keys[field].add(_encode(row[field]))
+            if data_path.exists():
+                written = {str(id) for id in ids}
+                for row in _lines(data_path):
+                    if row["id"] not in written:
+                        out.write(_dumps(row).encode() + b"\n")
+                        for field in key_fields:
+                            keys[field].add(row[field])
+
+    data = _write_aside(data_path, write)
+    listed = {field: sorted(values) for field, values in keys.items()}
+    # Keys first: they only ever grow, so a reader pairing new keys with the
+    # old data file may open a file for nothing but never skips rows.
+    listing = _write_aside(keys_path, lambda f: f.write(json.dumps(listed).encode()))
+    os.replace(listing, keys_path)
+    os.replace(data, data_path)
+    return ids
+
+
+def archive_month(model, start):
+    """Move one month of ``model`` rows from the database to its archive file.
+
+    Runs in one transaction; on PostgreSQL the month's partition is locked
+    against writes, and dropped once its rows are on disk. Rows are
+    otherwise deleted by id, so a row written meanwhile is never lost.
+    Neither path sends signals, so the cache versions of the rows' owners
+    are bumped here. Returns the number of rows archived.
+    """
+    table = model._meta.db_table
+    end = next_month(start)
+    with transaction.atomic():
+        partitions.lock_partition(table, start)
+        month = model.objects.filter(
+            **{f"{DATE_FIELD}__gte": start, f"{DATE_FIELD}__lt": end}
+        )
+        owners = {
+            user_id
+            for lookup in OWNERS[model]
+            for user_id in month.values_list(lookup, flat=True).distinct()
+        }
+        rows = month.order_by(DATE_FIELD, "id").values()
+        ids = write_month(model, start, rows.iterator())
+        partitions.drop_partition(table, start)
+        # Rows outside a monthly partition (SQLite, the default partition).
+        # Raw SQL: the ORM would cascade to ledger entries.
+        field = model._meta.pk
+        with connection.cursor() as cursor:
+            for i in range(0, len(ids), DELETE_BATCH_SIZE):
+                batch = [
+                    field.get_db_prep_value(id, connection)
+                    for id in ids[i : i + DELETE_BATCH_SIZE]
+                ]
+                cursor.execute(
+                    f"DELETE FROM {connection.ops.quote_name(table)} "
+                    f"WHERE {connection.ops.quote_name(field.column)} IN "
+                    f"({', '.join(['%s'] * len(batch))})",
+                    batch,
+                )
+        invalidate_users(*owners)
+    return len(ids)
+
+
+def _may_contain(model, start, match):
+    _, keys_path = _paths(model, start)
+    try:
+        with open(keys_path) as f:
+            keys = json.load(f)
+    except FileNotFoundError:
+        return True
+    return all(
+        values & set(keys[field]) for field, values in match.items() if field in keys
+    )
+
+
+def _values(values):
+    return values if isinstance(values, (set, frozenset, list, tuple)) else [values]
+
+
+def read(model, match, since=None, until=None, descending=False, after=None):
+    """Yield archived ``model`` rows in ``(timestamp, id)`` order.
+
+    ``match`` maps column names (``sender_id``, ``transaction_type``...) to
+    a value or a set of values rows must have; ``after`` is a
+    ``(timestamp, id)`` keyset position to continue from. Rows are dicts
+    shaped like ``.values()`` output. Months outside the requested range or
+    without the matched keys are not opened; a month is read whole, so
+    memory is bounded by the rows one month holds for the match.
+    """
+    if after is not None:
+        if descending:
+            until = min(until, after[0]) if until else after[0]
+        else:
+            since = max(since, after[0]) if since else after[0]
+    match = {
+        field: {_encode(value) for value in _values(values)}
+        for field, values in match.items()
+    }
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    months = archived_months(model)
+    if descending:
+        months.reverse()
+    for start in months:
+        if (since and next_month(start) <= since) or (until and start > until):
+            continue
+        if not _may_contain(model, start, match):
+            continue
+        rows = []
+        for raw in _lines(_paths(model, start)[0]):
+            if any(raw.get(field) not in values for field, values in match.items()):
+                continue
+            row = {name: fields[name].to_python(value) for name, value in raw.items()}
+            moment = row[DATE_FIELD]
+            if (since and moment < since) or (until and moment > until):
+                continue
+            if after is not None:
+                position = (moment, row["id"])
+                if position >= after if descending else position <= after:
+                    continue
+            rows.append(row)
+        rows.sort(key=lambda row: (row[DATE_FIELD], row["id"]), reverse=descending)
+        yield from rows
+
+
+def read_history(
+    model,
+    params,
+    match,
+    type_field=None,
+    account_field=None,
+    descending=False,
+    after=None,
+):
+    """Archived counterpart of filters.filter_history() for ``model``."""
+    filters = history_params(params)
+    match = dict(match)
+    if filters["type"] and type_field:
+        match[type_field] = filters["type"]
+    if filters["account"] and account_field:
+        match[account_field] = parse_account(filters["account"])
+    return read(model, match, filters["since"], filters["until"], descending, after)
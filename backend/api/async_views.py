@@ -0,0 +1,229 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import events, holdings
+from .authentication import CachedJWTAuthentication
+from .caching import acached_response
+from .filters import filter_history
+from .models import Account, Loan, UserTransaction
+from .pagination import ArchiveKeysetPagination, KeysetPagination
+from .prices import get_price_service
+from .renderers import ORJSONRenderer
+from .serializers import (
+    AccountSerializer,
+    LoanSerializer,
+    UserTransactionSerializer,
+    ValuesSerializer,
+)
+
+
+class AsyncAPIView(View):
+    """Minimal async JSON view with non-blocking JWT authentication.
+
+    Access token validation is pure CPU work and the user comes from the
+    cache or the async ORM, so a request never holds a worker thread while
+    it waits on the database. Every request must be authenticated, and the
+    DRF throttles run as they do for the sync views; ``throttle_view``
+    shares the sync twin's budget. Handlers return ``(data, status)``.
+    """
+
+    renderer = ORJSONRenderer()
+    authenticator = CachedJWTAuthentication()
+
+    async def authenticate(self, request):
+        header = self.authenticator.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.authenticator.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return await self.authenticator.aget_user(await self.validate(raw_token))
+
+    async def validate(self, raw_token):
+        """Validate a raw token against every class in AUTH_TOKEN_CLASSES."""
+        try:
+            return AccessToken(raw_token)
+        except TokenError:
+            # Sliding tokens consult the blacklist, which may hit the database.
+            return await sync_to_async(self.authenticator.get_validated_token)(
+                raw_token
+            )
+
+    async def check_throttles(self, request):
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            # The bucket store may be Redis; never on the event loop.
+            allow = sync_to_async(throttle.allow_request, thread_sensitive=False)
+            allowed = await allow(request, self)
+            if not allowed:
+                raise Throttled(throttle.wait())
+
+    def render(self, data, code):
+        return HttpResponse(
+            self.renderer.render(data),
+            status=code,
+            content_type="application/json",
+        )
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            try:
+                user = await self.authenticate(request)
+            except TokenError as e:
+                raise InvalidToken(str(e))
+            if user is None:
+                return self.render(
+                    {"detail": "Authentication credentials were not provided."},
+                    status.HTTP_401_UNAUTHORIZED,
+                )
+            request.user = user
+            await self.check_throttles(request)
+            response = await super().dispatch(request, *args, **kwargs)
+            if isinstance(response, tuple):
+                response = self.render(*response)
+            return response
+        except APIException as e:
+            response = self.render({"detail": e.detail}, e.status_code)
+            if getattr(e, "wait", None):
+                response["Retry-After"] = "%d" % e.wait
+            return response
+
+
+class AsyncListView(AsyncAPIView):
+    serializer_class = None
+    pagination_class = KeysetPagination
+    keyset_ordering = KeysetPagination.ordering
+
+    def get_queryset(self, request):
+        raise NotImplementedError
+
+    async def list(self, request):
+        serializer = ValuesSerializer.for_serializer(self.serializer_class)
+        paginator = self.pagination_class()
+        queryset = paginator.get_page_queryset(
+            serializer.values(self.get_queryset(request)), request, self
+        )
+        rows = [row async for row in queryset]
+        if paginator.is_short(rows):
+            rows = await sync_to_async(paginator.fill)(rows, self)
+        rows = paginator.build_page(rows)
+        data = serializer.to_representation(rows)
+        return paginator.get_paginated_data(data), status.HTTP_200_OK
+
+    @acached_response()
+    async def get(self, request):
+        return await self.list(request)
+
+
+class AsyncUserAccountListView(AsyncListView):
+    throttle_scope = "history"
+    throttle_view = "UserAccountListView"
+    serializer_class = AccountSerializer
+    keyset_ordering = ("-created_at", "-id")
+
+    def get_queryset(self, request):
+        return filter_history(
+            Account.objects.filter(user=request.user),
+            request.GET,
+            date_field="created_at",
+            type_field="account_type",
+        )
+
+
+class AsyncUserTransactionView(AsyncListView):
+    throttle_scope = "history"
+    throttle_view = "UserTransactionView"
+    serializer_class = UserTransactionSerializer
+    pagination_class = ArchiveKeysetPagination
+    history_filters = {"type_field": "transaction_type"}
+
+    def get_queryset(self, request):
+        return filter_history(
+            UserTransaction.objects.filter(user=request.user),
+            request.GET,
+            **self.history_filters,
+        )
+
+    def get_archive_match(self):
+        return {"user_id": self.request.user.pk}
+
+    async def get(self, request):
+        return await self.list(request)
+
+
+class AsyncPortfolioView(AsyncAPIView):
+    throttle_scope = "history"
+    throttle_view = "PortfolioView"
+
+    @acached_response(timeout=settings.MARKET_DATA.get("TTL", 15))
+    async def get(self, request):
+        portfolio = [
+            position async for position in holdings.portfolio_queryset(request.user)
+        ]
+        prices = await sync_to_async(get_price_service().quotes)(
+            [position["stock_symbol"] for position in portfolio], strict=False
+        )
+        holdings.value_positions(portfolio, prices)
+        return portfolio, status.HTTP_200_OK
+
+
+class AsyncLoanView(AsyncAPIView):
+    throttle_scope = "history"
+    throttle_view = "LoanView"
+
+    @acached_response()
+    async def get(self, request):
+        account_id = request.GET.get("account_id")
+        if not account_id:
+            return {"error": "Account ID is required."}, status.HTTP_400_BAD_REQUEST
+        loans = [
+            loan
+            async for loan in Loan.objects.filter(
+                account_id=account_id, account__user=request.user
+            )
+        ]
+        return LoanSerializer(loans, many=True).data, status.HTTP_200_OK
+
+
+class EventStreamView(AsyncAPIView):
+    """Server-sent events for the signed-in user (``text/event-stream``).
+
+    EventSource cannot set headers, so the access token may also be passed
+    as ``?token=``. Each event is one ``data:`` line of JSON with a
+    ``type``; a comment every ``HEARTBEAT`` seconds keeps proxies from
+    closing an idle stream. Serve it with an ASGI server: under WSGI each
+    open stream would hold a worker.
+    """
+
+    async def authenticate(self, request):
+        user = await super().authenticate(request)
+        raw_token = request.GET.get("token")
+        if user is None and raw_token:
+            user = await self.authenticator.aget_user(await self.validate(raw_token))
+        return user
+
+    async def get(self, request):
+        response = StreamingHttpResponse(
+            self.stream(str(request.user.pk)), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, channel):
+        config = settings.EVENTS
+        subscription = await events.get_broker().subscribe(channel)
+        try:
+            yield f"retry: {config.get('RETRY_MS', 3000)}\n\n"
+            while True:
+                message = await subscription.get(config.get("HEARTBEAT", 15))
+                yield f"data: {message}\n\n" if message else ": keep-alive\n\n"
+        finally:
+            await subscription.close()
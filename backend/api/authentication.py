@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .tokens import revoked_key
+
+User = get_user_model()
+
+
+# Cached per user instead of the whole row, so the password hash never
+# reaches the cache. Kept in model order, which Model.from_db() expects.
+CACHED_FIELDS = [
+    field.attname
+    for field in User._meta.concrete_fields
+    if field.attname in {"id", "email", "name", "is_superuser"}
+]
+
+
+def user_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+def _entry(user):
+    digest = None
+    if api_settings.CHECK_REVOKE_TOKEN:
+        digest = get_md5_hash_password(user.password)
+    return [getattr(user, name) for name in CACHED_FIELDS], digest
+
+
+def _from_entry(entry):
+    """Rebuild a user from a cache entry; other fields load on first access."""
+    values, digest = entry
+    return User.from_db(None, CACHED_FIELDS, values), digest
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with the user lookup and revocation check cached.
+
+    A single ``get_many`` answers both, so an authenticated request costs one
+    cache round trip and no queries while the user entry is warm. Only the
+    fields in CACHED_FIELDS are cached; a view reading any other field of
+    a cached user loads it with a query. Entries are dropped whenever the
+    user row is saved or deleted.
+    """
+
+    def _keys(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        return user_id, revoked_key(validated_token[api_settings.JTI_CLAIM]), user_key(user_id)
+
+    def check_user(self, user, digest, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != digest:
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+
+    def _check_revoked(self, found, key):
+        if found.get(key):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+    def get_user(self, validated_token):
+        user_id, revoked, key = self._keys(validated_token)
+        found = cache.get_many([revoked, key])
+        self._check_revoked(found, revoked)
+        if key in found:
+            user, digest = _from_entry(found[key])
+        else:
+            try:
+                user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            entry = _entry(user)
+            digest = entry[1]
+            cache.set(key, entry, settings.AUTH_CACHE["USER_TTL"])
+        self.check_user(user, digest, validated_token)
+        return user
+
+    async def aget_user(self, validated_token):
+        user_id, revoked, key = self._keys(validated_token)
+        found = await cache.aget_many([revoked, key])
+        self._check_revoked(found, revoked)
+        if key in found:
+            user, digest = _from_entry(found[key])
+        else:
+            try:
+                user = await User.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            entry = _entry(user)
+            digest = entry[1]
+            await cache.aset(key, entry, settings.AUTH_CACHE["USER_TTL"])
+        self.check_user(user, digest, validated_token)
+        return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    cache.delete(user_key(instance.pk))
@@ -0,0 +1,164 @@
+import functools
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .routers import auser_pinned, pin_users, use_primary, user_pinned
+
+RESPONSE_TIMEOUT = 300
+
+
+def _version_key(user_id):
+    return f"user-version:{user_id}"
+
+
+def _seed():
+    # A version that starts from the clock is larger than any the key held
+    # before it was evicted, so responses cached under an old version are
+    # never served again.
+    return time.time_ns()
+
+
+def user_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        seed = _seed()
+        cache.add(key, seed, None)
+        version = cache.get(key, seed)
+    return version
+
+
+def invalidate_users(*user_ids):
+    """Bump the cache version of each user once the transaction commits.
+
+    Cached responses are keyed by version, so bumping it makes every cached
+    read model for that user unreachable without having to find the keys.
+    The users are also pinned to the primary database while the replica
+    catches up, so their next read does not cache stale data.
+    """
+
+    def bump():
+        pin_users(*set(user_ids))
+        for user_id in set(user_ids):
+            try:
+                cache.incr(_version_key(user_id))
+            except ValueError:
+                cache.set(_version_key(user_id), _seed(), None)
+
+    transaction.on_commit(bump)
+
+
+def make_etag(data):
+    payload = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    return '"%s"' % hashlib.md5(payload, usedforsecurity=False).hexdigest()
+
+
+def _not_modified(request, etag):
+    return etag in (
+        tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")
+    )
+
+
+def response_cache_key(view, request, user_id, version):
+    path_hash = hashlib.md5(
+        request.get_full_path().encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"response:{type(view).__name__}:{user_id}:{version}:{path_hash}"
+
+
+def cached_response(timeout=RESPONSE_TIMEOUT):
+    """Cache a GET handler's data per user and answer ``If-None-Match``.
+
+    Entries are keyed by view, user, the user's cache version and the full
+    request path, so writes that call invalidate_users() expire them.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            user_id = request.user.pk
+            if user_id is None:
+                return method(self, request, *args, **kwargs)
+
+            key = response_cache_key(self, request, user_id, user_version(user_id))
+            cached = cache.get(key)
+            if cached is None:
+                token = use_primary.set(use_primary.get() or user_pinned(user_id))
+                try:
+                    response = method(self, request, *args, **kwargs)
+                finally:
+                    use_primary.reset(token)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cached = (response.data, make_etag(response.data))
+                cache.set(key, cached, timeout)
+
+            data, etag = cached
+            if _not_modified(request, etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(data, status=status.HTTP_200_OK)
+            response["ETag"] = etag
+            patch_vary_headers(response, ["Authorization"])
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+async def auser_version(user_id):
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        seed = _seed()
+        await cache.aadd(key, seed, None)
+        version = await cache.aget(key, seed)
+    return version
+
+
+def acached_response(timeout=RESPONSE_TIMEOUT):
+    """Async counterpart of cached_response() for views returning JsonResponse-like data.
+
+    The wrapped handler returns ``(data, status)``; the wrapper renders it.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, request, *args, **kwargs):
+            user_id = request.user.pk
+            key = response_cache_key(self, request, user_id, await auser_version(user_id))
+            cached = await cache.aget(key)
+            if cached is None:
+                pinned = use_primary.get() or await auser_pinned(user_id)
+                token = use_primary.set(pinned)
+                try:
+                    data, code = await method(self, request, *args, **kwargs)
+                finally:
+                    use_primary.reset(token)
+                if code != status.HTTP_200_OK:
+                    return self.render(data, code)
+                cached = (data, make_etag(data))
+                await cache.aset(key, cached, timeout)
+
+            data, etag = cached
+            if _not_modified(request, etag):
+                response = HttpResponseNotModified()
+            else:
+                response = self.render(data, status.HTTP_200_OK)
+            response["ETag"] = etag
+            patch_vary_headers(response, ["Authorization"])
+            return response
+
+        return wrapper
+
+    return decorator
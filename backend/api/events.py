@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# Sent in place of a backlog a slow subscriber could not keep up with; the
+# client should refetch whatever it displays.
+RESYNC = json.dumps({"type": "resync"})
+
+
+class Broker:
+    """Delivers messages published on a channel to its current subscribers.
+
+    Messages are JSON strings and channels are user ids. Delivery is
+    best-effort: a client that was disconnected catches up by refetching.
+    """
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    async def subscribe(self, channel):
+        """Return a subscription with ``async get(timeout)`` and ``async close()``."""
+        raise NotImplementedError
+
+
+class LocalSubscription:
+    def __init__(self, broker, channel, size):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(size)
+
+    def deliver(self, message):
+        # Runs on the subscriber's loop.
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout):
+        """Next message, or None if nothing arrives within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker(Broker):
+    """In-process pub/sub over asyncio queues.
+
+    Publishing is thread-safe and never blocks the publisher: each message
+    is handed to the subscriber's own event loop. A subscriber that falls
+    ``queue_size`` messages behind gets a single resync message instead of
+    its backlog. Only clients connected to this process are reached, which
+    suits one ASGI worker, development and tests.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def publish(self, channel, message):
+        with self.lock:
+            targets = list(self.subscriptions.get(channel, ()))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # The subscriber's loop has closed; it is unsubscribing.
+                pass
+
+    async def subscribe(self, channel):
+        subscription = LocalSubscription(self, channel, self.queue_size)
+        with self.lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscriptions.get(subscription.channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscriptions.pop(subscription.channel, None)
+
+
+class RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=timeout
+        )
+        return message["data"].decode() if message else None
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisBroker(Broker):
+    """Pub/sub through Redis, so a client on any worker gets every event."""
+
+    def __init__(self, url, prefix="events:"):
+        import redis
+
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, message)
+
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.prefix + channel)
+        return RedisSubscription(client, pubsub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = settings.EVENTS
+            _broker = import_string(config["BROKER"])(**config.get("OPTIONS", {}))
+        return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == "EVENTS":
+        _broker = None
+
+
+def publish(user_id, kind, **data):
+    """Send a ``kind`` event to ``user_id`` once the current transaction commits.
+
+    Nothing is sent for a transaction that rolls back. A broker failure is
+    logged rather than raised, as the data is already committed.
+    """
+    message = json.dumps({"type": kind, **data}, default=str)
+    channel = str(user_id)
+    transaction.on_commit(lambda: get_broker().publish(channel, message), robust=True)
@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def parse_boundary(value, param, end_of_day=False):
+    """Accept either an ISO date or datetime and return an aware datetime."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError
+            moment = datetime.combine(day, time.max if end_of_day else time.min)
+    except ValueError:
+        raise ValidationError({param: "Must be an ISO 8601 date or datetime."})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_account(value):
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise ValidationError({"account": "Must be a valid account ID."})
+
+
+def history_params(params):
+    """Parse the ``since``/``until``/``type``/``account`` list filters.
+
+    Absent filters are None. ``account`` is left as given; callers that
+    filter on it pass it through parse_account().
+    """
+    since = params.get("since")
+    until = params.get("until")
+    return {
+        "since": parse_boundary(since, "since") if since else None,
+        "until": parse_boundary(until, "until", end_of_day=True) if until else None,
+        "type": params.get("type") or None,
+        "account": params.get("account") or None,
+    }
+
+
+def filter_history(queryset, params, date_field="timestamp", type_field=None, account_field=None):
+    """Apply the ``since``/``until``/``type``/``account`` list filters."""
+    filters = history_params(params)
+    if filters["since"]:
+        queryset = queryset.filter(**{f"{date_field}__gte": filters["since"]})
+    if filters["until"]:
+        queryset = queryset.filter(**{f"{date_field}__lte": filters["until"]})
+    if filters["type"] and type_field:
+        queryset = queryset.filter(**{type_field: filters["type"]})
+    if filters["account"] and account_field:
+        queryset = queryset.filter(**{account_field: parse_account(filters["account"])})
+    return queryset
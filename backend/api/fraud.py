@@ -0,0 +1,276 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import outbox
+from .fx import get_fx_service
+from .ledger import from_minor, to_minor
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+EVALUATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+# One transfer as the rules see it; ``amount`` is in the sender's
+# ``currency``.
+Transfer = namedtuple(
+    "Transfer",
+    "transaction_id sender_id receiver_id sender_user receiver_user amount currency",
+)
+
+
+def _in_base(transfer):
+    """The transfer's amount in settings.FX["BASE"], the currency of limits."""
+    base = settings.FX["BASE"]
+    if transfer.currency == base:
+        return transfer.amount
+    rates = get_fx_service().current()
+    return rates.convert(transfer.amount, transfer.currency, base)
+
+
+def _ring(slots):
+    return [[-1, 0, 0] for _ in range(slots)]
+
+
+def _add(ring, slot, amount_minor):
+    """Count one event in ``slot``; returns the window's (count, amount).
+
+    The window is a ring of time slots holding ``[slot number, count,
+    amount]``. A cell still holding an older slot number is stale and is
+    reset when its position comes round again, so the state stays a fixed
+    size however many events a key sees.
+    """
+    cell = ring[slot % len(ring)]
+    if cell[0] != slot:
+        cell[:] = [slot, 0, 0]
+    cell[1] += 1
+    cell[2] += amount_minor
+    oldest = slot - len(ring)
+    live = [cell for cell in ring if cell[0] > oldest]
+    return sum(cell[1] for cell in live), sum(cell[2] for cell in live)
+
+
+class Rule:
+    """A check run on every transfer against state kept in the cache.
+
+    ``keys()`` names the cache entries a transfer needs; ``apply()`` updates
+    them in ``state`` and returns a dict describing a hit, or None. Entries
+    are written back with ``timeout``.
+    """
+
+    def __init__(self, name, window):
+        self.name = name
+        self.window = window
+        self.timeout = window
+
+    def keys(self, transfer):
+        raise NotImplementedError
+
+    def apply(self, transfer, state, now):
+        raise NotImplementedError
+
+
+class SenderVelocity(Rule):
+    """Flag a sender making more than ``max_count`` transfers or moving more
+    than ``max_amount`` within ``window`` seconds. Amounts are converted to
+    the FX base currency, which ``max_amount`` is quoted in.
+    """
+
+    def __init__(self, name, window, max_count=None, max_amount=None, slots=12):
+        super().__init__(name, window)
+        self.max_count = max_count
+        self.max_minor = to_minor(Decimal(max_amount)) if max_amount else None
+        self.slots = slots
+        self.width = window / slots
+
+    def keys(self, transfer):
+        return [f"fraud:{self.name}:{transfer.sender_id}"]
+
+    def apply(self, transfer, state, now):
+        key = f"fraud:{self.name}:{transfer.sender_id}"
+        ring = state.get(key) or _ring(self.slots)
+        state[key] = ring
+        amount_minor = to_minor(_in_base(transfer))
+        count, total = _add(ring, int(now // self.width), amount_minor)
+        if (self.max_count and count > self.max_count) or (
+            self.max_minor and total > self.max_minor
+        ):
+            return {"count": count, "amount": str(from_minor(total))}
+        return None
+
+
+class NewReceiverBurst(Rule):
+    """Flag a sender paying more than ``limit`` receivers it has not paid
+    recently within ``window`` seconds.
+
+    The last ``memory`` receivers of each sender are remembered for
+    ``remember`` seconds. Transfers between one user's own accounts are
+    ignored.
+    """
+
+    def __init__(
+        self, name, window, limit, memory=100, remember=30 * 24 * 3600, slots=12
+    ):
+        super().__init__(name, window)
+        self.limit = limit
+        self.memory = memory
+        self.timeout = remember
+        self.slots = slots
+        self.width = window / slots
+
+    def keys(self, transfer):
+        return [f"fraud:{self.name}:{transfer.sender_id}"]
+
+    def apply(self, transfer, state, now):
+        if transfer.sender_user == transfer.receiver_user:
+            return None
+        key = f"fraud:{self.name}:{transfer.sender_id}"
+        seen, ring = state.get(key) or ([], _ring(self.slots))
+        state[key] = (seen, ring)
+        receiver_id = str(transfer.receiver_id)
+        if receiver_id in seen:
+            seen.remove(receiver_id)
+            seen.append(receiver_id)
+            return None
+        seen.append(receiver_id)
+        del seen[: -self.memory]
+        count, _ = _add(ring, int(now // self.width), 0)
+        if count > self.limit:
+            return {"new_receivers": count}
+        return None
+
+
+class RoundTrip(Rule):
+    """Flag money sent back to an account that paid the sender within
+    ``window`` seconds. Transfers between one user's own accounts are
+    ignored.
+    """
+
+    def keys(self, transfer):
+        return [
+            f"fraud:{self.name}:{transfer.sender_id}:{transfer.receiver_id}",
+            f"fraud:{self.name}:{transfer.receiver_id}:{transfer.sender_id}",
+        ]
+
+    def apply(self, transfer, state, now):
+        if transfer.sender_user == transfer.receiver_user:
+            return None
+        forward, back = self.keys(transfer)
+        state[forward] = now
+        paid_at = state.get(back)
+        if paid_at is not None and now - paid_at <= self.window:
+            return {"returned_after": round(now - paid_at, 3)}
+        return None
+
+
+class RuleEngine:
+    """Runs every rule over a set of transfers with one cache read and write.
+
+    The updated state is written once the caller's transaction commits, so
+    rolled-back transfers never count. Callers hold the row locks of the
+    accounts involved, but those are released just before the write; a
+    transfer of the same sender landing in that gap can overwrite it and
+    lose one count, which the rules tolerate. Hits are queued as one
+    FRAUD_ALERT outbox event in the same transaction and written by the
+    outbox drain; the transfer itself is never blocked. A cache failure, or
+    a missing exchange rate, skips evaluation rather than failing the
+    transfer.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def evaluate(self, transfers):
+        if not self.rules or not transfers:
+            return []
+        started = time.perf_counter()
+        try:
+            hits, writes = self._evaluate(transfers, time.time())
+        except Exception:
+            logger.warning("Fraud rules skipped.", exc_info=True)
+            return []
+        registry.observe(
+            "fraud_evaluation_seconds",
+            (("call", "batch" if len(transfers) > 1 else "single"),),
+            time.perf_counter() - started,
+            EVALUATION_BUCKETS,
+        )
+        transaction.on_commit(lambda: self._store(writes), robust=True)
+        if hits:
+            for hit in hits:
+                registry.inc("fraud_alerts_total", (("rule", hit["rule"]),))
+            outbox.publish("FRAUD_ALERT", {"alerts": hits})
+        return hits
+
+    def _store(self, writes):
+        for timeout, values in writes.items():
+            cache.set_many(values, timeout)
+
+    def _evaluate(self, transfers, now):
+        timeouts = {}
+        for transfer in transfers:
+            for rule in self.rules:
+                for key in rule.keys(transfer):
+                    timeouts[key] = max(timeouts.get(key, 0), rule.timeout)
+        state = cache.get_many(list(timeouts))
+        hits = []
+        for transfer in transfers:
+            for rule in self.rules:
+                detail = rule.apply(transfer, state, now)
+                if detail is not None:
+                    hits.append(
+                        {
+                            "rule": rule.name,
+                            "transaction_id": str(transfer.transaction_id),
+                            "sender_id": str(transfer.sender_id),
+                            "receiver_id": str(transfer.receiver_id),
+                            "amount": str(transfer.amount),
+                            "currency": transfer.currency,
+                            "details": detail,
+                        }
+                    )
+        writes = {}
+        for key, timeout in timeouts.items():
+            if key in state:
+                writes.setdefault(timeout, {})[key] = state[key]
+        return hits, writes
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            config = settings.FRAUD
+            rules = []
+            if config["ENABLED"]:
+                rules = [
+                    import_string(rule["CLASS"])(**rule.get("OPTIONS", {}))
+                    for rule in config["RULES"]
+                ]
+            _engine = RuleEngine(rules)
+        return _engine
+
+
+@receiver(setting_changed)
+def reset_engine(setting, **kwargs):
+    global _engine
+    if setting == "FRAUD":
+        _engine = None
+
+
+def evaluate(transfers):
+    """Run the configured rules over ``transfers``; returns the hits."""
+    return get_engine().evaluate(transfers)
@@ -0,0 +1,180 @@
+import csv
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import OuterRef, Subquery
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .ledger import quantize
+from .models import Account, FxRate
+
+
+class FxError(Exception):
+    status_code = 400
+
+
+class RateFeed:
+    """Source of exchange rates, as units of each currency per one base unit."""
+
+    def fetch(self):
+        """Return ``{currency: Decimal}``; the base currency maps to 1."""
+        raise NotImplementedError
+
+
+class CSVRateFeed(RateFeed):
+    """Read ``currency,rate`` rows from a local file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self):
+        with open(self.path, newline="") as f:
+            return {
+                row["currency"].strip().upper(): Decimal(row["rate"])
+                for row in csv.DictReader(f)
+            }
+
+
+def load_rates(feed, as_of=None):
+    """Store one set of rates from ``feed``; returns the rows written."""
+    as_of = as_of or timezone.now()
+    known = {code for code, _ in Account.CURRENCIES}
+    rates = feed.fetch()
+    unknown = set(rates) - known
+    if unknown:
+        raise FxError(f"Unknown currency in feed: {', '.join(sorted(unknown))}")
+    if any(rate <= 0 for rate in rates.values()):
+        raise FxError("Exchange rates must be positive")
+    base = settings.FX["BASE"]
+    if rates.get(base) != 1:
+        raise FxError(f"The feed must quote {base} at 1")
+    rows = FxRate.objects.bulk_create(
+        FxRate(currency=currency, rate=rate, as_of=as_of)
+        for currency, rate in sorted(rates.items())
+    )
+    get_fx_service().invalidate()
+    return rows
+
+
+class RateTable:
+    """An immutable snapshot of the latest rates.
+
+    ``matrix[i, j]`` converts one unit of ``currencies[i]`` into
+    ``currencies[j]``. Rates are stored against a single base, so the
+    matrix is consistent: converting through a third currency gives the
+    same result as converting directly.
+    """
+
+    def __init__(self, rates, as_of=None):
+        self.rates = rates
+        self.as_of = as_of
+        self.currencies = tuple(sorted(rates))
+        self.index = {currency: i for i, currency in enumerate(self.currencies)}
+        per_base = np.array([float(rates[c]) for c in self.currencies])
+        self.matrix = per_base[np.newaxis, :] / per_base[:, np.newaxis]
+
+    def _check(self, *currencies):
+        missing = sorted({c for c in currencies if c not in self.index})
+        if missing:
+            raise FxError(f"No exchange rate for {', '.join(missing)}")
+
+    def rate(self, source, target):
+        """Exact Decimal rate for one unit of ``source`` in ``target``."""
+        if source == target:
+            return Decimal(1)
+        self._check(source, target)
+        return self.rates[target] / self.rates[source]
+
+    def convert(self, amount, source, target):
+        """Convert a Decimal amount, rounded half up to ``target``'s unit."""
+        if source == target:
+            return amount
+        return quantize(amount * self.rate(source, target), target)
+
+    def total(self, currencies, amounts, target):
+        """Sum ``amounts`` (aligned with ``currencies``) in ``target``.
+
+        One vectorized pass: a column of the matrix is gathered for every
+        row, multiplied and summed. Meant for totals and displays; money
+        movements go through :meth:`convert`.
+        """
+        if all(currency == target for currency in currencies):
+            return sum(amounts, Decimal("0.00"))
+        self._check(target, *currencies)
+        rows = np.fromiter((self.index[c] for c in currencies), dtype=np.intp)
+        values = np.asarray(amounts, dtype=np.float64)
+        total = float(values @ self.matrix[rows, self.index[target]])
+        return quantize(Decimal(repr(total)), target)
+
+
+def latest_rates():
+    newest = FxRate.objects.filter(currency=OuterRef("currency")).order_by("-as_of")
+    rows = FxRate.objects.filter(as_of=Subquery(newest.values("as_of")[:1]))
+    rates = {}
+    as_of = None
+    for currency, rate, stamp in rows.values_list("currency", "rate", "as_of"):
+        rates[currency] = rate
+        as_of = stamp if as_of is None else min(as_of, stamp)
+    return RateTable(rates, as_of)
+
+
+class FxService:
+    """Hands out the current RateTable, reloading it every ``ttl`` seconds.
+
+    A reload builds a complete new table and then swaps the reference, so
+    readers always see one consistent set of rates. Only one thread
+    reloads; the others keep using the previous table meanwhile.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.table = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+
+    def current(self):
+        table = self.table
+        if table is not None and time.monotonic() < self.expires_at:
+            return table
+        if not self.lock.acquire(blocking=table is None):
+            return table
+        try:
+            if self.table is None or time.monotonic() >= self.expires_at:
+                self.table = latest_rates()
+                self.expires_at = time.monotonic() + self.ttl
+            return self.table
+        finally:
+            self.lock.release()
+
+    def invalidate(self):
+        self.expires_at = 0
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_fx_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = FxService(ttl=settings.FX.get("TTL", 300))
+        return _service
+
+
+def get_feed():
+    config = settings.FX
+    return import_string(config["FEED"])(**config.get("OPTIONS", {}))
+
+
+@receiver(setting_changed)
+def reset_fx_service(setting, **kwargs):
+    global _service
+    if setting == "FX":
+        _service = None
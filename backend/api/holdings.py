@@ -0,0 +1,177 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .ledger import quantize
+from .models import Account, Holding, Purchase
+
+
+class HoldingError(Exception):
+    pass
+
+
+def buy(user, account, symbol, quantity, price, total):
+    """Add shares to a holding; must run inside the caller's transaction.
+
+    The position is bumped with a single F() update and only created when
+    missing, so concurrent buys of the same symbol neither duplicate the
+    row nor lose quantity.
+    """
+    position = Holding.objects.filter(user=user, account=account, stock_symbol=symbol)
+    changes = {
+        "quantity": F("quantity") + quantity,
+        "cost_basis": F("cost_basis") + total,
+        "updated_at": timezone.now(),
+    }
+    if not position.update(**changes):
+        try:
+            with transaction.atomic():
+                Holding.objects.create(
+                    user=user,
+                    account=account,
+                    stock_symbol=symbol,
+                    quantity=quantity,
+                    cost_basis=total,
+                )
+        except IntegrityError:
+            position.update(**changes)
+
+    Purchase.objects.create(
+        user=user,
+        account=account,
+        stock_symbol=symbol,
+        side="BUY",
+        quantity=quantity,
+        price=price,
+    )
+
+
+def sell(user, account, symbol, quantity, price, total):
+    """Remove shares at average cost and book the realized P&L."""
+    try:
+        holding = Holding.objects.select_for_update().get(
+            user=user, account=account, stock_symbol=symbol
+        )
+    except Holding.DoesNotExist:
+        raise HoldingError("You do not own any shares of this stock.")
+    if holding.quantity == 0:
+        raise HoldingError("You do not own any shares of this stock.")
+    if holding.quantity < quantity:
+        raise HoldingError("Not enough shares to sell.")
+
+    released = quantize(holding.cost_basis * quantity / holding.quantity)
+    Holding.objects.filter(pk=holding.pk).update(
+        quantity=F("quantity") - quantity,
+        cost_basis=F("cost_basis") - released,
+        realized_pnl=F("realized_pnl") + (total - released),
+        updated_at=timezone.now(),
+    )
+
+    Purchase.objects.create(
+        user=user,
+        account=account,
+        stock_symbol=symbol,
+        side="SELL",
+        quantity=quantity,
+        price=price,
+    )
+
+
+def backfill():
+    """Fold purchases recorded before holdings existed into Holding rows.
+
+    Those rows have no account and hold a user's whole net position per
+    symbol; they move to the user's oldest investment account, which the
+    old buy endpoint required. Their cost is unknown, so the cost basis
+    starts at zero. Each row is tagged with the account once counted, so
+    running this again only picks up rows it has not seen. Returns the
+    number of positions folded in and of users skipped for having no
+    investment account.
+    """
+    legacy = Purchase.objects.filter(account__isnull=True)
+    totals = (
+        legacy.values_list("user_id", "stock_symbol")
+        .annotate(total=Sum("quantity"))
+        .order_by("user_id", "stock_symbol")
+    )
+    accounts = {}
+    for user_id, account_id in (
+        Account.objects.filter(
+            user_id__in=legacy.values("user_id"), account_type="INVESTMENT"
+        )
+        .order_by("created_at", "id")
+        .values_list("user_id", "id")
+    ):
+        accounts.setdefault(user_id, account_id)
+
+    folded, skipped = 0, set()
+    with transaction.atomic():
+        for user_id, symbol, total in totals:
+            account_id = accounts.get(user_id)
+            if account_id is None:
+                skipped.add(user_id)
+                continue
+            if total:
+                position = Holding.objects.filter(
+                    user_id=user_id, account_id=account_id, stock_symbol=symbol
+                )
+                if not position.update(quantity=F("quantity") + total):
+                    Holding.objects.create(
+                        user_id=user_id,
+                        account_id=account_id,
+                        stock_symbol=symbol,
+                        quantity=total,
+                    )
+                folded += 1
+            legacy.filter(user_id=user_id, stock_symbol=symbol).update(
+                account_id=account_id
+            )
+    return folded, len(skipped)
+
+
+def portfolio_queryset(user):
+    return (
+        Holding.objects.filter(user=user, quantity__gt=0)
+        .values("stock_symbol")
+        .annotate(
+            total_quantity=Sum("quantity"),
+            cost_basis=Sum("cost_basis"),
+            realized_pnl=Sum("realized_pnl"),
+        )
+        .order_by("stock_symbol")
+    )
+
+
+def positions_from(holdings):
+    """Fold Holding rows already in memory into portfolio_queryset() rows."""
+    positions = {}
+    for holding in holdings:
+        position = positions.setdefault(
+            holding.stock_symbol,
+            {
+                "stock_symbol": holding.stock_symbol,
+                "total_quantity": 0,
+                "cost_basis": Decimal("0.00"),
+                "realized_pnl": Decimal("0.00"),
+            },
+        )
+        position["total_quantity"] += holding.quantity
+        position["cost_basis"] += holding.cost_basis
+        position["realized_pnl"] += holding.realized_pnl
+    return [positions[symbol] for symbol in sorted(positions)]
+
+
+def value_positions(positions, prices):
+    """Annotate portfolio rows in place with price, market value and P&L."""
+    for position in positions:
+        price = prices.get(position["stock_symbol"])
+        position["price"] = price
+        position["market_value"] = None
+        position["unrealized_pnl"] = None
+        if price is not None:
+            market_value = quantize(price * position["total_quantity"])
+            position["market_value"] = market_value
+            position["unrealized_pnl"] = market_value - position["cost_basis"]
+    return positions
@@ -0,0 +1,136 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+PURGE_BATCH_SIZE = 5000
+
+
+def _cache_key(owner, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{owner}:{digest}"
+
+
+def _fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.get_full_path().encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _remember(cache_key, record):
+    stored = (record.fingerprint, record.status_code, record.response)
+    cache.set(cache_key, stored, settings.IDEMPOTENCY_KEY_TTL)
+    return stored
+
+
+def _find(owner, key):
+    return IdempotencyKey.objects.filter(owner=owner, key=key).first()
+
+
+def _replay(fingerprint, stored_fingerprint, status_code, data):
+    if fingerprint != stored_fingerprint:
+        return Response(
+            {"error": f"{HEADER} was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(data, status=status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(method):
+    """Run a POST handler at most once per ``Idempotency-Key`` header.
+
+    The key is inserted in the same transaction as the handler's writes, so
+    either both commit or neither does. Duplicates are answered from the
+    cache or, failing that, from a single unique-index lookup. Only 2xx
+    responses are stored; anything else rolls back the key along with the
+    handler's writes, so the client can fix the request and retry. Keys are
+    scoped to the user, so anonymous requests carrying one are refused.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"error": f"{HEADER} must be at most 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": f"{HEADER} requires an authenticated request."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        owner = str(request.user.pk)
+        fingerprint = _fingerprint(request)
+        cache_key = _cache_key(owner, key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _replay(fingerprint, *cached)
+        record = _find(owner, key)
+        if record is not None:
+            return _replay(fingerprint, *_remember(cache_key, record))
+
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        owner=owner, key=key, fingerprint=fingerprint
+                    )
+            except IntegrityError:
+                record = None
+
+            if record is not None:
+                response = method(self, request, *args, **kwargs)
+                if not status.is_success(response.status_code):
+                    transaction.set_rollback(True)
+                    return response
+                record.status_code = response.status_code
+                record.response = json.loads(
+                    json.dumps(response.data, cls=JSONEncoder)
+                )
+                record.save(update_fields=["status_code", "response"])
+                stored = (fingerprint, record.status_code, record.response)
+                transaction.on_commit(
+                    lambda: cache.set(cache_key, stored, settings.IDEMPOTENCY_KEY_TTL)
+                )
+                return response
+
+            # A concurrent request with this key committed first (or the
+            # lookup above hit a lagging replica); read it from the primary.
+            record = IdempotencyKey.objects.get(owner=owner, key=key)
+
+        return _replay(fingerprint, *_remember(cache_key, record))
+
+    return wrapper
+
+
+def purge(batch_size=PURGE_BATCH_SIZE):
+    """Delete one batch of expired keys; returns how many were removed."""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    ids = list(
+        IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list(
+            "id", flat=True
+        )[:batch_size]
+    )
+    if not ids:
+        return 0
+    return IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,193 @@
+import uuid
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Account, BalanceCheckpoint, LedgerEntry
+
+MINOR_UNITS = 100
+CENT = Decimal("0.01")
+# Decimal places of currencies whose smallest unit is not a hundredth.
+# Amounts are rounded to their own currency's unit; the ledger still
+# counts hundredths for every currency.
+CURRENCY_PLACES = {"JPY": 0}
+# Entries younger than this are left for the next checkpoint so that rows
+# from transactions still in flight cannot slip below the high-water mark.
+# A transaction that commits more than this after taking its ledger ids
+# would still slip below it: its entries are then missing from every later
+# checkpoint, which only ``audit_ledger --full`` reveals.
+CHECKPOINT_LAG = timedelta(minutes=1)
+
+
+def parse_decimal(value, label="Amount"):
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"{label} must be a number")
+    if not number.is_finite():
+        raise ValueError(f"{label} must be a number")
+    return number
+
+
+def parse_amount(value):
+    """Parse a client supplied amount into a Decimal with at most two places."""
+    amount = parse_decimal(value)
+    if amount != amount.quantize(CENT):
+        raise ValueError("Amount must have at most two decimal places")
+    return amount.quantize(CENT)
+
+
+def currency_unit(currency):
+    """Smallest amount of ``currency``; a cent when it is not given."""
+    return Decimal(1).scaleb(-CURRENCY_PLACES.get(currency, 2))
+
+
+def quantize(amount, currency=None):
+    return Decimal(amount).quantize(currency_unit(currency), rounding=ROUND_HALF_UP)
+
+
+def to_minor(amount):
+    return int(quantize(amount) * MINOR_UNITS)
+
+
+def from_minor(amount_minor):
+    return (Decimal(amount_minor) / MINOR_UNITS).quantize(CENT)
+
+
+def build_entries(legs, transaction=None, journal=None):
+    """Turn ``(account_id, book, currency, amount)`` legs into ledger rows.
+
+    The legs of one journal must balance to zero, so every movement of
+    customer money has a matching entry on another account or book.
+    """
+    journal = journal or uuid.uuid4()
+    entries = [
+        LedgerEntry(
+            journal=journal,
+            transaction=transaction,
+            account_id=account_id,
+            book=book,
+            currency=currency,
+            amount_minor=to_minor(amount),
+        )
+        for account_id, book, currency, amount in legs
+    ]
+    if sum(entry.amount_minor for entry in entries):
+        raise ValueError("Ledger legs must balance to zero")
+    return entries
+
+
+def append_entries(legs, transaction=None):
+    return LedgerEntry.objects.bulk_create(build_entries(legs, transaction))
+
+
+def debit(account_id, amount):
+    """Conditionally take amount from the balance snapshot; False if short."""
+    return bool(
+        Account.objects.filter(id=account_id, balance__gte=amount).update(
+            balance=F("balance") - amount, updated_at=timezone.now()
+        )
+    )
+
+
+def credit(account_id, amount):
+    return bool(
+        Account.objects.filter(id=account_id).update(
+            balance=F("balance") + amount, updated_at=timezone.now()
+        )
+    )
+
+
+def _last_checkpoints(account_ids=None):
+    checkpoints = BalanceCheckpoint.objects.order_by(
+        "account_id", "-last_entry_id"
+    ).values_list("account_id", "balance_minor", "last_entry_id")
+    if account_ids is not None:
+        checkpoints = checkpoints.filter(account_id__in=account_ids)
+    latest = {}
+    for account_id, balance_minor, last_entry_id in checkpoints.iterator():
+        latest.setdefault(account_id, (balance_minor, last_entry_id))
+    return latest
+
+
+def checkpoint():
+    """Roll every account with new ledger entries forward to a new checkpoint.
+
+    Only entries written since the previous run are summed, so the cost of a
+    run is proportional to recent activity rather than to total history.
+    The mark is a single id across the ledger; see CHECKPOINT_LAG for the
+    limit that implies.
+    """
+    with transaction.atomic():
+        previous_mark = (
+            BalanceCheckpoint.objects.aggregate(mark=Max("last_entry_id"))["mark"] or 0
+        )
+        mark = (
+            LedgerEntry.objects.filter(
+                created_at__lte=timezone.now() - CHECKPOINT_LAG
+            ).aggregate(mark=Max("id"))["mark"]
+            or 0
+        )
+        if mark <= previous_mark:
+            return 0
+
+        deltas = dict(
+            LedgerEntry.objects.filter(
+                id__gt=previous_mark, id__lte=mark, account__isnull=False
+            )
+            .values("account_id")
+            .annotate(delta=Sum("amount_minor"))
+            .values_list("account_id", "delta")
+        )
+        latest = _last_checkpoints(deltas.keys())
+        BalanceCheckpoint.objects.bulk_create(
+            [
+                BalanceCheckpoint(
+                    account_id=account_id,
+                    balance_minor=latest.get(account_id, (0, 0))[0] + delta,
+                    last_entry_id=mark,
+                )
+                for account_id, delta in deltas.items()
+            ],
+            batch_size=1000,
+        )
+        return len(deltas)
+
+
+def recompute(account_ids=None, full=False):
+    """Recompute balances from the ledger and return the accounts that drift.
+
+    By default the sum starts from each account's latest checkpoint; with
+    ``full`` the entire history is replayed, which is only needed for audits.
+    Returns ``{account_id: (snapshot, ledger)}`` for mismatching accounts.
+    """
+    accounts = Account.objects.all()
+    entries = LedgerEntry.objects.filter(account__isnull=False)
+    if account_ids is not None:
+        accounts = accounts.filter(id__in=account_ids)
+        entries = entries.filter(account_id__in=account_ids)
+    latest = {} if full else _last_checkpoints(account_ids)
+    if not full:
+        mark = (
+            BalanceCheckpoint.objects.filter(account_id=OuterRef("account_id"))
+            .order_by("-last_entry_id")
+            .values("last_entry_id")[:1]
+        )
+        entries = entries.filter(id__gt=Coalesce(Subquery(mark), 0))
+    deltas = dict(
+        entries.values("account_id")
+        .annotate(delta=Sum("amount_minor"))
+        .values_list("account_id", "delta")
+    )
+
+    mismatches = {}
+    for account_id, balance in accounts.values_list("id", "balance").iterator():
+        base = latest.get(account_id, (0, 0))[0]
+        ledger_balance = from_minor(base + deltas.get(account_id, 0))
+        if ledger_balance != balance:
+            mismatches[account_id] = (balance, ledger_balance)
+    return mismatches
@@ -0,0 +1,289 @@
+import uuid
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from . import events
+from .caching import invalidate_users
+from .ledger import (
+    CURRENCY_PLACES,
+    MINOR_UNITS,
+    append_entries,
+    credit,
+    currency_unit,
+    debit,
+    from_minor,
+    quantize,
+    to_minor,
+)
+from .models import Loan, LoanInstallment
+
+ACCRUAL_BATCH_SIZE = 1000
+
+
+class LoanError(Exception):
+    status_code = 400
+
+
+class LoanNotFound(LoanError):
+    status_code = 404
+
+
+def amortize(principal, annual_rate, months, currency=None):
+    """Return ``(principal, interest)`` arrays in minor units for each month.
+
+    Uses the closed form for the balance before installment ``k`` of an
+    annuity, so the whole schedule is computed at once instead of walking
+    the months. Every part is a whole number of ``currency``'s smallest
+    unit, and rounding drift is absorbed by the last installment.
+    """
+    step = int(currency_unit(currency) * MINOR_UNITS)
+    amount = to_minor(principal) // step
+    rate = float(annual_rate) / 12
+    k = np.arange(months)
+    if rate:
+        payment = amount * rate / (1 - (1 + rate) ** -months)
+        growth = (1 + rate) ** k
+        balance = amount * growth - payment * (growth - 1) / rate
+        interest = np.rint(balance * rate).astype(np.int64)
+    else:
+        payment = amount / months
+        interest = np.zeros(months, dtype=np.int64)
+    principal_part = np.maximum(int(round(payment)) - interest, 0)
+    principal_part[-1] = amount - principal_part[:-1].sum()
+    return principal_part * step, interest * step
+
+
+def _check_amount(amount, currency):
+    if amount != quantize(amount, currency):
+        raise LoanError(f"Amount has more decimal places than {currency} allows.")
+
+
+def due_dates(start, months):
+    """Same day of month as ``start`` (capped at the 28th) for the next months."""
+    first = np.datetime64(start, "M") + np.arange(1, months + 1)
+    days = first.astype("datetime64[D]") + (min(start.day, 28) - 1)
+    return days.astype(object)
+
+
+def originate(account, amount, months, annual_rate=None):
+    """Create a loan with its full schedule and pay it out to the account."""
+    if annual_rate is None:
+        annual_rate = Decimal(settings.LOANS["ANNUAL_RATE"])
+    _check_amount(amount, account.currency)
+    if quantize(amount, account.currency) < currency_unit(account.currency) * months:
+        raise LoanError("Loan amount is too small for the loan duration.")
+    principal, interest = amortize(amount, annual_rate, months, account.currency)
+    dates = due_dates(timezone.localdate(), months)
+
+    with transaction.atomic():
+        loan = Loan.objects.create(
+            account=account,
+            loan_amount=amount,
+            principal=amount,
+            annual_rate=annual_rate,
+            loan_duration=months,
+        )
+        LoanInstallment.objects.bulk_create(
+            LoanInstallment(
+                loan=loan,
+                number=number,
+                due_date=due_date,
+                principal=from_minor(p),
+                interest=from_minor(i),
+                amount=from_minor(p + i),
+            )
+            for number, (due_date, p, i) in enumerate(
+                zip(dates, principal.tolist(), interest.tolist()), start=1
+            )
+        )
+        credit(account.id, amount)
+        append_entries(
+            [
+                (account.id, "CUSTOMER", account.currency, amount),
+                (None, "LOANS", account.currency, -amount),
+            ]
+        )
+        invalidate_users(account.user_id)
+        events.publish(account.user_id, "balance.changed", accounts=[account.id])
+    return loan
+
+
+def _principal_covered(installment):
+    # Payments settle penalty, then interest, then principal.
+    paid = installment.paid_amount - installment.penalty - installment.interest
+    return min(max(paid, Decimal("0.00")), installment.principal)
+
+
+def pay(loan_id, user, amount):
+    """Debit the account and apply the payment to the oldest installments."""
+    try:
+        loan_id = uuid.UUID(str(loan_id))
+    except ValueError:
+        raise LoanNotFound("Loan not found.")
+
+    with transaction.atomic():
+        try:
+            loan = (
+                Loan.objects.select_for_update()
+                .select_related("account")
+                .get(id=loan_id, account__user=user)
+            )
+        except Loan.DoesNotExist:
+            raise LoanNotFound("Loan not found.")
+        installments = list(
+            loan.installments.select_for_update()
+            .exclude(status="PAID")
+            .order_by("number")
+        )
+        if installments:
+            due = sum(i.amount + i.penalty - i.paid_amount for i in installments)
+        else:
+            # Loans created before schedules existed only track principal.
+            due = loan.loan_amount
+        account = loan.account
+        _check_amount(amount, account.currency)
+        if amount > due:
+            raise LoanError("Payment amount exceeds the remaining loan balance.")
+
+        if not debit(account.id, amount):
+            raise LoanError("Insufficient balance in the account.")
+        append_entries(
+            [
+                (account.id, "CUSTOMER", account.currency, -amount),
+                (None, "LOANS", account.currency, amount),
+            ]
+        )
+
+        remaining = amount
+        principal_paid = Decimal("0.00") if installments else amount
+        changed = []
+        for installment in installments:
+            if not remaining:
+                break
+            owed = installment.amount + installment.penalty - installment.paid_amount
+            applied = min(owed, remaining)
+            covered = _principal_covered(installment)
+            installment.paid_amount += applied
+            principal_paid += _principal_covered(installment) - covered
+            if applied == owed:
+                installment.status = "PAID"
+            remaining -= applied
+            changed.append(installment)
+        LoanInstallment.objects.bulk_update(changed, ["paid_amount", "status"])
+
+        loan.loan_amount -= principal_paid
+        if not loan.installments.exclude(status="PAID").exists() and not loan.loan_amount:
+            loan.status = "PAID"
+        elif loan.installments.filter(status="OVERDUE").exists():
+            loan.status = "OVERDUE"
+        else:
+            loan.status = "ACTIVE"
+        loan.save(update_fields=["loan_amount", "status", "updated_at"])
+        invalidate_users(account.user_id)
+        events.publish(account.user_id, "balance.changed", accounts=[account.id])
+        events.publish(
+            account.user_id,
+            "loan.payment",
+            loan=loan.id,
+            account=account.id,
+            amount=amount,
+            remaining=loan.loan_amount,
+            status=loan.status,
+        )
+    return loan
+
+
+def _in_batches(queryset, batch_size, update):
+    """Apply ``update`` to ``queryset`` one primary-key batch at a time.
+
+    Each batch is one UPDATE in its own transaction, so the job never holds
+    locks on more than ``batch_size`` installments. ``update`` must take
+    rows out of ``queryset``.
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return total
+            batch = LoanInstallment.objects.filter(pk__in=ids)
+            invalidate_users(
+                *batch.values_list("loan__account__user_id", flat=True).distinct()
+            )
+            total += update(batch)
+
+
+def mark_overdue(today, batch_size=ACCRUAL_BATCH_SIZE):
+    pending = LoanInstallment.objects.filter(status="PENDING", due_date__lt=today)
+    return _in_batches(
+        pending,
+        batch_size,
+        lambda batch: batch.filter(status="PENDING").update(
+            status="OVERDUE", accrued_on=F("due_date")
+        ),
+    )
+
+
+def _by_places(queryset):
+    """Split installments by the decimal places of their account's currency."""
+    groups = {}
+    for currency, places in CURRENCY_PLACES.items():
+        groups.setdefault(places, []).append(currency)
+    for places, currencies in groups.items():
+        yield places, queryset.filter(loan__account__currency__in=currencies)
+    yield 2, queryset.exclude(loan__account__currency__in=list(CURRENCY_PLACES))
+
+
+def accrue_penalties(today, batch_size=ACCRUAL_BATCH_SIZE):
+    """Charge penalty interest on overdue installments up to ``today``.
+
+    Installments are grouped by the date they were last accrued to, so
+    each group gets a single constant factor and a plain set-based UPDATE,
+    rounded to the smallest unit of the loan's currency.
+    """
+    daily_rate = Decimal(settings.LOANS["PENALTY_RATE"]) / 365
+    overdue = LoanInstallment.objects.filter(status="OVERDUE", accrued_on__lt=today)
+    total = 0
+    for accrued_on in (
+        overdue.order_by().values_list("accrued_on", flat=True).distinct()
+    ):
+        factor = daily_rate * (today - accrued_on).days
+        for places, group in _by_places(overdue.filter(accrued_on=accrued_on)):
+            total += _in_batches(
+                group,
+                batch_size,
+                lambda batch: batch.filter(accrued_on=accrued_on).update(
+                    penalty=Round(
+                        F("penalty")
+                        + (F("amount") + F("penalty") - F("paid_amount")) * factor,
+                        places,
+                    ),
+                    accrued_on=today,
+                ),
+            )
+    return total
+
+
+def mark_loans_overdue():
+    loans = Loan.objects.filter(status="ACTIVE").filter(
+        Exists(LoanInstallment.objects.filter(loan=OuterRef("pk"), status="OVERDUE"))
+    )
+    with transaction.atomic():
+        invalidate_users(*loans.values_list("account__user_id", flat=True).distinct())
+        return loans.update(status="OVERDUE", updated_at=timezone.now())
+
+
+def accrue(today=None, batch_size=ACCRUAL_BATCH_SIZE):
+    """Mark missed installments overdue and accrue penalties on them."""
+    today = today or timezone.localdate()
+    return {
+        "installments_overdue": mark_overdue(today, batch_size),
+        "installments_accrued": accrue_penalties(today, batch_size),
+        "loans_overdue": mark_loans_overdue(),
+    }
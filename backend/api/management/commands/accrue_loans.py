@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.loans import ACCRUAL_BATCH_SIZE, accrue
+
+
+class Command(BaseCommand):
+    help = "Mark missed loan installments overdue and accrue penalty interest."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=ACCRUAL_BATCH_SIZE)
+        parser.add_argument(
+            "--date",
+            help="Accrue as of this ISO date instead of today.",
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options["date"]:
+            try:
+                today = parse_date(options["date"])
+            except ValueError:
+                today = None
+            if today is None:
+                raise CommandError("--date must be an ISO date (YYYY-MM-DD).")
+        counts = accrue(today, options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Marked {installments_overdue} installment(s) and "
+                "{loans_overdue} loan(s) overdue; accrued penalties on "
+                "{installments_accrued} installment(s).".format(**counts)
+            )
+        )
@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone as django_timezone
+
+from api import archive
+from api.partitions import DATE_FIELD, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Move transfers and history rows from before the last "
+        "ARCHIVE['HOT_MONTHS'] months to gzipped NDJSON files, one per table "
+        "and month. On PostgreSQL the archived monthly partitions are dropped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", help="Archive the months before this one (YYYY-MM).")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="List the months without archiving them."
+        )
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            try:
+                cutoff = datetime.strptime(options["before"], "%Y-%m")
+            except ValueError:
+                raise CommandError("--before must be a month as YYYY-MM.")
+            cutoff = cutoff.replace(tzinfo=timezone.utc)
+        else:
+            cutoff = archive.cutoff(django_timezone.now())
+
+        total = 0
+        for model in archive.ARCHIVED:
+            table = model._meta.db_table
+            months = sorted(
+                {
+                    month_start(moment)
+                    for moment in model.objects.filter(
+                        **{f"{DATE_FIELD}__lt": cutoff}
+                    ).datetimes(DATE_FIELD, "month")
+                }
+            )
+            for start in months:
+                if options["dry_run"]:
+                    self.stdout.write(f"{table} {start:%Y-%m}")
+                    continue
+                count = archive.archive_month(model, start)
+                total += count
+                self.stdout.write(f"{table} {start:%Y-%m}: {count} row(s)")
+        if not options["dry_run"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"Archived {total} row(s) from before {cutoff:%Y-%m}.")
+            )
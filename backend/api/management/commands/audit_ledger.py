@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ledger import recompute
+
+
+class Command(BaseCommand):
+    help = "Compare account balance snapshots against the ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Replay the entire ledger history instead of starting at checkpoints.",
+        )
+        parser.add_argument("accounts", nargs="*", help="Limit the audit to these account IDs.")
+
+    def handle(self, *args, **options):
+        mismatches = recompute(options["accounts"] or None, full=options["full"])
+        for account_id, (snapshot, ledger_balance) in mismatches.items():
+            self.stderr.write(f"{account_id}: snapshot {snapshot} != ledger {ledger_balance}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} account(s) out of balance.")
+        self.stdout.write(self.style.SUCCESS("All balances match the ledger."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.holdings import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        "Build Holding rows from stock purchases made before holdings were "
+        "tracked. Run once after deploying; later runs only pick up rows not "
+        "yet folded in."
+    )
+
+    def handle(self, *args, **options):
+        folded, skipped = backfill()
+        self.stdout.write(self.style.SUCCESS(f"Folded in {folded} position(s)."))
+        if skipped:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Skipped {skipped} user(s) without an investment account."
+                )
+            )
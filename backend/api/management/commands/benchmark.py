@@ -0,0 +1,290 @@
+import json
+import logging
+import platform
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import django
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, router
+from django.db.models import Count, Q
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import loans, urls
+from api.models import Account, Transaction, User
+
+from .seed_data import DOMAIN
+
+
+def _first(actor):
+    return actor["accounts"][0]
+
+
+def _second(actor):
+    return actor["accounts"][1]
+
+
+# (label, url name, method, path kwargs, query string or JSON body).
+# Builders take the acting user and the request number. Every named route
+# in api.urls must appear here; the command refuses to run otherwise.
+ROUTES = [
+    ("users", "user-list", "GET", None, lambda a, i: {}),
+    ("users/accounts", "user-accounts", "GET", None, lambda a, i: {}),
+    ("accounts create", "account-create", "POST", None,
+     lambda a, i: {"account_type": "SAVINGS", "currency": "USD"}),
+    ("accounts/<id>", "account-retrieve", "GET", lambda a: {"id": a["id"]},
+     lambda a, i: {}),
+    ("accounts/<id>/statement", "account-statement", "GET",
+     lambda a: {"id": _first(a)}, lambda a, i: {"output": "ndjson"}),
+    ("account-transactions", "account-transactions", "GET", None, lambda a, i: {}),
+    ("user-transactions", "user-transactions", "GET", None, lambda a, i: {}),
+    ("account-preferences", "accountpreferences", "GET", None, lambda a, i: {}),
+    ("account-preferences create", "accountpreferences", "POST", None,
+     lambda a, i: {"alias": f"benchmark {i}", "receiver": _second(a)}),
+    ("transactions", "transactions", "POST", None,
+     lambda a, i: {"account": _first(a), "receiver": _second(a), "amount": "0.01"}),
+    ("transactions/batch", "transactions-batch", "POST", None,
+     lambda a, i: {"transfers": [
+         {"account": _first(a), "receiver": _second(a), "amount": "0.01"}
+     ] * 10}),
+    ("stocks/buy", "buystocks", "POST", None,
+     lambda a, i: {"symbol": "AAPL", "quantity": 1, "account_id": a["investment"]}),
+    ("stocks/sell", "sellstocks", "POST", None,
+     lambda a, i: {"symbol": "AAPL", "quantity": 1, "account_id": a["investment"]}),
+    ("stocks/portfolio", "portfolio", "GET", None, lambda a, i: {}),
+    ("users/net-worth", "net-worth", "GET", None, lambda a, i: {"currency": "EUR"}),
+    ("dashboard", "dashboard", "GET", None, lambda a, i: {}),
+    ("loans", "loans", "GET", None, lambda a, i: {"account_id": _first(a)}),
+    ("loans create", "loans", "POST", None,
+     lambda a, i: {"loan_amount": "1000", "loan_duration": 12,
+                   "monthly_income": "5000", "account_id": _first(a)}),
+    ("loans/pay", "loan-payment", "POST", None,
+     lambda a, i: {"loan_id": a["loan"], "payment_amount": "1.00"}),
+    ("loans/<id>/installments", "loan-installments", "GET",
+     lambda a: {"id": a["loan"]}, lambda a, i: {}),
+    ("async users/accounts", "async-user-accounts", "GET", None, lambda a, i: {}),
+    ("async user-transactions", "async-user-transactions", "GET", None,
+     lambda a, i: {}),
+    ("async stocks/portfolio", "async-portfolio", "GET", None, lambda a, i: {}),
+    ("async loans", "async-loans", "GET", None,
+     lambda a, i: {"account_id": _first(a)}),
+]
+
+
+# Routes that cannot be timed as request/response: the event stream stays
+# open until the client disconnects.
+UNTIMED = {"events"}
+
+
+def check_coverage():
+    names = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+    missing = names - UNTIMED - {route[1] for route in ROUTES}
+    if missing:
+        raise CommandError(f"No benchmark for route(s): {', '.join(sorted(missing))}")
+
+
+def database_info():
+    """Describe the default database for the results; never the password.
+
+    ``read`` and ``write`` are the aliases the routers pick for a request
+    that is not pinned to the primary.
+    """
+    config = connection.settings_dict
+    connection.ensure_connection()
+    if connection.vendor == "postgresql":
+        version = str(connection.pg_version)
+    else:
+        version = connection.Database.sqlite_version
+    return {
+        "vendor": connection.vendor,
+        "engine": config["ENGINE"],
+        "name": str(config["NAME"]),
+        "host": config.get("HOST") or None,
+        "port": config.get("PORT") or None,
+        "version": version,
+        "conn_max_age": config.get("CONN_MAX_AGE"),
+        "pool": config.get("OPTIONS", {}).get("pool"),
+        "replica": "replica" in connections,
+        "read": router.db_for_read(Account),
+        "write": router.db_for_write(Account),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every api route with concurrent clients against the seed_data "
+        "dataset and report throughput and p50/p95/p99 latency per endpoint. "
+        "The database is the one configured in settings: SQLite by default, "
+        "PostgreSQL with DB_ENGINE=postgresql and the DB_* variables; run the "
+        "command once per database and its settings (without the password) "
+        "are recorded with the results. Routes run one after another in a "
+        "fixed order, and the write routes (account, preference, transfer, "
+        "trade and loan creation, loan payments) change the balances, "
+        "holdings and loans the routes after them read, so results depend on "
+        "that order: compare only runs with the same --only selection, each "
+        "on a freshly seeded dataset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per route.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--actors", type=int, default=20, help="Seeded users to act as.")
+        parser.add_argument("--only", nargs="*", help="Run only these route labels.")
+        parser.add_argument("--output", help="Write results to this JSON file.")
+        parser.add_argument("--baseline", help="Compare with a previous JSON result.")
+        parser.add_argument(
+            "--throttled", action="store_true", help="Keep rate limiting enabled."
+        )
+
+    def handle(self, *args, **options):
+        check_coverage()
+        routes = ROUTES
+        if options["only"]:
+            routes = [route for route in ROUTES if route[0] in options["only"]]
+            unknown = set(options["only"]) - {route[0] for route in routes}
+            if unknown:
+                raise CommandError(f"Unknown route label(s): {', '.join(sorted(unknown))}")
+        # Expected 4xx responses would otherwise log one line each.
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+        actors = self.actors(options["actors"])
+        results = {}
+        with override_settings(THROTTLING_ENABLED=options["throttled"]):
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                for route in routes:
+                    results[route[0]] = self.run(pool, route, actors, options["requests"])
+                    self.report(route[0], results[route[0]])
+
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "database": database_info(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "dataset": {
+                "users": User.objects.count(),
+                "accounts": Account.objects.count(),
+                "transactions": Transaction.objects.count(),
+            },
+            "routes": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+        if options["baseline"]:
+            self.compare(options["baseline"], results)
+
+    def actors(self, count):
+        # Stock trades need an investment account, transfers two accounts.
+        users = list(
+            User.objects.filter(email__endswith=f"@{DOMAIN}")
+            .annotate(
+                n=Count("accounts"),
+                investments=Count(
+                    "accounts", filter=Q(accounts__account_type="INVESTMENT")
+                ),
+            )
+            .filter(n__gte=2, investments__gte=1)
+            .order_by("email")[:count]
+        )
+        if not users:
+            raise CommandError(
+                "No seeded users with an investment account and at least one "
+                "other account; run seed_data first."
+            )
+        accounts = defaultdict(list)
+        for account in Account.objects.filter(user__in=users).order_by("-balance"):
+            accounts[account.user_id].append(account)
+        actors = []
+        for user in users:
+            richest = accounts[user.id][0]
+            loan = richest.loans.first() or loans.originate(richest, Decimal("1000"), 12)
+            actors.append(
+                {
+                    "id": str(user.id),
+                    "accounts": [str(account.id) for account in accounts[user.id]],
+                    "investment": next(
+                        str(account.id)
+                        for account in accounts[user.id]
+                        if account.account_type == "INVESTMENT"
+                    ),
+                    "loan": str(loan.id),
+                    "header": f"Bearer {AccessToken.for_user(user)}",
+                }
+            )
+        return actors
+
+    def run(self, pool, route, actors, total):
+        label, name, method, kwargs, build = route
+        local = threading.local()
+
+        def call(i):
+            actor = actors[i % len(actors)]
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = Client(raise_request_exception=False)
+            path = reverse(name, kwargs=kwargs(actor) if kwargs else None)
+            headers = {"Authorization": actor["header"]}
+            started = time.perf_counter()
+            if method == "GET":
+                response = client.get(path, build(actor, i), headers=headers)
+            else:
+                response = client.post(
+                    path, build(actor, i), content_type="application/json", headers=headers
+                )
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+            body = response.content[:200] if response.status_code >= 400 else b""
+            return elapsed, response.status_code, body
+
+        started = time.perf_counter()
+        outcomes = list(pool.map(call, range(total)))
+        elapsed = time.perf_counter() - started
+        latencies = np.array([latency for latency, _, _ in outcomes]) * 1000
+        statuses = defaultdict(int)
+        sample_error = None
+        for _, code, body in outcomes:
+            statuses[str(code)] += 1
+            if body and sample_error is None:
+                sample_error = body.decode(errors="replace")
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "method": method,
+            "url_name": name,
+            "throughput": round(total / elapsed, 1),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "errors": sum(n for code, n in statuses.items() if int(code) >= 400),
+            "statuses": dict(statuses),
+            "sample_error": sample_error,
+        }
+
+    def report(self, label, result):
+        self.stdout.write(
+            f"{label:<28} {result['throughput']:8.1f} req/s   "
+            f"p50 {result['p50_ms']:7.2f}   p95 {result['p95_ms']:7.2f}   "
+            f"p99 {result['p99_ms']:7.2f} ms   errors {result['errors']}"
+        )
+
+    def compare(self, path, results):
+        with open(path) as f:
+            baseline = json.load(f)["routes"]
+        self.stdout.write(f"\nChange against {path} (p99, throughput):")
+        for label, result in results.items():
+            before = baseline.get(label)
+            if before is None:
+                continue
+            p99 = (result["p99_ms"] - before["p99_ms"]) / before["p99_ms"] * 100
+            rps = (result["throughput"] - before["throughput"]) / before["throughput"] * 100
+            self.stdout.write(f"{label:<28} p99 {p99:+7.1f}%   throughput {rps:+7.1f}%")
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.tokens import AccessToken
+
+# (path, whether both sides answer repeats from the response cache). The
+# uncached endpoint runs its queries on every request, so it shows the
+# cost of the ORM hops the async views make.
+ENDPOINTS = [
+    ("/api/user-transactions/", False),
+    ("/api/users/accounts/", True),
+    ("/api/stocks/portfolio/", True),
+]
+
+
+def sync_only_middleware():
+    """Middleware that would make Django run async views through a thread."""
+    return [
+        path
+        for path in settings.MIDDLEWARE
+        if not getattr(import_string(path), "async_capable", False)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare in-process throughput of the sync (WSGI) read endpoints with "
+        "their async (ASGI) counterparts under /api/async/. Refuses to run "
+        "while a sync-only middleware would put every async request on a "
+        "thread."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Existing user to issue requests as.")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=50)
+
+    # Both sides draw from the same throttle budgets; measure the views.
+    @override_settings(THROTTLING_ENABLED=False)
+    def handle(self, *args, **options):
+        blocking = sync_only_middleware()
+        if blocking:
+            raise CommandError(f"Sync-only middleware: {', '.join(blocking)}")
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=options["email"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+        header = f"Bearer {AccessToken.for_user(user)}"
+        total = options["requests"]
+        concurrency = options["concurrency"]
+
+        for path, cached in ENDPOINTS:
+            sync_rps = self.run_sync(path, header, total, concurrency)
+            async_rps = asyncio.run(
+                self.run_async(path.replace("/api/", "/api/async/"), header, total, concurrency)
+            )
+            self.stdout.write(
+                f"{path:<28} wsgi {sync_rps:8.1f} req/s   asgi {async_rps:8.1f} req/s"
+                f"{'   (cached)' if cached else ''}"
+            )
+
+    def run_sync(self, path, header, total, concurrency):
+        def call(_):
+            return Client(headers={"Authorization": header}).get(path).status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            codes = list(pool.map(call, range(total)))
+        return self.throughput(path, codes, started)
+
+    async def run_async(self, path, header, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call():
+            async with semaphore:
+                return (await client.get(path, headers={"Authorization": header})).status_code
+
+        started = time.perf_counter()
+        codes = await asyncio.gather(*(call() for _ in range(total)))
+        return self.throughput(path, codes, started)
+
+    def throughput(self, path, codes, started):
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for code in codes if code != 200)
+        if failed:
+            raise CommandError(f"{failed} request(s) to {path} did not return 200")
+        return len(codes) / elapsed
@@ -0,0 +1,57 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import CachedJWTAuthentication
+from api.tokens import SlidingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request authentication overhead: token validation alone, "
+        "stock JWTAuthentication (with its User query) and the cached variant."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Existing user to authenticate as.")
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=options["email"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+        total = options["requests"]
+        factory = RequestFactory()
+        access = factory.get("/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        sliding = factory.get("/", HTTP_AUTHORIZATION=f"Bearer {SlidingToken.for_user(user)}")
+        stock = JWTAuthentication()
+        cached = CachedJWTAuthentication()
+
+        def validate(request):
+            stock.get_validated_token(stock.get_raw_token(stock.get_header(request)))
+
+        cases = [
+            ("token validation only", validate, access),
+            ("JWTAuthentication", stock.authenticate, access),
+            ("cached, access token", cached.authenticate, access),
+            ("cached, sliding token", cached.authenticate, sliding),
+        ]
+        for name, run, request in cases:
+            run(request)  # warm caches
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(total):
+                    run(request)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{name:<24} {elapsed / total * 1e6:8.1f} us/request   "
+                f"{len(queries) / total:5.2f} queries/request"
+            )
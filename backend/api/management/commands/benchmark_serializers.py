@@ -0,0 +1,101 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Account, AccountTransaction, User, UserTransaction
+from api.renderers import ORJSONRenderer
+from api.serializers import (
+    AccountSerializer,
+    AccountTransactionSerializer,
+    UserTransactionSerializer,
+    ValuesSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/sec of ModelSerializer + JSONRenderer with the "
+        ".values() + ORJSONRenderer read path on throwaway data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        with transaction.atomic():
+            user = self.seed(rows)
+            endpoints = {
+                "users/accounts": (
+                    Account.objects.filter(user=user),
+                    AccountSerializer,
+                ),
+                "user-transactions": (
+                    UserTransaction.objects.filter(user=user),
+                    UserTransactionSerializer,
+                ),
+                "account-transactions": (
+                    AccountTransaction.objects.filter(account__user=user),
+                    AccountTransactionSerializer,
+                ),
+            }
+            for name, (queryset, serializer_class) in endpoints.items():
+                self.compare(name, queryset, serializer_class, options["repeat"])
+            transaction.set_rollback(True)
+
+    def seed(self, rows):
+        user = User.objects.create_user(
+            "benchmark-serializers@example.invalid", "Benchmark", None
+        )
+        accounts = Account.objects.bulk_create(
+            Account(user=user, balance=100, account_type="CHECKING", currency="USD")
+            for _ in range(rows)
+        )
+        UserTransaction.objects.bulk_create(
+            UserTransaction(
+                user=user, transaction_type="ACCOUNT_CREATION", details=f"row {i}"
+            )
+            for i in range(rows)
+        )
+        AccountTransaction.objects.bulk_create(
+            AccountTransaction(
+                account=account, transaction_type="ACCOUNT_CREATION", details="opened"
+            )
+            for account in accounts
+        )
+        return user
+
+    def compare(self, name, queryset, serializer_class, repeat):
+        values_serializer = ValuesSerializer.for_serializer(serializer_class)
+
+        def model_path():
+            data = serializer_class(list(queryset), many=True).data
+            return JSONRenderer().render(data)
+
+        def values_path():
+            data = values_serializer.to_representation(
+                list(values_serializer.values(queryset))
+            )
+            return ORJSONRenderer().render(data)
+
+        if model_path() != values_path():
+            raise CommandError(f"{name}: the two paths produce different output")
+
+        count = queryset.count()
+        model_rate = count / self.best(model_path, repeat)
+        values_rate = count / self.best(values_path, repeat)
+        self.stdout.write(
+            f"{name:<22} model {model_rate:10.0f} rows/s   "
+            f"values {values_rate:10.0f} rows/s   x{values_rate / model_rate:.1f}"
+        )
+
+    def best(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
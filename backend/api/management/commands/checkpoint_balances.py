@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.ledger import checkpoint
+
+
+class Command(BaseCommand):
+    help = "Roll account balance checkpoints forward over new ledger entries."
+
+    def handle(self, *args, **options):
+        count = checkpoint()
+        self.stdout.write(self.style.SUCCESS(f"Checkpointed {count} account(s)."))
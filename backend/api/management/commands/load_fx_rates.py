@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.fx import CSVRateFeed, FxError, get_feed, load_rates
+
+
+class Command(BaseCommand):
+    help = "Store the current exchange rates from the FX feed (or a CSV file)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help="Read currency,rate rows from this file instead.")
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep loading on a schedule instead of exiting after one set.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=300.0,
+            help="Seconds to sleep between loads with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        feed = CSVRateFeed(options["path"]) if options["path"] else get_feed()
+        while True:
+            try:
+                rows = load_rates(feed)
+            except (FxError, OSError, KeyError, ArithmeticError) as e:
+                raise CommandError(f"Could not load rates: {e}")
+            self.stdout.write(
+                self.style.SUCCESS(f"Loaded {len(rows)} rate(s) as of {rows[0].as_of}.")
+            )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+FLOOD_PATH = "/api/users/"
+
+
+class Command(BaseCommand):
+    help = (
+        "Flood UserListView from one client while timing a protected endpoint, "
+        "with and without throttling, and report the protected p50/p99."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Existing user to issue probe requests as.")
+        parser.add_argument("--path", default="/api/users/accounts/")
+        parser.add_argument("--requests", type=int, default=300)
+        parser.add_argument("--flood-workers", type=int, default=8)
+        parser.add_argument(
+            "--flood-rate", type=float, default=400, help="Flood requests per second."
+        )
+
+    def handle(self, *args, **options):
+        # Every rejected flood request would otherwise log a warning.
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=options["email"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+        self.header = f"Bearer {AccessToken.for_user(user)}"
+        self.path = options["path"]
+        self.total = options["requests"]
+        self.workers = options["flood_workers"]
+        self.interval = self.workers / options["flood_rate"]
+
+        # The probe stands in for a well-behaved client, so its own scope is
+        # left unlimited; only the flood should run into a bucket.
+        rates = {
+            scope: rate
+            for scope, rate in settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"].items()
+            if scope != "history"
+        }
+        throttled = override_settings(
+            THROTTLING_ENABLED=True,
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates},
+        )
+        cases = [
+            ("no flood", None, False),
+            ("flood, unthrottled", override_settings(THROTTLING_ENABLED=False), True),
+            ("flood, throttled", throttled, True),
+        ]
+        for name, overrides, flood in cases:
+            if overrides is None:
+                latencies, codes = self.run(flood)
+            else:
+                with overrides:
+                    latencies, codes = self.run(flood)
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            summary = ", ".join(f"{code}: {count}" for code, count in sorted(codes.items()))
+            self.stdout.write(
+                f"{name:<20} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   "
+                f"flood [{summary or 'none'}]"
+            )
+
+    def run(self, flood):
+        stop = threading.Event()
+        codes = Counter()
+        lock = threading.Lock()
+
+        # Each worker sends at a fixed rate whatever the responses are, as a
+        # real flood would, so cheap rejections don't just mean more requests.
+        def hammer():
+            client = Client()
+            due = time.perf_counter()
+            try:
+                while not stop.is_set():
+                    code = client.get(FLOOD_PATH).status_code
+                    with lock:
+                        codes[code] += 1
+                    due += self.interval
+                    stop.wait(max(0, due - time.perf_counter()))
+            finally:
+                connection.close()
+
+        probe = Client(headers={"Authorization": self.header})
+        probe.get(self.path)  # warm caches
+        latencies = np.empty(self.total)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            if flood:
+                for _ in range(self.workers):
+                    pool.submit(hammer)
+            try:
+                for i in range(self.total):
+                    started = time.perf_counter()
+                    response = probe.get(self.path)
+                    latencies[i] = time.perf_counter() - started
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f"{self.path} returned {response.status_code} under load"
+                        )
+            finally:
+                stop.set()
+        return latencies, codes
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import partitions
+from api.archive import ARCHIVED
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the next months' partitions of the history tables on "
+        "PostgreSQL; run it monthly. --convert first turns unpartitioned "
+        "tables into monthly range partitions on timestamp."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=settings.ARCHIVE["PARTITIONS_AHEAD"],
+            help="Months past the current one to create partitions for.",
+        )
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Rebuild unpartitioned tables; each is locked while it is copied.",
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.supported():
+            raise CommandError("Partitioning needs PostgreSQL (DB_ENGINE=postgresql).")
+        current = partitions.month_start(timezone.now())
+        until = current
+        for _ in range(options["ahead"]):
+            until = partitions.next_month(until)
+
+        for model in ARCHIVED:
+            table = model._meta.db_table
+            if partitions.is_partitioned(table):
+                for start in partitions.months(current, until):
+                    partitions.create_partition(table, start)
+            elif options["convert"]:
+                partitions.partition_table(model, until)
+            else:
+                self.stdout.write(
+                    self.style.WARNING(f"{table} is not partitioned; pass --convert.")
+                )
+                continue
+            self.stdout.write(
+                f"{table}: {len(partitions.partitions(table))} partition(s) "
+                f"through {until:%Y-%m}"
+            )
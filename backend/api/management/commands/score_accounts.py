@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.scoring import SCORING_BATCH_SIZE, run
+
+
+class Command(BaseCommand):
+    help = "Recompute credit scores for accounts with activity since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SCORING_BATCH_SIZE)
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rescore every account instead of only those with new activity.",
+        )
+
+    def handle(self, *args, **options):
+        scoring_run = run(full=options["full"], batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Scored {scoring_run.accounts_scored} account(s).")
+        )
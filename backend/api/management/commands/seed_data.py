@@ -0,0 +1,177 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.ledger import build_entries
+from api.models import (
+    Account,
+    AccountTransaction,
+    LedgerEntry,
+    Transaction,
+    User,
+    UserTransaction,
+)
+
+DOMAIN = "seed.invalid"
+
+
+def seed_email(index):
+    return f"user{index}@{DOMAIN}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a reproducible benchmark dataset of N users, M accounts and K "
+        "transfers (with their ledger entries) using bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--accounts", type=int, default=300)
+        parser.add_argument("--transactions", type=int, default=10000)
+        parser.add_argument("--days", type=int, default=365, help="History to spread transfers over.")
+        parser.add_argument("--currency", default="USD")
+        parser.add_argument("--password", default="benchmark")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete a previously seeded dataset first."
+        )
+
+    def handle(self, *args, **options):
+        n_users, n_accounts = options["users"], options["accounts"]
+        if n_users < 1 or n_accounts < 2:
+            raise CommandError("At least one user and two accounts are required.")
+        seeded = User.objects.filter(email__endswith=f"@{DOMAIN}")
+        if options["clear"]:
+            with transaction.atomic():
+                # Ledger rows are append-only in the app, but a seeded dataset
+                # goes as a whole: every journal touching a seeded account.
+                journals = LedgerEntry.objects.filter(account__user__in=seeded).values("journal")
+                LedgerEntry.objects.filter(journal__in=journals).delete()
+                seeded.delete()
+        elif seeded.exists():
+            raise CommandError("A seeded dataset already exists; pass --clear to replace it.")
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.perf_counter()
+        with transaction.atomic():
+            users = self.seed_users(n_users, options["password"])
+            accounts, balances = self.seed_accounts(users, n_accounts, options["currency"])
+            created = self.seed_transactions(
+                accounts, balances, options["transactions"], options["days"]
+            )
+            for account in accounts:
+                account.balance = balances[account.id]
+            Account.objects.bulk_update(accounts, ["balance"], batch_size=self.batch_size)
+        self.stdout.write(
+            f"Seeded {n_users} users, {n_accounts} accounts and {created} transfers "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
+
+    def seed_users(self, count, password):
+        password = make_password(password)  # hash once, not per user
+        return User.objects.bulk_create(
+            (
+                User(email=seed_email(i), name=f"Seed User {i}", password=password)
+                for i in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def seed_accounts(self, users, count, currency):
+        types = [code for code, _ in Account.ACCOUNT_TYPES]
+        # Deal accounts round-robin so every user gets at least one.
+        accounts = Account.objects.bulk_create(
+            (
+                Account(
+                    user=users[i % len(users)],
+                    account_type=self.rng.choice(types),
+                    currency=currency,
+                    balance=Decimal(self.rng.randint(10_000, 100_000)),
+                )
+                for i in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        balances = {account.id: account.balance for account in accounts}
+        entries = []
+        for account in accounts:
+            entries += build_entries(
+                [
+                    (account.id, "CUSTOMER", currency, account.balance),
+                    (None, "OPENING", currency, -account.balance),
+                ]
+            )
+        LedgerEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+        # The history rows drain_outbox would write for ACCOUNT_CREATED.
+        UserTransaction.objects.bulk_create(
+            (
+                UserTransaction(
+                    user_id=account.user_id,
+                    transaction_type="ACCOUNT_CREATION",
+                    details=f"Created account {account.id} ({account.account_type}, {currency}) with initial balance {account.balance}",
+                )
+                for account in accounts
+            ),
+            batch_size=self.batch_size,
+        )
+        AccountTransaction.objects.bulk_create(
+            (
+                AccountTransaction(
+                    account=account,
+                    transaction_type="ACCOUNT_CREATION",
+                    details=f"Account created for {account.user.email} with balance {account.balance}",
+                )
+                for account in accounts
+            ),
+            batch_size=self.batch_size,
+        )
+        return accounts, balances
+
+    def seed_transactions(self, accounts, balances, count, days):
+        now = timezone.now()
+        span = days * 24 * 60 * 60
+        offsets = sorted((self.rng.uniform(0, span) for _ in range(count)), reverse=True)
+        created = 0
+        for start in range(0, count, self.batch_size):
+            batch = []
+            for offset in offsets[start : start + self.batch_size]:
+                sender, receiver = self.rng.sample(accounts, 2)
+                amount = Decimal(self.rng.randint(100, 10_000)) / 100
+                if balances[sender.id] < amount:
+                    continue
+                balances[sender.id] -= amount
+                balances[receiver.id] += amount
+                batch.append(
+                    Transaction(
+                        sender=sender,
+                        receiver=receiver,
+                        amount=amount,
+                        timestamp=now - timedelta(seconds=offset),
+                        details="seeded transfer",
+                    )
+                )
+            Transaction.objects.bulk_create(batch)
+            entries = []
+            for tx in batch:
+                legs = build_entries(
+                    [
+                        (tx.sender_id, "CUSTOMER", tx.sender.currency, -tx.amount),
+                        (tx.receiver_id, "CUSTOMER", tx.receiver.currency, tx.amount),
+                    ],
+                    transaction=tx,
+                )
+                for entry in legs:
+                    entry.created_at = tx.timestamp
+                entries += legs
+            LedgerEntry.objects.bulk_create(entries)
+            created += len(batch)
+        return created
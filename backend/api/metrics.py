@@ -0,0 +1,261 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+METRICS = {
+    "http_requests_total": ("counter", "Requests by view, method and status."),
+    "http_request_duration_seconds": ("histogram", "End-to-end request latency."),
+    "db_queries_per_request": ("histogram", "SQL queries run per request."),
+    "db_time_seconds": ("histogram", "Time spent in SQL per request."),
+    "serializer_time_seconds": ("histogram", "Time spent serializing and rendering per request."),
+    "n_plus_one_total": ("counter", "Requests repeating one query shape past the threshold."),
+    "fraud_evaluation_seconds": ("histogram", "Time spent running fraud rules per transfer call."),
+    "fraud_alerts_total": ("counter", "Fraud rule hits by rule."),
+}
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels)
+
+
+class Registry:
+    """Counters and histograms for this process, rendered for Prometheus."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, list(h.counts), h.sum, h.count, h.buckets)
+                for key, h in self.histograms.items()
+            )
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, help_text = METRICS[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{{{_labels(labels)}}} {value}")
+        for (name, labels), counts, total, count, buckets in histograms:
+            describe(name)
+            prefix = _labels(labels)
+            cumulative = 0
+            for bound, n in zip((*buckets, "+Inf"), counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{{prefix},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{prefix}}} {total}")
+            lines.append(f"{name}_count{{{prefix}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Per-request tallies; also the execute_wrapper timing each query."""
+
+    __slots__ = ("queries", "db_time", "serializer_time", "serializing", "shapes")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.shapes[sql] = self.shapes.get(sql, 0) + 1
+
+
+@contextmanager
+def timed_serialization():
+    """Add the enclosed time to the current request's serializer time."""
+    record = _current.get()
+    if record is None or record.serializing:
+        yield
+        return
+    record.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.serializer_time += time.perf_counter() - started
+        record.serializing = False
+
+
+def instrument_serializers():
+    """Time every DRF ``serializer.data`` access; called from ApiConfig.ready."""
+    from rest_framework.serializers import BaseSerializer
+
+    data = BaseSerializer.data.fget
+    if getattr(data, "timed", False):
+        return
+
+    def timed_data(self):
+        with timed_serialization():
+            return data(self)
+
+    timed_data.timed = True
+    BaseSerializer.data = property(timed_data)
+
+
+_flagged = set()
+
+
+def record_request(view, method, status_code, elapsed, record):
+    labels = (("view", view),)
+    registry.inc("http_requests_total", (*labels, ("method", method), ("status", status_code)))
+    registry.observe("http_request_duration_seconds", labels, elapsed)
+    registry.observe("db_queries_per_request", labels, record.queries, QUERY_BUCKETS)
+    registry.observe("db_time_seconds", labels, record.db_time)
+    registry.observe("serializer_time_seconds", labels, record.serializer_time)
+
+    threshold = settings.METRICS["N_PLUS_ONE_THRESHOLD"]
+    repeated = [sql for sql, count in record.shapes.items() if count >= threshold]
+    if repeated:
+        registry.inc("n_plus_one_total", labels)
+        for sql in repeated:
+            if (view, sql) not in _flagged:
+                _flagged.add((view, sql))
+                logger.warning(
+                    "Possible N+1 in %s: query ran %d times: %s",
+                    view, record.shapes[sql], sql[:500],
+                )
+
+
+def _wrap_queries(record):
+    """Time queries on this thread's connections until the stack is closed."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(record))
+    return stack
+
+
+class MetricsMiddleware:
+    """Record latency, query count, DB and serializer time for every request.
+
+    Queries are timed through execute_wrapper on each database connection,
+    which costs a function call and a dict update per query. Streaming
+    responses are measured up to their first byte. Metrics are kept per
+    process.
+
+    Under ASGI the middleware stays async so async views are not moved to
+    a thread. Connections belong to the thread the ORM runs on, so the
+    wrappers are installed and removed through sync_to_async, on the same
+    thread the request's queries use.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        record = RequestMetrics()
+        token = _current.set(record)
+        started = time.perf_counter()
+        try:
+            with _wrap_queries(record):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, started, record)
+        return response
+
+    async def __acall__(self, request):
+        record = RequestMetrics()
+        token = _current.set(record)
+        started = time.perf_counter()
+        try:
+            stack = await sync_to_async(_wrap_queries)(record)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current.reset(token)
+        self.record(request, response, started, record)
+        return response
+
+    def record(self, request, response, started, record):
+        match = request.resolver_match
+        record_request(
+            match.view_name if match else "unmatched",
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            record,
+        )
+
+
+def metrics_view(request):
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS["ALLOWED_IPS"]:
+        raise PermissionDenied
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,69 @@
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from .routers import REPLICA_ALIAS, use_primary
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class PrimaryPinningMiddleware:
+    """Pin writes, and a client's reads right after its writes, to the primary.
+
+    Clients are identified by their Authorization header, so a dashboard
+    refresh following a transfer reads its own write even while the replica
+    is still catching up. Other users a write touched, such as a transfer's
+    receiver, are pinned by invalidate_users() instead, which cached views
+    honour. Does nothing unless a replica is configured. Runs natively in
+    both sync and async chains.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = REPLICA_ALIAS in settings.DATABASES
+        self.window = getattr(settings, "REPLICA_LAG_SECONDS", 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def pin_key(self, request):
+        client = hashlib.md5(
+            request.headers.get("Authorization", "").encode(), usedforsecurity=False
+        ).hexdigest()
+        return f"primary-pin:{client}"
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        pin_key = self.pin_key(request)
+        is_write = request.method not in SAFE_METHODS
+        token = use_primary.set(is_write or bool(cache.get(pin_key)))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        if is_write:
+            cache.set(pin_key, 1, self.window)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        pin_key = self.pin_key(request)
+        is_write = request.method not in SAFE_METHODS
+        token = use_primary.set(is_write or bool(await cache.aget(pin_key)))
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        if is_write:
+            await cache.aset(pin_key, 1, self.window)
+        return response
@@ -6,6 +6,7 @@ from django.contrib.auth.models import (
 )
 from api.managers import UserManager
 import uuid
+from decimal import Decimal
 from django.utils.timezone import now as n
 from django.core.exceptions import ValidationError
 
@@ -43,13 +44,18 @@ class Account(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey("User", on_delete=models.CASCADE, related_name="accounts")
-    balance = models.FloatField(default=0.00)
+    balance = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal("0.00")
+    )
     account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPES)
     currency = models.CharField(max_length=3, choices=CURRENCIES)
     credit_score = models.PositiveIntegerField(default=600)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "created_at", "id"])]
+
     def __str__(self):
         return f"{self.account_type} account for {self.user.name} ({self.currency})"
 
@@ -58,20 +64,38 @@ class Account(models.Model):
         is_new = self._state.adding
         if self.balance < 0:
             raise ValidationError("Not enough balance.")
+        if not is_new and kwargs.get("update_fields") is None:
+            # The balance is a snapshot maintained by the ledger; never write
+            # back a possibly stale in-memory value.
+            kwargs["update_fields"] = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != "balance"
+            ]
         super().save(*args, **kwargs)
 
         if is_new:
-
-            UserTransaction.objects.create(
-                user=self.user,
-                transaction_type="ACCOUNT_CREATION",
-                details=f"Created account {self.id} ({self.account_type}, {self.currency}) with initial balance {self.balance}",
-            )
-
-            AccountTransaction.objects.create(
-                account=self,
-                transaction_type="ACCOUNT_CREATION",
-                details=f"Account created for {self.user.email} with balance {self.balance}",
+            if self.balance:
+                from api.ledger import append_entries
+
+                append_entries(
+                    [
+                        (self.id, "CUSTOMER", self.currency, self.balance),
+                        (None, "OPENING", self.currency, -self.balance),
+                    ]
+                )
+
+            from api.outbox import publish
+
+            publish(
+                "ACCOUNT_CREATED",
+                {
+                    "user_id": str(self.user_id),
+                    "account_id": str(self.id),
+                    "account_type": self.account_type,
+                    "currency": self.currency,
+                    "balance": str(self.balance),
+                },
             )
 
 
@@ -85,9 +109,12 @@ class UserTransaction(models.Model):
         "User", on_delete=models.CASCADE, related_name="user_transactions"
     )
     transaction_type = models.CharField(max_length=50, choices=TRANSACTION_TYPES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=n)
     details = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "timestamp", "id"])]
+
     def __str__(self):
         return f"{self.transaction_type} for {self.user.email} at {self.timestamp}"
 
@@ -102,9 +129,12 @@ class AccountTransaction(models.Model):
         "Account", on_delete=models.CASCADE, related_name="account_transactions"
     )
     transaction_type = models.CharField(max_length=50, choices=TRANSACTION_TYPES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=n)
     details = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["account", "timestamp", "id"])]
+
     def __str__(self):
         return f"{self.transaction_type} for {self.account} at {self.timestamp}"
 
@@ -117,10 +147,24 @@ class Transaction(models.Model):
     receiver = models.ForeignKey(
         "Account", on_delete=models.CASCADE, related_name="received_transactions"
     )
+    # In the sender's currency.
     amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # In the receiver's currency; only set when the two currencies differ.
+    received_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, blank=True, null=True
+    )
+    fx_rate = models.DecimalField(
+        max_digits=20, decimal_places=10, blank=True, null=True
+    )
     timestamp = models.DateTimeField(default=n)
     details = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["sender", "timestamp"]),
+            models.Index(fields=["receiver", "timestamp"]),
+        ]
+
     def __str__(self):
         return f"Transaction of {self.amount} from {self.sender.email} to {self.receiver.email}"
 
@@ -139,24 +183,253 @@ class AccountPreference(models.Model):
 
 
 class Purchase(models.Model):
+    SIDES = [
+        ("BUY", "Buy"),
+        ("SELL", "Sell"),
+    ]
+
     user = models.ForeignKey("User", on_delete=models.CASCADE)
+    account = models.ForeignKey(
+        "Account",
+        on_delete=models.CASCADE,
+        related_name="purchases",
+        blank=True,
+        null=True,
+    )
     stock_symbol = models.CharField(max_length=10, default="GOOGL")
+    side = models.CharField(max_length=4, choices=SIDES, default="BUY")
     quantity = models.PositiveIntegerField(default=0)
+    price = models.DecimalField(max_digits=16, decimal_places=4, blank=True, null=True)
     purchase_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "stock_symbol"])]
+
     def __str__(self):
         return f"{self.user.username} purchased {self.quantity} of {self.stock_symbol}"
 
 
+class Holding(models.Model):
+    user = models.ForeignKey("User", on_delete=models.CASCADE, related_name="holdings")
+    account = models.ForeignKey(
+        "Account", on_delete=models.CASCADE, related_name="holdings"
+    )
+    stock_symbol = models.CharField(max_length=10)
+    quantity = models.PositiveIntegerField(default=0)
+    cost_basis = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal("0.00")
+    )
+    realized_pnl = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal("0.00")
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "account", "stock_symbol")
+
+    def __str__(self):
+        return f"{self.quantity} of {self.stock_symbol} in {self.account_id}"
+
+
 class Loan(models.Model):
+    STATUSES = [
+        ("ACTIVE", "Active"),
+        ("OVERDUE", "Overdue"),
+        ("PAID", "Paid"),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     account = models.ForeignKey(
         "Account", on_delete=models.CASCADE, related_name="loans"
     )
+    # Outstanding principal; reduced by the principal part of each payment.
     loan_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    principal = models.DecimalField(
+        max_digits=12, decimal_places=2, blank=True, null=True
+    )
+    annual_rate = models.DecimalField(
+        max_digits=7, decimal_places=4, default=Decimal("0.0000")
+    )
     loan_duration = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUSES, default="ACTIVE")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["account", "created_at"])]
+
     def __str__(self):
         return f"Loan of {self.loan_amount} for {self.account} ({self.loan_duration} months)"
+
+
+class LoanInstallment(models.Model):
+    STATUSES = [
+        ("PENDING", "Pending"),
+        ("OVERDUE", "Overdue"),
+        ("PAID", "Paid"),
+    ]
+
+    loan = models.ForeignKey(
+        "Loan", on_delete=models.CASCADE, related_name="installments"
+    )
+    number = models.PositiveIntegerField()
+    due_date = models.DateField()
+    principal = models.DecimalField(max_digits=12, decimal_places=2)
+    interest = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    penalty = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    paid_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    status = models.CharField(max_length=10, choices=STATUSES, default="PENDING")
+    # Date up to which penalty interest has been accrued on an overdue installment.
+    accrued_on = models.DateField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ("loan", "number")
+        indexes = [models.Index(fields=["status", "due_date"])]
+
+    def __str__(self):
+        return f"Installment {self.number} of {self.loan_id} due {self.due_date}"
+
+
+class LedgerEntry(models.Model):
+    BOOKS = [
+        ("CUSTOMER", "Customer Account"),
+        ("OPENING", "Opening Balance"),
+        ("MARKET", "Market Settlement"),
+        ("LOANS", "Loans"),
+        ("FX", "Currency Exchange"),
+    ]
+
+    journal = models.UUIDField(db_index=True)
+    # No database constraint: transfers may be archived out of the table
+    # (api.archive) while their ledger entries stay, and PostgreSQL cannot
+    # reference a partitioned table by id alone.
+    transaction = models.ForeignKey(
+        "Transaction",
+        on_delete=models.CASCADE,
+        related_name="ledger_entries",
+        blank=True,
+        null=True,
+        db_constraint=False,
+    )
+    account = models.ForeignKey(
+        "Account",
+        on_delete=models.CASCADE,
+        related_name="ledger_entries",
+        blank=True,
+        null=True,
+    )
+    book = models.CharField(max_length=20, choices=BOOKS)
+    currency = models.CharField(max_length=3, choices=Account.CURRENCIES)
+    amount_minor = models.BigIntegerField()
+    created_at = models.DateTimeField(default=n)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Ledger entries are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("Ledger entries are append-only.")
+
+    def __str__(self):
+        return f"{self.book} {self.amount_minor} {self.currency} ({self.journal})"
+
+
+class FxRate(models.Model):
+    currency = models.CharField(max_length=3, choices=Account.CURRENCIES)
+    # Units of this currency per one unit of settings.FX["BASE"].
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+    as_of = models.DateTimeField(default=n)
+
+    class Meta:
+        unique_together = ("currency", "as_of")
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} at {self.as_of}"
+
+
+class BalanceCheckpoint(models.Model):
+    account = models.ForeignKey(
+        "Account", on_delete=models.CASCADE, related_name="balance_checkpoints"
+    )
+    balance_minor = models.BigIntegerField()
+    last_entry_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Checkpoint of {self.account_id} at entry {self.last_entry_id}"
+
+
+class OutboxEvent(models.Model):
+    KINDS = [
+        ("ACCOUNT_CREATED", "Account Created"),
+        ("FRAUD_ALERT", "Fraud Alert"),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KINDS)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=n)
+    # Set on events the drain could not apply; they are kept for inspection
+    # and skipped from then on.
+    failed_at = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.kind} event {self.id} at {self.created_at}"
+
+
+class FraudAlert(models.Model):
+    # The rule's configured name, see settings.FRAUD.
+    rule = models.CharField(max_length=50)
+    # Not a foreign key: alerts outlive archived transactions.
+    transaction_id = models.UUIDField()
+    sender = models.ForeignKey(
+        "Account", on_delete=models.CASCADE, related_name="fraud_alerts"
+    )
+    receiver = models.ForeignKey(
+        "Account", on_delete=models.CASCADE, related_name="+"
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    details = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=n)
+    reviewed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["reviewed", "created_at"])]
+
+    def __str__(self):
+        return f"{self.rule} alert on {self.transaction_id}"
+
+
+class ScoringRun(models.Model):
+    started_at = models.DateTimeField(default=n)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # Accounts with activity at or after this moment were rescored.
+    since = models.DateTimeField(blank=True, null=True)
+    accounts_scored = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Scoring run at {self.started_at} ({self.accounts_scored} accounts)"
+
+
+class IdempotencyKey(models.Model):
+    # Primary key of the user who sent the key; idempotent routes refuse
+    # anonymous requests.
+    owner = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(default=n)
+
+    class Meta:
+        unique_together = ("owner", "key")
+        indexes = [models.Index(fields=["created_at"])]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} ({self.status_code})"
@@ -0,0 +1,146 @@
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    Account,
+    AccountTransaction,
+    FraudAlert,
+    OutboxEvent,
+    User,
+    UserTransaction,
+)
+
+logger = logging.getLogger(__name__)
+
+DRAIN_BATCH_SIZE = 500
+
+
+def publish(kind, payload):
+    """Record an event in the caller's transaction for the background writer."""
+    event = OutboxEvent.objects.create(kind=kind, payload=payload)
+    if getattr(settings, "OUTBOX_INLINE", False):
+        transaction.on_commit(drain, robust=True)
+    return event
+
+
+def _account_created(events):
+    user_ids = {event.payload["user_id"] for event in events}
+    account_ids = {event.payload["account_id"] for event in events}
+    emails = dict(User.objects.filter(id__in=user_ids).values_list("id", "email"))
+    existing = set(Account.objects.filter(id__in=account_ids).values_list("id", flat=True))
+
+    user_rows = []
+    account_rows = []
+    for event in events:
+        data = event.payload
+        account = Account._meta.pk.to_python(data["account_id"])
+        user = User._meta.pk.to_python(data["user_id"])
+        if account not in existing:
+            continue
+        user_rows.append(
+            UserTransaction(
+                user_id=user,
+                transaction_type="ACCOUNT_CREATION",
+                timestamp=event.created_at,
+                details=f"Created account {account} ({data['account_type']}, {data['currency']}) with initial balance {data['balance']}",
+            )
+        )
+        account_rows.append(
+            AccountTransaction(
+                account_id=account,
+                transaction_type="ACCOUNT_CREATION",
+                timestamp=event.created_at,
+                details=f"Account created for {emails.get(user)} with balance {data['balance']}",
+            )
+        )
+    UserTransaction.objects.bulk_create(user_rows)
+    AccountTransaction.objects.bulk_create(account_rows)
+
+
+def _fraud_alert(events):
+    existing = set(
+        Account.objects.filter(
+            id__in={
+                alert[field]
+                for event in events
+                for alert in event.payload["alerts"]
+                for field in ("sender_id", "receiver_id")
+            }
+        ).values_list("id", flat=True)
+    )
+    rows = []
+    for event in events:
+        for alert in event.payload["alerts"]:
+            sender = Account._meta.pk.to_python(alert["sender_id"])
+            receiver = Account._meta.pk.to_python(alert["receiver_id"])
+            if sender not in existing or receiver not in existing:
+                continue
+            rows.append(
+                FraudAlert(
+                    rule=alert["rule"],
+                    transaction_id=alert["transaction_id"],
+                    sender_id=sender,
+                    receiver_id=receiver,
+                    amount=alert["amount"],
+                    details=alert["details"],
+                    created_at=event.created_at,
+                )
+            )
+    FraudAlert.objects.bulk_create(rows)
+
+
+HANDLERS = {
+    "ACCOUNT_CREATED": _account_created,
+    "FRAUD_ALERT": _fraud_alert,
+}
+
+
+def drain(batch_size=DRAIN_BATCH_SIZE):
+    """Apply and delete one batch of outbox events; returns how many ran.
+
+    Events are claimed with ``SKIP LOCKED`` where the database supports it,
+    so several workers can drain the same outbox without blocking. Each
+    kind's handler runs in a savepoint; if it raises, or the kind is
+    unknown, that group is marked failed with the error and left in place
+    rather than holding up the queue.
+    """
+    with transaction.atomic():
+        events = OutboxEvent.objects.filter(failed_at__isnull=True).order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            events = events.select_for_update(skip_locked=True)
+        events = list(events[:batch_size])
+        if not events:
+            return 0
+
+        by_kind = {}
+        for event in events:
+            by_kind.setdefault(event.kind, []).append(event)
+        failed = {}
+        for kind, group in by_kind.items():
+            ids = [event.id for event in group]
+            if kind not in HANDLERS:
+                failed[kind] = (ids, "Unknown kind")
+                logger.error(
+                    "Skipping %d outbox event(s) of unknown kind %r.", len(group), kind
+                )
+                continue
+            try:
+                with transaction.atomic():
+                    HANDLERS[kind](group)
+            except Exception as exc:
+                failed[kind] = (ids, f"{type(exc).__name__}: {exc}")
+                logger.exception(
+                    "Outbox handler for %r failed on %d event(s).", kind, len(group)
+                )
+
+        now = timezone.now()
+        for ids, error in failed.values():
+            OutboxEvent.objects.filter(id__in=ids).update(failed_at=now, error=error)
+        skipped = {id for ids, _ in failed.values() for id in ids}
+        OutboxEvent.objects.filter(
+            id__in=[event.id for event in events if event.id not in skipped]
+        ).delete()
+        return len(events)
@@ -0,0 +1,182 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from . import archive
+from .serializers import ValuesSerializer
+
+
+def encode_cursor(values):
+    payload = json.dumps([str(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, fields, model):
+    """Decode an opaque cursor back into typed values for ``fields``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError
+        return [
+            model._meta.get_field(field).to_python(value)
+            for field, value in zip(fields, values)
+        ]
+    except (ValueError, TypeError, DjangoValidationError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+
+
+def keyset_filter(ordering, values):
+    """Build the ``WHERE`` clause selecting rows strictly after ``values``.
+
+    For ``("-timestamp", "-id")`` this is the row-value comparison
+    ``timestamp < t OR (timestamp = t AND id < i)``, which a composite index
+    on the same columns can answer without scanning skipped rows.
+    """
+    condition = Q()
+    equal = {}
+    for term, value in zip(ordering, values):
+        field = term.lstrip("-")
+        lookup = "lt" if term.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{field}__{lookup}": value})
+        equal[field] = value
+    return condition
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over a unique ordering, typically ``(timestamp, id)``.
+
+    Unlike offset pagination the cost of fetching a page does not depend on
+    how deep into the history the client is. Views choose the ordering with
+    a ``keyset_ordering`` attribute; the last term must be unique.
+    """
+
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering = ("-timestamp", "-id")
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, "keyset_ordering", self.ordering))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.GET.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "Must be an integer."})
+        return max(1, min(size, self.max_page_size))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """Return the sliced queryset for the requested page.
+
+        Split from paginate_queryset() so async views can evaluate the
+        queryset themselves and hand the rows back to build_page().
+        """
+        self.request = request
+        self.fields = [term.lstrip("-") for term in self.get_ordering(view)]
+        self.page_size_value = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.get_ordering(view))
+        self.model = queryset.model
+        self.cursor_values = None
+        cursor = request.GET.get(self.cursor_query_param)
+        if cursor:
+            self.cursor_values = decode_cursor(cursor, self.fields, queryset.model)
+            queryset = queryset.filter(
+                keyset_filter(self.get_ordering(view), self.cursor_values)
+            )
+        return queryset[: self.page_size_value + 1]
+
+    def is_short(self, rows):
+        """Whether the database ran out of rows before this page was full."""
+        return len(rows) <= self.page_size_value
+
+    def fill(self, rows, view):
+        """Complete a short page from another source; returns the rows."""
+        return rows
+
+    def build_page(self, rows):
+        rows = list(rows)
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[: self.page_size_value]
+        self.next_cursor = None
+        if self.has_next:
+            last = rows[-1]
+            if isinstance(last, dict):
+                values = (last[field] for field in self.fields)
+            else:
+                values = (getattr(last, field) for field in self.fields)
+            self.next_cursor = encode_cursor(values)
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        rows = list(self.get_page_queryset(queryset, request, view))
+        if self.is_short(rows):
+            rows = self.fill(rows, view)
+        return self.build_page(rows)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data):
+        return {"next": self.get_next_link(), "results": data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class ArchiveKeysetPagination(KeysetPagination):
+    """Keyset pagination that continues into archived history (api.archive).
+
+    Once the table runs out of rows the page is completed from the archive
+    files, so clients page through the whole history with the same
+    cursors. Views order by ``(timestamp, id)``, name the filter_history()
+    arguments they use in ``history_filters`` and implement
+    ``get_archive_match()``, returning the column values archived rows
+    must have.
+    """
+
+    def fill(self, rows, view):
+        ordering = self.get_ordering(view)
+        if rows:
+            last = rows[-1]
+            after = tuple(last[field] for field in self.fields)
+        else:
+            after = self.cursor_values and tuple(self.cursor_values)
+        archived = archive.read_history(
+            self.model,
+            self.request.GET,
+            view.get_archive_match(),
+            descending=ordering[0].startswith("-"),
+            after=after,
+            **view.history_filters,
+        )
+        columns = {
+            name: self.model._meta.get_field(name).attname
+            for name in ValuesSerializer.for_serializer(view.serializer_class).names
+        }
+        for row in archived:
+            if not self.is_short(rows):
+                break
+            rows.append({name: row[column] for name, column in columns.items()})
+        return rows
@@ -0,0 +1,164 @@
+from datetime import datetime, timezone
+
+from django.db import connection, transaction
+
+DATE_FIELD = "timestamp"
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(start):
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def months(first, last):
+    """Month starts from ``first``'s month through ``last``'s."""
+    start = month_start(first)
+    while start <= last:
+        yield start
+        start = next_month(start)
+
+
+def supported():
+    return connection.vendor == "postgresql"
+
+
+def partition_name(table, start):
+    return f"{table}_p{start:%Y%m}"
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def _exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    return cursor.fetchone()[0] is not None
+
+
+def is_partitioned(table):
+    if not supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(table):
+    """Names of ``table``'s partitions; monthly ones sort oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            [table],
+        )
+        return [name for (name,) in cursor.fetchall()]
+
+
+def create_partition(table, start):
+    """Create the partition for ``start``'s month unless it exists.
+
+    Fails if the default partition already holds rows for that month, which
+    is why partitions are created ahead of time.
+    """
+    # Bounds are literals: DDL cannot take bound parameters.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {_qn(partition_name(table, start))} "
+            f"PARTITION OF {_qn(table)} FOR VALUES FROM ('{start.isoformat()}') "
+            f"TO ('{next_month(start).isoformat()}')"
+        )
+
+
+def partition_table(model, until):
+    """Turn ``model``'s table into monthly range partitions on ``timestamp``.
+
+    The table is rebuilt in one transaction: its rows are copied into a new
+    partitioned table with a partition for every month from the oldest row
+    through ``until`` plus a default partition, then its indexes and
+    foreign keys are recreated. PostgreSQL requires the primary key of a
+    partitioned table to include the partition column, so it becomes
+    ``(id, timestamp)`` and ``id`` is no longer unique on its own, which a
+    uuid4 makes moot. For the same reason foreign keys pointing at the
+    table are dropped. The table is locked while this runs.
+    """
+    table = model._meta.db_table
+    old = f"{table}_unpartitioned"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {_qn(table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT i.indexdef FROM pg_indexes i WHERE i.tablename = %s "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c "
+            "WHERE c.conrelid = to_regclass(%s) AND c.contype = 'p' "
+            "AND c.conname = i.indexname)",
+            [table, table],
+        )
+        indexes = [definition for (definition,) in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+            [table],
+        )
+        for referencing, name in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {referencing} DROP CONSTRAINT {_qn(name)}")
+        cursor.execute(f"SELECT min({_qn(DATE_FIELD)}) FROM {_qn(table)}")
+        first = cursor.fetchone()[0] or until
+
+        cursor.execute(f"ALTER TABLE {_qn(table)} RENAME TO {_qn(old)}")
+        cursor.execute(
+            f"CREATE TABLE {_qn(table)} (LIKE {_qn(old)} INCLUDING DEFAULTS "
+            f"INCLUDING CONSTRAINTS) PARTITION BY RANGE ({_qn(DATE_FIELD)})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_qn(table)} ADD PRIMARY KEY (id, {_qn(DATE_FIELD)})"
+        )
+        cursor.execute(
+            f"CREATE TABLE {_qn(table + '_default')} PARTITION OF {_qn(table)} DEFAULT"
+        )
+        for start in months(first, until):
+            create_partition(table, start)
+        cursor.execute(f"INSERT INTO {_qn(table)} SELECT * FROM {_qn(old)}")
+        cursor.execute(f"DROP TABLE {_qn(old)}")
+        # Dropping the old table freed the index names.
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(name)} {definition}"
+            )
+
+
+def lock_partition(table, start):
+    """Block writes to ``start``'s partition until the transaction ends."""
+    if not supported():
+        return
+    with connection.cursor() as cursor:
+        name = partition_name(table, start)
+        if _exists(cursor, name):
+            cursor.execute(f"LOCK TABLE {_qn(name)} IN SHARE MODE")
+
+
+def drop_partition(table, start):
+    """Detach and drop ``start``'s partition; returns whether there was one."""
+    if not supported():
+        return False
+    with connection.cursor() as cursor:
+        name = partition_name(table, start)
+        if not _exists(cursor, name):
+            return False
+        cursor.execute(f"ALTER TABLE {_qn(table)} DETACH PARTITION {_qn(name)}")
+        cursor.execute(f"DROP TABLE {_qn(name)}")
+        return True
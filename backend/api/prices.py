@@ -0,0 +1,183 @@
+import csv
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class UnknownSymbol(Exception):
+    pass
+
+
+class PriceFeed:
+    """Source of last-trade prices; subclasses fetch many symbols at once."""
+
+    def fetch(self, symbols):
+        """Return ``{symbol: Decimal}`` for the symbols the feed knows."""
+        raise NotImplementedError
+
+
+class CSVReplayFeed(PriceFeed):
+    """Replay ``symbol,price`` rows from a local file, one tick per fetch.
+
+    Each symbol cycles through its rows in file order, which gives tests and
+    local development a deterministic, offline stand-in for a market feed.
+    """
+
+    def __init__(self, path):
+        self.ticks = {}
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                symbol = row["symbol"].strip().upper()
+                self.ticks.setdefault(symbol, []).append(Decimal(row["price"]))
+        self.positions = {}
+        self.lock = threading.Lock()
+
+    def fetch(self, symbols):
+        prices = {}
+        with self.lock:
+            for symbol in symbols:
+                ticks = self.ticks.get(symbol)
+                if not ticks:
+                    continue
+                position = self.positions.get(symbol, 0)
+                prices[symbol] = ticks[position % len(ticks)]
+                self.positions[symbol] = position + 1
+        return prices
+
+
+class PriceService:
+    """Two-tier quote cache in front of a feed.
+
+    Quotes are served from an in-process LRU, then from the shared Django
+    cache, and only then from the feed. Refreshes are single-flight per
+    symbol: concurrent requests for an expired symbol wait for the one
+    fetch already in progress instead of issuing their own.
+    """
+
+    key_prefix = "price:"
+
+    def __init__(self, feed, ttl=15, symbol_ttl=None, lru_size=1024, cache_alias="default"):
+        self.feed = feed
+        self.ttl = ttl
+        self.symbol_ttl = {s.upper(): t for s, t in (symbol_ttl or {}).items()}
+        self.lru_size = lru_size
+        self.cache = caches[cache_alias]
+        self.local = OrderedDict()
+        self.local_lock = threading.Lock()
+        self.flight_locks = {}
+
+    def ttl_for(self, symbol):
+        return self.symbol_ttl.get(symbol, self.ttl)
+
+    def _get_local(self, symbol, now):
+        with self.local_lock:
+            entry = self.local.get(symbol)
+            if entry is None:
+                return None
+            price, expires_at = entry
+            if expires_at <= now:
+                del self.local[symbol]
+                return None
+            self.local.move_to_end(symbol)
+            return price
+
+    def _set_local(self, prices, now):
+        with self.local_lock:
+            for symbol, price in prices.items():
+                self.local[symbol] = (price, now + self.ttl_for(symbol))
+                self.local.move_to_end(symbol)
+            while len(self.local) > self.lru_size:
+                self.local.popitem(last=False)
+
+    def _flight_lock(self, symbol):
+        with self.local_lock:
+            return self.flight_locks.setdefault(symbol, threading.Lock())
+
+    def _lookup(self, symbols, now):
+        prices = {}
+        missing = []
+        for symbol in symbols:
+            price = self._get_local(symbol, now)
+            if price is None:
+                missing.append(symbol)
+            else:
+                prices[symbol] = price
+        if missing:
+            shared = self.cache.get_many([self.key_prefix + s for s in missing])
+            found = {
+                key[len(self.key_prefix) :]: Decimal(value) for key, value in shared.items()
+            }
+            self._set_local(found, now)
+            prices.update(found)
+        return prices
+
+    def quotes(self, symbols, strict=True):
+        """Return ``{symbol: Decimal}`` for every requested symbol.
+
+        Raises UnknownSymbol if the feed has no price for one of them,
+        unless ``strict`` is False, in which case those are left out.
+        """
+        symbols = sorted({s.upper() for s in symbols})
+        prices = self._lookup(symbols, time.monotonic())
+        missing = [s for s in symbols if s not in prices]
+        if missing:
+            locks = [self._flight_lock(s) for s in missing]
+            for lock in locks:
+                lock.acquire()
+            try:
+                now = time.monotonic()
+                prices.update(self._lookup(missing, now))
+                missing = [s for s in missing if s not in prices]
+                if missing:
+                    fetched = self.feed.fetch(missing)
+                    for symbol, price in fetched.items():
+                        self.cache.set(
+                            self.key_prefix + symbol, str(price), self.ttl_for(symbol)
+                        )
+                    self._set_local(fetched, now)
+                    prices.update(fetched)
+            finally:
+                for lock in locks:
+                    lock.release()
+
+        unknown = [s for s in symbols if s not in prices]
+        if unknown and strict:
+            raise UnknownSymbol(f"Unknown stock symbol: {', '.join(unknown)}")
+        return prices
+
+    def quote(self, symbol):
+        return self.quotes([symbol])[symbol.upper()]
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_price_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            config = settings.MARKET_DATA
+            feed = import_string(config["FEED"])(**config.get("OPTIONS", {}))
+            _service = PriceService(
+                feed,
+                ttl=config.get("TTL", 15),
+                symbol_ttl=config.get("SYMBOL_TTL"),
+                lru_size=config.get("LRU_SIZE", 1024),
+                cache_alias=config.get("CACHE", "default"),
+            )
+        return _service
+
+
+@receiver(setting_changed)
+def reset_price_service(setting, **kwargs):
+    global _service
+    if setting == "MARKET_DATA":
+        _service = None
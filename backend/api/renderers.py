@@ -0,0 +1,40 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import timed_serialization
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+    OPTIONS = 0
+else:
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer producing the same compact UTF-8 output through orjson.
+
+    Types orjson does not handle natively (Decimal, lazy strings, ...) go
+    through DRF's encoder, and so do dates and times, which orjson would
+    format differently. Dict keys that are not strings are converted as
+    json.dumps() does. Falls back to JSONRenderer without orjson or when
+    the client asks for indented output.
+    """
+
+    _default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed_serialization():
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        ret = orjson.dumps(data, default=self._default, option=OPTIONS)
+        # Match JSONRenderer, which escapes these for embedding in JavaScript.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -0,0 +1,61 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+REPLICA_ALIAS = "replica"
+
+use_primary = ContextVar("use_primary", default=False)
+
+
+def _user_pin_key(user_id):
+    return f"primary-pin:user:{user_id}"
+
+
+def pin_users(*user_ids):
+    """Send these users' cached reads to the primary for the replica lag.
+
+    Called for every user whose data a write changed, not only the writer,
+    so a transfer's receiver does not re-cache stale replica data.
+    """
+    if REPLICA_ALIAS in settings.DATABASES:
+        cache.set_many(
+            {_user_pin_key(user_id): 1 for user_id in user_ids},
+            getattr(settings, "REPLICA_LAG_SECONDS", 5),
+        )
+
+
+def user_pinned(user_id):
+    return REPLICA_ALIAS in settings.DATABASES and bool(
+        cache.get(_user_pin_key(user_id))
+    )
+
+
+async def auser_pinned(user_id):
+    return REPLICA_ALIAS in settings.DATABASES and bool(
+        await cache.aget(_user_pin_key(user_id))
+    )
+
+
+class PrimaryReplicaRouter:
+    """Send reads to the replica unless the request must see the primary.
+
+    Writes always go to ``default``. Reads stay on the primary inside an
+    atomic block (row locks, read-modify-write) and for requests pinned by
+    PrimaryPinningMiddleware, i.e. writes and reads shortly after a write.
+    """
+
+    def db_for_read(self, model, **hints):
+        if use_primary.get() or connections["default"].in_atomic_block:
+            return "default"
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,213 @@
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Exists, F, FloatField, OuterRef, Q, Sum
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .caching import invalidate_users
+from .models import (
+    Account,
+    LedgerEntry,
+    Loan,
+    LoanInstallment,
+    Purchase,
+    ScoringRun,
+    Transaction,
+)
+
+SCORING_BATCH_SIZE = 2000
+# Volumes and volatility are measured over this trailing window.
+SCORING_WINDOW = timedelta(days=180)
+# Activity this close to the previous run's start is looked at again, so
+# rows from transactions still in flight at the time are not missed.
+ACTIVITY_LAG = timedelta(minutes=5)
+MIN_SCORE, MAX_SCORE, BASE_SCORE = 300, 850, 600
+
+
+def _grouped(queryset, key, ids, **aggregates):
+    """One GROUP BY pass over ``queryset`` for the accounts in ``ids``."""
+    return {
+        row.pop(key): row
+        for row in queryset.filter(**{f"{key}__in": ids})
+        .values(key)
+        .annotate(**aggregates)
+        .order_by()
+    }
+
+
+def _column(rows, ids, field):
+    return np.array(
+        [float(rows.get(account_id, {}).get(field) or 0) for account_id in ids]
+    )
+
+
+def features(ids, balances, now):
+    """Return a dict of feature arrays aligned with ``ids``."""
+    start = now - SCORING_WINDOW
+    sent = _grouped(
+        Transaction.objects.filter(timestamp__gte=start),
+        "sender_id",
+        ids,
+        total=Sum("amount"),
+        count=Count("id"),
+    )
+    received = _grouped(
+        Transaction.objects.filter(timestamp__gte=start),
+        "receiver_id",
+        ids,
+        total=Sum(Coalesce("received_amount", "amount")),
+        count=Count("id"),
+    )
+    amount = Cast("amount_minor", FloatField())
+    movements = _grouped(
+        LedgerEntry.objects.filter(book="CUSTOMER", created_at__gte=start),
+        "account_id",
+        ids,
+        n=Count("id"),
+        total=Sum(amount),
+        squares=Sum(amount * amount),
+    )
+    loans = _grouped(
+        Loan.objects.exclude(status="PAID"),
+        "account_id",
+        ids,
+        outstanding=Sum("loan_amount"),
+    )
+    installments = _grouped(
+        LoanInstallment.objects.annotate(account_id=F("loan__account_id")),
+        "account_id",
+        ids,
+        paid=Count("id", filter=Q(status="PAID", penalty=0)),
+        paid_late=Count("id", filter=Q(status="PAID", penalty__gt=0)),
+        overdue=Count("id", filter=Q(status="OVERDUE")),
+    )
+    trades = _grouped(
+        Purchase.objects.filter(purchase_date__gte=start),
+        "account_id",
+        ids,
+        count=Count("id"),
+    )
+
+    n = _column(movements, ids, "n")
+    mean = _column(movements, ids, "total") / np.maximum(n, 1)
+    variance = _column(movements, ids, "squares") / np.maximum(n, 1) - mean**2
+    return {
+        "balance": balances,
+        "inflow": _column(received, ids, "total"),
+        "outflow": _column(sent, ids, "total"),
+        "transfers": _column(received, ids, "count") + _column(sent, ids, "count"),
+        "volatility": np.sqrt(np.maximum(variance, 0)) / 100,
+        "outstanding": _column(loans, ids, "outstanding"),
+        "paid": _column(installments, ids, "paid"),
+        "paid_late": _column(installments, ids, "paid_late"),
+        "overdue": _column(installments, ids, "overdue"),
+        "trades": _column(trades, ids, "count"),
+    }
+
+
+def score(f):
+    """Map feature arrays to scores in ``[MIN_SCORE, MAX_SCORE]``."""
+    flow = f["inflow"] + f["outflow"]
+    net_flow = (f["inflow"] - f["outflow"]) / (flow + 1)
+    activity = np.tanh(f["transfers"] / 20)
+    volatility = np.tanh(f["volatility"] / (np.abs(f["balance"]) + 100))
+    leverage = np.tanh(f["outstanding"] / (f["balance"] + f["inflow"] / 6 + 100))
+    history = f["paid"] + f["paid_late"] + f["overdue"]
+    on_time = np.where(history > 0, f["paid"] / np.maximum(history, 1) - 0.5, 0)
+    points = (
+        BASE_SCORE
+        + 80 * net_flow
+        + 40 * activity
+        + 20 * np.tanh(f["trades"] / 10)
+        + 150 * on_time
+        - 60 * volatility
+        - 80 * leverage
+        - 40 * np.minimum(f["overdue"], 5)
+    )
+    return np.clip(np.rint(points), MIN_SCORE, MAX_SCORE).astype(int)
+
+
+def _activity(since, until=None):
+    """Condition: the account has windowed activity in ``[since, until)``."""
+
+    def between(field):
+        lookups = {f"{field}__gte": since}
+        if until is not None:
+            lookups[f"{field}__lt"] = until
+        return lookups
+
+    account = OuterRef("pk")
+    return (
+        Exists(Transaction.objects.filter(sender=account, **between("timestamp")))
+        | Exists(Transaction.objects.filter(receiver=account, **between("timestamp")))
+        | Exists(
+            LedgerEntry.objects.filter(
+                account=account, book="CUSTOMER", **between("created_at")
+            )
+        )
+        | Exists(Purchase.objects.filter(account=account, **between("purchase_date")))
+    )
+
+
+def _changed_accounts(since, now):
+    """Accounts whose features may differ from the run that started at ``since``.
+
+    That is new activity, and activity that has left the trailing window
+    since then: an idle account's score still changes as its history ages.
+    """
+    if since is None:
+        return Account.objects.all()
+    return Account.objects.filter(
+        Q(updated_at__gte=since)
+        | Exists(Loan.objects.filter(account=OuterRef("pk"), updated_at__gte=since))
+        | _activity(since)
+        | _activity(since - SCORING_WINDOW, now - SCORING_WINDOW)
+    )
+
+
+def run(full=False, batch_size=SCORING_BATCH_SIZE):
+    """Rescore accounts with activity since the last finished run, or with
+    activity that has aged out of the window since then.
+
+    Accounts are walked in primary-key batches; each batch costs a fixed
+    number of grouped queries, one vectorized scoring pass and one
+    bulk_update, however many rows its history has.
+    """
+    previous = (
+        ScoringRun.objects.filter(finished_at__isnull=False)
+        .order_by("-started_at")
+        .first()
+    )
+    since = None
+    if previous is not None and not full:
+        since = previous.started_at - ACTIVITY_LAG
+    scoring_run = ScoringRun.objects.create(since=since)
+
+    candidates = _changed_accounts(since, scoring_run.started_at).order_by("id")
+    last_id = None
+    while True:
+        batch = candidates if last_id is None else candidates.filter(id__gt=last_id)
+        rows = list(batch.values_list("id", "user_id", "balance")[:batch_size])
+        if not rows:
+            break
+        ids = [row[0] for row in rows]
+        balances = np.array([float(row[2]) for row in rows])
+        scores = score(features(ids, balances, scoring_run.started_at))
+        with transaction.atomic():
+            Account.objects.bulk_update(
+                [
+                    Account(id=account_id, credit_score=value)
+                    for account_id, value in zip(ids, scores.tolist())
+                ],
+                ["credit_score"],
+                batch_size=batch_size,
+            )
+            invalidate_users(*(row[1] for row in rows))
+        scoring_run.accounts_scored += len(rows)
+        last_id = ids[-1]
+
+    scoring_run.finished_at = timezone.now()
+    scoring_run.save(update_fields=["accounts_scored", "finished_at"])
+    return scoring_run
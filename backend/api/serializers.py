@@ -1,7 +1,13 @@
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
-from rest_framework import serializers
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .metrics import timed_serialization
 from .models import *
 
 
@@ -18,6 +24,14 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class AccountSerializer(serializers.ModelSerializer):
+    balance = serializers.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        min_value=Decimal("0.00"),
+        coerce_to_string=False,
+        required=False,
+    )
+
     class Meta:
         model = Account
         fields = "__all__"
@@ -57,8 +71,117 @@ class LoanSerializer(serializers.ModelSerializer):
             "id",
             "account",
             "loan_amount",
+            "principal",
+            "annual_rate",
             "loan_duration",
+            "status",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = [
+            "id",
+            "principal",
+            "annual_rate",
+            "status",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["id", "created_at", "updated_at"]
+
+
+class LoanInstallmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LoanInstallment
+        fields = "__all__"
+
+
+class HoldingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Holding
+        fields = ["stock_symbol", "quantity", "cost_basis", "realized_pnl", "updated_at"]
+
+
+class DashboardLoanSerializer(LoanSerializer):
+    next_installment = serializers.SerializerMethodField()
+
+    class Meta(LoanSerializer.Meta):
+        fields = LoanSerializer.Meta.fields + ["next_installment"]
+
+    def get_next_installment(self, loan):
+        # Unpaid installments in order, prefetched by DashboardView.
+        upcoming = loan.open_installments
+        return LoanInstallmentSerializer(upcoming[0]).data if upcoming else None
+
+
+class DashboardAccountSerializer(AccountSerializer):
+    loans = DashboardLoanSerializer(many=True, read_only=True)
+    holdings = HoldingSerializer(source="positions", many=True, read_only=True)
+
+
+class ValuesSerializer:
+    """Read-only fast path producing a ModelSerializer's wire format from ``.values()``.
+
+    The field layout and conversions come from the wrapped serializer, so the
+    output matches it, but rows are plain dicts from the database: no model
+    instances are built and only fields whose representation differs from
+    the raw value (datetimes, decimals, ...) are converted per row.
+    """
+
+    passthrough = (
+        serializers.BooleanField,
+        serializers.CharField,
+        serializers.ChoiceField,
+        serializers.IntegerField,
+        serializers.UUIDField,
+        serializers.PrimaryKeyRelatedField,
+    )
+
+    _instances = {}
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        if serializer_class not in cls._instances:
+            cls._instances[serializer_class] = cls(serializer_class)
+        return cls._instances[serializer_class]
+
+    def __init__(self, serializer_class):
+        fields = [
+            field
+            for field in serializer_class().fields.values()
+            if not field.write_only
+        ]
+        self.names = [field.field_name for field in fields]
+        self.converted = [
+            field for field in fields if not isinstance(field, self.passthrough)
+        ]
+
+    def values(self, queryset):
+        return queryset.values(*self.names)
+
+    @staticmethod
+    def converter(field):
+        """Return a per-value converter equivalent to field.to_representation."""
+        if not isinstance(field, serializers.DateTimeField) or not settings.USE_TZ:
+            return field.to_representation
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        if output_format is None or output_format.lower() != ISO_8601:
+            return field.to_representation
+        # Resolve the output timezone once per page rather than once per value.
+        tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+
+        def convert(value):
+            if timezone.is_naive(value):
+                return field.to_representation(value)
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+        return convert
+
+    def to_representation(self, rows):
+        converters = [(field.field_name, self.converter(field)) for field in self.converted]
+        with timed_serialization():
+            for row in rows:
+                for name, convert in converters:
+                    value = row[name]
+                    if value is not None:
+                        row[name] = convert(value)
+        return rows
@@ -0,0 +1,140 @@
+import csv
+import heapq
+import json
+
+from . import archive
+from .filters import filter_history
+from .models import AccountTransaction, Loan, Transaction
+
+CHUNK_SIZE = 2000
+FIELDS = ("timestamp", "type", "reference", "counterparty", "amount", "details")
+
+
+def _ordered(queryset, params, date_field):
+    """Apply the statement filters and the (date, pk) order one source uses."""
+    return filter_history(queryset, params, date_field=date_field).order_by(
+        date_field, "pk"
+    )
+
+
+def _stream(queryset, params, date_field, fields, build, archived=None):
+    """Return a generator of statement rows for one source, oldest first.
+
+    Filters are validated here, before the response starts streaming. Rows
+    are read with ``values_list().iterator()`` so only one chunk of tuples
+    is held at a time (a server-side cursor on PostgreSQL). ``archived``
+    gives the column values of the source's rows in the archive files,
+    which are merged in.
+    """
+    queryset = _ordered(queryset, params, date_field)
+    rows = queryset.values_list(date_field, *fields)
+    current = (build(*values) for values in rows.iterator(chunk_size=CHUNK_SIZE))
+    if archived is None:
+        return current
+    cold = (
+        build(*(row[field] for field in (date_field, *fields)))
+        for row in archive.read_history(queryset.model, params, archived)
+    )
+    return heapq.merge(cold, current, key=lambda row: row[0])
+
+
+def _sent(timestamp, id, receiver_id, amount, details):
+    return (timestamp, "TRANSFER_OUT", str(id), str(receiver_id), str(-amount), details or "")
+
+
+def _received(timestamp, id, sender_id, amount, received_amount, details):
+    if received_amount is not None:
+        amount = received_amount
+    return (timestamp, "TRANSFER_IN", str(id), str(sender_id), str(amount), details or "")
+
+
+def _event(timestamp, id, transaction_type, details):
+    return (timestamp, transaction_type, str(id), "", "", details or "")
+
+
+def _loan(timestamp, id, loan_amount, loan_duration):
+    return (timestamp, "LOAN", str(id), "", str(loan_amount), f"{loan_duration} months")
+
+
+def statement_rows(account, params):
+    """Merge the account's transfers, events and loans by time.
+
+    Each source is read in index order and merged lazily, so memory use
+    does not grow with the length of the history.
+    """
+    return heapq.merge(
+        _stream(
+            Transaction.objects.filter(sender=account),
+            params,
+            "timestamp",
+            ("id", "receiver_id", "amount", "details"),
+            _sent,
+            archived={"sender_id": account.id},
+        ),
+        _stream(
+            Transaction.objects.filter(receiver=account),
+            params,
+            "timestamp",
+            ("id", "sender_id", "amount", "received_amount", "details"),
+            _received,
+            archived={"receiver_id": account.id},
+        ),
+        _stream(
+            AccountTransaction.objects.filter(account=account),
+            params,
+            "timestamp",
+            ("id", "transaction_type", "details"),
+            _event,
+            archived={"account_id": account.id},
+        ),
+        _stream(
+            Loan.objects.filter(account=account),
+            params,
+            "created_at",
+            ("id", "loan_amount", "loan_duration"),
+            _loan,
+        ),
+        key=lambda row: row[0],
+    )
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _batched(lines, size=CHUNK_SIZE):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow((row[0].isoformat(),) + row[1:])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(
+            dict(zip(FIELDS, (row[0].isoformat(),) + row[1:])), separators=(",", ":")
+        ) + "\n"
+
+
+FORMATS = {
+    "csv": ("text/csv", csv_lines),
+    "ndjson": ("application/x-ndjson", ndjson_lines),
+}
+
+
+def render_statement(account, params, output):
+    """Return ``(content_type, chunks)`` for a streamed statement."""
+    content_type, encode = FORMATS[output]
+    return content_type, _batched(encode(statement_rows(account, params)))
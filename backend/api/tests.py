@@ -1,3 +1,1679 @@
-from django.test import TestCase
+import datetime
+import json
+import math
+import re
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
+from unittest.mock import AsyncMock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient,
+    Client,
+    RequestFactory,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import (
+    archive,
+    events,
+    fraud,
+    holdings,
+    idempotency,
+    ledger,
+    loans,
+    outbox,
+    scoring,
+    statements,
+    throttling,
+    transfers,
+)
+from .async_views import EventStreamView
+from .authentication import user_key
+from .caching import _version_key, user_version
+from .fx import FxError, RateTable, get_feed, load_rates
+from .management.commands import benchmark
+from .management.commands.benchmark_async import sync_only_middleware
+from .metrics import MetricsMiddleware, registry
+from .middleware import PrimaryPinningMiddleware
+from .prices import CSVReplayFeed, PriceService, UnknownSymbol
+from .renderers import ORJSONRenderer
+from .routers import PrimaryReplicaRouter, use_primary
+from .serializers import ValuesSerializer
+from .tokens import SlidingToken
+from .transfers import TransferError, transfer, transfer_batch
+from .views import (
+    AccountTransactionView,
+    LoanInstallmentView,
+    UserAccountListView,
+    UserTransactionView,
+)
+
+from .models import (
+    Account,
+    AccountTransaction,
+    FraudAlert,
+    FxRate,
+    Holding,
+    IdempotencyKey,
+    LedgerEntry,
+    Loan,
+    LoanInstallment,
+    OutboxEvent,
+    Purchase,
+    ScoringRun,
+    Transaction,
+    User,
+    UserTransaction,
+)
+
+
+class HotQueryPlanTests(TestCase):
+    """Fail if a hot lookup stops being answered from an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("plan@example.com", "Plan", "pw")
+        cls.account = Account.objects.create(
+            user=cls.user, balance=100, account_type="CHECKING", currency="USD"
+        )
+
+    def page_query(self, view_class, **kwargs):
+        """Build the page query a list view runs, from the view itself."""
+        request = RequestFactory().get("/")
+        force_authenticate(request, user=self.user)
+        view = view_class()
+        view.setup(request, **kwargs)
+        view.request = view.initialize_request(request)
+        view.format_kwarg = None
+        serializer = ValuesSerializer.for_serializer(view.get_serializer_class())
+        queryset = serializer.values(view.filter_queryset(view.get_queryset()))
+        return view.paginator.get_page_queryset(queryset, view.request, view)
+
+    def statement_queries(self):
+        """Capture the queryset each statement source streams from."""
+        ordered = statements._ordered
+        sources = []
+
+        def record(*args):
+            sources.append(ordered(*args))
+            return sources[-1]
+
+        with mock.patch.object(statements, "_ordered", side_effect=record):
+            statements.statement_rows(self.account, {})
+        return dict(zip(("sent", "received", "events", "loans"), sources))
+
+    def hot_queries(self):
+        loan = Loan.objects.create(
+            account=self.account, loan_amount=100, loan_duration=12
+        )
+        queries = {
+            "user accounts": self.page_query(UserAccountListView),
+            "user transactions": self.page_query(UserTransactionView),
+            "account transactions": self.page_query(AccountTransactionView),
+            "loan installments": self.page_query(LoanInstallmentView, id=loan.id),
+            "portfolio": holdings.portfolio_queryset(self.user),
+        }
+        for name, queryset in self.statement_queries().items():
+            queries[f"statement {name}"] = queryset
+        return queries
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite query plans")
+    def test_sqlite_plans_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertIsNone(
+                    re.search(r"\bSCAN api_\w+", plan),
+                    f"{name} scans a table:\n{plan}",
+                )
+
+    @skipUnless(connection.vendor == "postgresql", "PostgreSQL query plans")
+    def test_postgresql_plans_use_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertNotIn("Seq Scan", plan, f"{name} scans a table:\n{plan}")
+
+
+class DashboardQueryCountTests(TestCase):
+    """The dashboard's query count must not grow with the user's data."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("dash@example.com", "Dash", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_account(self):
+        account = Account.objects.create(
+            user=self.user, balance=5000, account_type="INVESTMENT", currency="USD"
+        )
+        loans.originate(account, Decimal("1000"), 12)
+        loans.originate(account, Decimal("500"), 6)
+        for symbol in ("AAPL", "MSFT"):
+            Holding.objects.create(
+                user=self.user,
+                account=account,
+                stock_symbol=symbol,
+                quantity=2,
+                cost_basis=Decimal("300.00"),
+            )
+        UserTransaction.objects.create(
+            user=self.user, transaction_type="ACCOUNT_CREATION", details="test"
+        )
+
+    def get_dashboard(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_query_count_is_constant(self):
+        self.add_account()
+        baseline, _ = self.get_dashboard()
+        for _ in range(4):
+            self.add_account()
+        count, data = self.get_dashboard()
+
+        self.assertEqual(count, baseline)
+        self.assertLessEqual(count, 5)
+        self.assertEqual(len(data["accounts"]), 5)
+        for account in data["accounts"]:
+            self.assertEqual(len(account["loans"]), 2)
+            self.assertEqual(len(account["holdings"]), 2)
+            self.assertEqual(account["loans"][0]["next_installment"]["number"], 1)
+        self.assertEqual(
+            [(p["stock_symbol"], p["total_quantity"]) for p in data["portfolio"]],
+            [("AAPL", 10), ("MSFT", 10)],
+        )
+        self.assertEqual(len(data["recent_activity"]), 5)
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("send@example.com", "Send", "pw")
+        self.other = User.objects.create_user("other@example.com", "Other", "pw")
+        self.account = Account.objects.create(
+            user=self.user, balance=100, account_type="CHECKING", currency="USD"
+        )
+        self.foreign = Account.objects.create(
+            user=self.other, balance=100, account_type="CHECKING", currency="USD"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, sender, receiver, amount="30.00"):
+        return self.client.post(
+            reverse("transactions"),
+            {"account": str(sender.id), "receiver": str(receiver.id), "amount": amount},
+            format="json",
+        )
+
+    def balances(self):
+        return [
+            Account.objects.get(id=account.id).balance
+            for account in (self.account, self.foreign)
+        ]
+
+    def test_transfer(self):
+        response = self.post(self.account, self.foreign)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.balances(), [Decimal("70.00"), Decimal("130.00")])
+        tx = Transaction.objects.get(id=response.data["transaction_id"])
+        self.assertEqual((tx.sender_id, tx.amount), (self.account.id, Decimal("30.00")))
+
+    def test_foreign_sender_is_not_found(self):
+        response = self.post(self.foreign, self.account)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.balances(), [Decimal("100.00"), Decimal("100.00")])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_anonymous_transfer_is_rejected(self):
+        self.client.force_authenticate(None)
+        response = self.post(self.account, self.foreign)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.balances(), [Decimal("100.00"), Decimal("100.00")])
+
+
+class TransferBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("batch@example.com", "Batch", "pw")
+        self.other = User.objects.create_user("batch2@example.com", "Other", "pw")
+        self.accounts = [
+            Account.objects.create(
+                user=self.user, balance=100, account_type="CHECKING", currency="USD"
+            )
+            for _ in range(3)
+        ]
+        self.foreign = Account.objects.create(
+            user=self.other, balance=100, account_type="CHECKING", currency="USD"
+        )
+
+    def row(self, sender, receiver, amount):
+        return {
+            "account": str(getattr(sender, "id", sender)),
+            "receiver": str(getattr(receiver, "id", receiver)),
+            "amount": amount,
+        }
+
+    def balance(self, account):
+        return Account.objects.get(id=account.id).balance
+
+    def test_accepted_rows_move_money_and_write_ledger_legs(self):
+        first, second, third = self.accounts
+        results = transfer_batch(
+            [
+                self.row(first, second, "30.00"),
+                self.row(second, third, "50.00"),
+                self.row(first, self.foreign, "20.00"),
+            ],
+            self.user,
+        )
+
+        self.assertEqual([result["status"] for result in results], ["accepted"] * 3)
+        self.assertEqual(
+            [self.balance(account) for account in (*self.accounts, self.foreign)],
+            [Decimal("50.00"), Decimal("80.00"), Decimal("150.00"), Decimal("120.00")],
+        )
+        tx = Transaction.objects.get(id=results[0]["transaction_id"])
+        self.assertEqual(
+            set(tx.ledger_entries.values_list("account_id", "book", "amount_minor")),
+            {(first.id, "CUSTOMER", -3000), (second.id, "CUSTOMER", 3000)},
+        )
+        self.assertEqual(
+            LedgerEntry.objects.filter(transaction__isnull=False).count(), 6
+        )
+
+    def test_overdrawing_row_is_rejected(self):
+        first, second, _ = self.accounts
+        results = transfer_batch(
+            [self.row(first, second, "80.00"), self.row(first, second, "30.00")],
+            self.user,
+        )
+
+        self.assertEqual(results[0]["status"], "accepted")
+        self.assertEqual(
+            results[1],
+            {"index": 1, "status": "rejected", "error": "Insufficient balance"},
+        )
+        self.assertEqual(self.balance(first), Decimal("20.00"))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_unknown_receiver_is_rejected(self):
+        results = transfer_batch(
+            [self.row(self.accounts[0], uuid.uuid4(), "10.00")], self.user
+        )
+
+        self.assertEqual(results[0]["error"], "Sender or receiver not found")
+        self.assertEqual(self.balance(self.accounts[0]), Decimal("100.00"))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_foreign_sender_is_rejected(self):
+        results = transfer_batch(
+            [self.row(self.foreign, self.accounts[0], "10.00")], self.user
+        )
+
+        self.assertEqual(
+            results[0]["error"], "Sender account does not belong to the user"
+        )
+        self.assertEqual(self.balance(self.foreign), Decimal("100.00"))
+        self.assertFalse(LedgerEntry.objects.filter(transaction__isnull=False).exists())
+
+    def test_batch_spanning_several_chunks(self):
+        receivers = [
+            Account.objects.create(
+                user=self.other, balance=0, account_type="SAVINGS", currency="USD"
+            )
+            for _ in range(4)
+        ]
+        rows = [
+            self.row(sender, receiver, "10.00")
+            for sender in self.accounts
+            for receiver in receivers
+        ]
+        with mock.patch.object(transfers, "BATCH_CHUNK_SIZE", 2):
+            with CaptureQueriesContext(connection) as queries:
+                results = transfer_batch(rows, self.user)
+
+        self.assertEqual([result["status"] for result in results], ["accepted"] * 12)
+        self.assertEqual(
+            [self.balance(account) for account in (*self.accounts, *receivers)],
+            [Decimal("60.00")] * 3 + [Decimal("30.00")] * 4,
+        )
+        updates = [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "api_account"')
+        ]
+        self.assertEqual(len(updates), 4)
+        self.assertEqual(Transaction.objects.count(), 12)
+        self.assertEqual(
+            LedgerEntry.objects.filter(transaction__isnull=False).count(), 24
+        )
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("idem@example.com", "Idem", "pw")
+        self.account = Account.objects.create(
+            user=self.user, balance=100, account_type="CHECKING", currency="USD"
+        )
+        self.receiver = Account.objects.create(
+            user=self.user, balance=0, account_type="SAVINGS", currency="USD"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, amount="30.00", key="key-1"):
+        return self.client.post(
+            reverse("transactions"),
+            {
+                "account": str(self.account.id),
+                "receiver": str(self.receiver.id),
+                "amount": amount,
+            },
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_duplicate_is_replayed(self):
+        first = self.post()
+        cache.clear()
+        second = self.post()
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_key_reused_for_a_different_request(self):
+        self.post()
+        response = self.post(amount="10.00")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_concurrent_duplicate_is_replayed(self):
+        first = self.post()
+        # The second request misses the lookup, as if both arrived together,
+        # and loses the race on the unique index.
+        with mock.patch.object(idempotency, "_find", return_value=None):
+            second = self.post()
+
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_failed_request_can_be_retried(self):
+        rejected = self.post(amount="500.00")
+        accepted = self.post()
+
+        self.assertEqual(rejected.status_code, 400)
+        self.assertEqual(accepted.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", accepted)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_anonymous_key_is_refused(self):
+        response = idempotency.idempotent(lambda view, request: None)(
+            None, mock.Mock(headers={idempotency.HEADER: "key-1"}, user=AnonymousUser())
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class StockTradeTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f"{directory.name}/prices.csv"
+        with open(path, "w") as f:
+            f.write("symbol,price\nAAPL,100.00\n")
+        override = override_settings(
+            MARKET_DATA={**settings.MARKET_DATA, "OPTIONS": {"path": path}}
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        self.user = User.objects.create_user("trade@example.com", "Trade", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def account(self, currency):
+        return Account.objects.create(
+            user=self.user, balance=1000, account_type="INVESTMENT", currency=currency
+        )
+
+    def trade(self, name, account):
+        return self.client.post(
+            reverse(name),
+            {"symbol": "AAPL", "quantity": 2, "account_id": str(account.id)},
+            format="json",
+        )
+
+    def balance(self, account):
+        return Account.objects.get(id=account.id).balance
+
+    def test_round_trip_in_the_quote_currency(self):
+        account = self.account("USD")
+
+        self.assertEqual(self.trade("buystocks", account).status_code, 201)
+        self.assertEqual(self.balance(account), Decimal("800.00"))
+        self.assertEqual(self.trade("sellstocks", account).status_code, 200)
+        self.assertEqual(self.balance(account), Decimal("1000.00"))
+
+    def test_other_currencies_cannot_trade(self):
+        for currency in ("TL", "JPY"):
+            account = self.account(currency)
+            Holding.objects.create(
+                user=self.user,
+                account=account,
+                stock_symbol="AAPL",
+                quantity=2,
+                cost_basis=Decimal("200.00"),
+            )
+            for name in ("buystocks", "sellstocks"):
+                with self.subTest(currency=currency, view=name):
+                    response = self.trade(name, account)
+
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn("USD", response.data["error"])
+                    self.assertEqual(self.balance(account), Decimal("1000.00"))
+
+
+class FxTests(TestCase):
+    def setUp(self):
+        load_rates(get_feed())
+        self.user = User.objects.create_user("fx@example.com", "Fx", "pw")
+
+    def account(self, currency, balance=0):
+        return Account.objects.create(
+            user=self.user, balance=balance, account_type="CHECKING", currency=currency
+        )
+
+    def test_cross_currency_transfer(self):
+        sender, receiver = self.account("USD", 100), self.account("EUR")
+
+        tx = transfer(sender.id, receiver.id, Decimal("10.00"), self.user)
+
+        self.assertEqual(tx.received_amount, Decimal("9.21"))
+        self.assertEqual(tx.fx_rate, Decimal("0.9212"))
+        receiver.refresh_from_db()
+        self.assertEqual(receiver.balance, Decimal("9.21"))
+        legs = sorted(
+            LedgerEntry.objects.filter(transaction=tx).values_list(
+                "book", "currency", "amount_minor"
+            )
+        )
+        self.assertEqual(
+            legs,
+            [
+                ("CUSTOMER", "EUR", 921),
+                ("CUSTOMER", "USD", -1000),
+                ("FX", "EUR", -921),
+                ("FX", "USD", 1000),
+            ],
+        )
+
+    def test_yen_is_credited_in_whole_units(self):
+        sender, receiver = self.account("USD", 100), self.account("JPY")
+
+        tx = transfer(sender.id, receiver.id, Decimal("10.01"), self.user)
+
+        self.assertEqual(tx.received_amount, Decimal("1500"))
+        receiver.refresh_from_db()
+        self.assertEqual(receiver.balance, Decimal("1500"))
+
+    def test_fractional_yen_is_rejected(self):
+        sender, receiver = self.account("JPY", 1000), self.account("USD")
+
+        with self.assertRaises(TransferError):
+            transfer(sender.id, receiver.id, Decimal("10.50"), self.user)
+
+    def test_total(self):
+        rates = RateTable(
+            {"USD": Decimal("1"), "EUR": Decimal("0.9212"), "JPY": Decimal("149.83")}
+        )
+        currencies = ["USD", "EUR", "JPY"]
+        amounts = [Decimal("10.00"), Decimal("9.212"), Decimal("1498.30")]
+
+        self.assertEqual(rates.total(currencies, amounts, "USD"), Decimal("30.00"))
+        self.assertEqual(rates.total(currencies, amounts, "JPY"), Decimal("4495"))
+        self.assertEqual(
+            rates.total(["EUR", "EUR"], amounts[:2], "EUR"), Decimal("19.212")
+        )
+        with self.assertRaises(FxError):
+            rates.total(["GBP"], [Decimal("1")], "USD")
+
+    def test_load_rates_validation(self):
+        for rates in (
+            {"USD": Decimal("1"), "XXX": Decimal("2")},
+            {"USD": Decimal("1"), "EUR": Decimal("0")},
+            {"USD": Decimal("2"), "EUR": Decimal("0.9")},
+            {"EUR": Decimal("0.9")},
+        ):
+            with self.subTest(rates=rates), self.assertRaises(FxError):
+                load_rates(mock.Mock(**{"fetch.return_value": rates}))
+        self.assertEqual(FxRate.objects.count(), 6)
+
+
+class ArchiveTests(TestCase):
+    OLD = datetime.datetime(2023, 1, 15, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(
+            ARCHIVE={**settings.ARCHIVE, "DIR": directory.name}
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user("archive@example.com", "Archive", "pw")
+        self.other = User.objects.create_user("kept@example.com", "Kept", "pw")
+        self.account = Account.objects.create(
+            user=self.user, balance=100, account_type="CHECKING", currency="USD"
+        )
+        self.payee = Account.objects.create(
+            user=self.other, balance=0, account_type="CHECKING", currency="USD"
+        )
+        for day in range(3):
+            moment = self.OLD + datetime.timedelta(days=day)
+            Transaction.objects.create(
+                sender=self.account, receiver=self.payee, amount=1, timestamp=moment
+            )
+            AccountTransaction.objects.create(
+                account=self.account, transaction_type="ACCOUNT_CREATION", timestamp=moment
+            )
+        Transaction.objects.create(sender=self.account, receiver=self.payee, amount=2)
+        AccountTransaction.objects.create(
+            account=self.account, transaction_type="ACCOUNT_CREATION"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def archive(self):
+        start = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+        with self.captureOnCommitCallbacks(execute=True):
+            return sum(archive.archive_month(model, start) for model in archive.ARCHIVED)
+
+    def history(self):
+        ids = []
+        url = reverse("account-transactions") + "?page_size=2"
+        while url:
+            page = self.client.get(url).json()
+            ids.extend(row["id"] for row in page["results"])
+            url = page["next"]
+        return ids
+
+    def test_round_trip(self):
+        history = self.history()
+        self.assertEqual(len(history), 4)
+        statement = self.client.get(
+            reverse("account-statement", args=[self.account.id]) + "?output=ndjson"
+        )
+        before = b"".join(statement.streaming_content)
+        versions = [user_version(self.user.pk), user_version(self.other.pk)]
+
+        self.assertEqual(self.archive(), 6)
+
+        self.assertEqual(list(Transaction.objects.values_list("amount", flat=True)), [2])
+        self.assertGreater(user_version(self.user.pk), versions[0])
+        self.assertGreater(user_version(self.other.pk), versions[1])
+        self.assertEqual(self.history(), history)
+        statement = self.client.get(
+            reverse("account-statement", args=[self.account.id]) + "?output=ndjson"
+        )
+        self.assertEqual(b"".join(statement.streaming_content), before)
+        self.assertEqual(len(before.splitlines()), 8)
+
+
+class StatementTests(TestCase):
+    START = datetime.datetime(2024, 3, 1, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(
+            ARCHIVE={**settings.ARCHIVE, "DIR": directory.name}
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user("statement@example.com", "Stmt", "pw")
+        other = User.objects.create_user("payer@example.com", "Payer", "pw")
+        self.account = Account.objects.create(
+            user=self.user, balance=100, account_type="CHECKING", currency="USD"
+        )
+        self.payee = Account.objects.create(
+            user=other, balance=100, account_type="CHECKING", currency="EUR"
+        )
+        self.at = [self.START + datetime.timedelta(hours=hour) for hour in range(4)]
+        loan = Loan.objects.create(
+            account=self.account, loan_amount=500, loan_duration=12
+        )
+        Loan.objects.filter(id=loan.id).update(created_at=self.at[3])
+        self.received = Transaction.objects.create(
+            sender=self.payee,
+            receiver=self.account,
+            amount=Decimal("10.00"),
+            received_amount=Decimal("11.00"),
+            fx_rate=Decimal("1.1"),
+            timestamp=self.at[2],
+        )
+        self.sent = Transaction.objects.create(
+            sender=self.account,
+            receiver=self.payee,
+            amount=Decimal("30.00"),
+            timestamp=self.at[1],
+            details="rent",
+        )
+        self.event = AccountTransaction.objects.create(
+            account=self.account,
+            transaction_type="DEPOSIT",
+            timestamp=self.at[0],
+            details="opening",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, **params):
+        return self.client.get(
+            reverse("account-statement", args=[self.account.id]), params
+        )
+
+    def body(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_merges_sources_by_time(self):
+        lines = self.body(self.get(output="csv")).splitlines()
+        payee = str(self.payee.id)
+
+        self.assertEqual(lines[0], ",".join(statements.FIELDS))
+        self.assertEqual(
+            [line.split(",")[1:] for line in lines[1:]],
+            [
+                ["DEPOSIT", str(self.event.id), "", "", "opening"],
+                ["TRANSFER_OUT", str(self.sent.id), payee, "-30.00", "rent"],
+                ["TRANSFER_IN", str(self.received.id), payee, "11.00", ""],
+                ["LOAN", str(Loan.objects.get().id), "", "500.00", "12 months"],
+            ],
+        )
+        self.assertEqual(lines[1].split(",")[0], self.at[0].isoformat())
+
+    def test_ndjson_merges_sources_by_time(self):
+        body = self.body(self.get(output="ndjson"))
+        rows = [json.loads(line) for line in body.splitlines()]
+
+        self.assertEqual(
+            [row["type"] for row in rows],
+            ["DEPOSIT", "TRANSFER_OUT", "TRANSFER_IN", "LOAN"],
+        )
+        self.assertEqual(
+            [row["timestamp"] for row in rows],
+            [moment.isoformat() for moment in self.at],
+        )
+        self.assertEqual(rows[2]["amount"], "11.00")
+
+    def test_filters_narrow_every_source(self):
+        since = self.at[1].isoformat()
+        until = self.at[2].isoformat()
+        rows = self.body(self.get(output="ndjson", since=since, until=until))
+
+        self.assertEqual(
+            [json.loads(line)["type"] for line in rows.splitlines()],
+            ["TRANSFER_OUT", "TRANSFER_IN"],
+        )
+
+    def test_invalid_filter_is_rejected_before_streaming(self):
+        response = self.get(since="last tuesday")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.streaming)
+        self.assertIn("since", response.json())
+
+    def test_unknown_output_is_rejected(self):
+        response = self.get(output="xlsx")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.streaming)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("outbox@example.com", "Outbox", "pw")
+        self.account = Account.objects.create(
+            user=self.user, account_type="CHECKING", currency="USD"
+        )
+
+    def publish_alert(self):
+        return OutboxEvent.objects.create(
+            kind="FRAUD_ALERT",
+            payload={
+                "alerts": [
+                    {
+                        "rule": "minute",
+                        "transaction_id": str(uuid.uuid4()),
+                        "sender_id": str(self.account.id),
+                        "receiver_id": str(self.account.id),
+                        "amount": "10.00",
+                        "details": {},
+                    }
+                ]
+            },
+        )
+
+    def test_drain_applies_and_deletes_events(self):
+        self.publish_alert()
+
+        self.assertEqual(outbox.drain(), 2)
+
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(UserTransaction.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            AccountTransaction.objects.filter(account=self.account).count(), 1
+        )
+        self.assertEqual(FraudAlert.objects.get().rule, "minute")
+
+    def test_failing_handler_only_fails_its_own_group(self):
+        alert = self.publish_alert()
+
+        def explode(events):
+            FraudAlert.objects.create(
+                rule="partial",
+                transaction_id=uuid.uuid4(),
+                sender=self.account,
+                receiver=self.account,
+                amount=1,
+            )
+            raise ValueError("feed offline")
+
+        handlers = {**outbox.HANDLERS, "FRAUD_ALERT": explode}
+        with mock.patch.object(outbox, "HANDLERS", handlers):
+            with self.assertLogs("api.outbox", "ERROR"):
+                self.assertEqual(outbox.drain(), 2)
+            self.assertEqual(outbox.drain(), 0)
+
+        self.assertEqual(list(OutboxEvent.objects.values_list("id", flat=True)), [alert.id])
+        alert.refresh_from_db()
+        self.assertIsNotNone(alert.failed_at)
+        self.assertEqual(alert.error, "ValueError: feed offline")
+        self.assertFalse(FraudAlert.objects.exists())
+        self.assertEqual(UserTransaction.objects.filter(user=self.user).count(), 1)
+
+    def test_unknown_kind_does_not_block_the_queue(self):
+        stray = OutboxEvent.objects.create(kind="RETIRED", payload={})
+
+        with self.assertLogs("api.outbox", "ERROR"):
+            self.assertEqual(outbox.drain(), 2)
+        self.assertEqual(outbox.drain(), 0)
+
+        self.assertEqual(list(OutboxEvent.objects.values_list("id", flat=True)), [stray.id])
+        stray.refresh_from_db()
+        self.assertIsNotNone(stray.failed_at)
+        self.assertEqual(stray.error, "Unknown kind")
+        self.assertEqual(UserTransaction.objects.filter(user=self.user).count(), 1)
+
+
+class FraudRuleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.accounts = [uuid.uuid4() for _ in range(5)]
+
+    def transfer(self, sender, receiver, amount="10.00", users=(1, 2), currency="USD"):
+        return fraud.Transfer(
+            uuid.uuid4(),
+            self.accounts[sender],
+            self.accounts[receiver],
+            *users,
+            Decimal(amount),
+            currency,
+        )
+
+    def evaluate(self, engine, *transfers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [hit["rule"] for hit in engine.evaluate(list(transfers))]
+
+    def test_sender_velocity(self):
+        engine = fraud.RuleEngine(
+            [fraud.SenderVelocity("minute", 60, max_count=3, max_amount="100.00")]
+        )
+        for _ in range(3):
+            self.assertEqual(self.evaluate(engine, self.transfer(0, 1)), [])
+        self.assertEqual(self.evaluate(engine, self.transfer(0, 1)), ["minute"])
+        self.assertEqual(self.evaluate(engine, self.transfer(2, 1, "100.00")), [])
+        self.assertEqual(self.evaluate(engine, self.transfer(2, 1, "0.01")), ["minute"])
+
+    def test_velocity_window_slides(self):
+        engine = fraud.RuleEngine([fraud.SenderVelocity("minute", 60, max_count=2)])
+        start = time.time()
+        with mock.patch("api.fraud.time.time", return_value=start):
+            self.evaluate(engine, self.transfer(0, 1), self.transfer(0, 1))
+        with mock.patch("api.fraud.time.time", return_value=start + 30):
+            self.assertEqual(self.evaluate(engine, self.transfer(0, 1)), ["minute"])
+        with mock.patch("api.fraud.time.time", return_value=start + 61):
+            self.assertEqual(self.evaluate(engine, self.transfer(0, 1)), [])
+
+    def test_new_receiver_burst(self):
+        engine = fraud.RuleEngine([fraud.NewReceiverBurst("new", 600, limit=2)])
+        hits = self.evaluate(
+            engine,
+            self.transfer(0, 1),
+            self.transfer(0, 2),
+            self.transfer(0, 1),
+            self.transfer(0, 4, users=(1, 1)),
+        )
+        self.assertEqual(hits, [])
+        self.assertEqual(self.evaluate(engine, self.transfer(0, 3)), ["new"])
+
+    def test_round_trip(self):
+        engine = fraud.RuleEngine([fraud.RoundTrip("round_trip", 3600)])
+        self.assertEqual(self.evaluate(engine, self.transfer(0, 1)), [])
+        self.assertEqual(self.evaluate(engine, self.transfer(1, 0)), ["round_trip"])
+        own = [self.transfer(2, 3, users=(1, 1)), self.transfer(3, 2, users=(1, 1))]
+        self.assertEqual(self.evaluate(engine, *own), [])
+
+    def test_rolled_back_transfers_do_not_count(self):
+        engine = fraud.RuleEngine([fraud.SenderVelocity("minute", 60, max_count=1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    engine.evaluate([self.transfer(0, 1)])
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(self.evaluate(engine, self.transfer(0, 1)), [])
+
+    def test_hits_are_recorded_through_the_outbox(self):
+        user = User.objects.create_user("fraud@example.com", "Fraud", "pw")
+        other = User.objects.create_user("mule@example.com", "Mule", "pw")
+        sender, receiver = (
+            Account.objects.create(user=owner, account_type="CHECKING", currency="USD")
+            for owner in (user, other)
+        )
+        self.accounts = [sender.id, receiver.id]
+        engine = fraud.RuleEngine([fraud.RoundTrip("round_trip", 3600)])
+        self.evaluate(engine, self.transfer(0, 1))
+        self.evaluate(engine, self.transfer(1, 0))
+        self.assertFalse(FraudAlert.objects.exists())
+
+        outbox.drain()
+
+        alert = FraudAlert.objects.get()
+        self.assertEqual(
+            (alert.rule, alert.sender_id, alert.receiver_id),
+            ("round_trip", receiver.id, sender.id),
+        )
+
+    def test_amounts_are_compared_in_the_base_currency(self):
+        load_rates(get_feed())
+        engine = fraud.RuleEngine(
+            [fraud.SenderVelocity("minute", 60, max_amount="10000.00")]
+        )
+
+        yen = self.transfer(0, 1, "1000000", currency="JPY")
+        self.assertEqual(self.evaluate(engine, yen), [])
+        self.assertEqual(
+            self.evaluate(engine, self.transfer(0, 1, "4000.00")), ["minute"]
+        )
+
+
+class AuthenticationCacheTests(TestCase):
+    def test_cached_user_has_no_password_hash(self):
+        cache.clear()
+        user = User.objects.create_user("auth@example.com", "Auth", "pw")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+        self.assertEqual(client.get(reverse("user-accounts")).status_code, 200)
+        entry = cache.get(user_key(user.pk))
+        self.assertNotIn(user.password, repr(entry))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(client.get(reverse("user-accounts")).status_code, 200)
+        self.assertFalse(any("api_user" in q["sql"] for q in queries.captured_queries))
+
+
+class PriceServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f"{directory.name}/prices.csv"
+        with open(self.path, "w") as f:
+            f.write("symbol,price\nAAPL,150.25\nAAPL,151.00\nMSFT,299.99\n")
+
+    def service(self, feed=None, **kwargs):
+        feed = feed or CSVReplayFeed(self.path)
+        feed.fetch = mock.Mock(wraps=feed.fetch)
+        return PriceService(feed, **kwargs)
+
+    def test_local_hit(self):
+        service = self.service()
+
+        self.assertEqual(service.quote("aapl"), Decimal("150.25"))
+        self.assertEqual(service.quote("AAPL"), Decimal("150.25"))
+        service.feed.fetch.assert_called_once_with(["AAPL"])
+
+    def test_lru_evicts_least_recently_used(self):
+        service = self.service(lru_size=1)
+        service.quotes(["AAPL", "MSFT"])
+
+        self.assertEqual(list(service.local), ["MSFT"])
+
+    def test_shared_cache_fallthrough(self):
+        first = self.service()
+        second = self.service()
+        first.quote("AAPL")
+
+        self.assertEqual(second.quote("AAPL"), Decimal("150.25"))
+        second.feed.fetch.assert_not_called()
+        self.assertIn("AAPL", second.local)
+
+    def test_expired_quote_is_refetched(self):
+        service = self.service(symbol_ttl={"aapl": 0})
+
+        self.assertEqual(service.quote("AAPL"), Decimal("150.25"))
+        self.assertEqual(service.quote("AAPL"), Decimal("151.00"))
+        self.assertEqual(service.feed.fetch.call_count, 2)
+
+    def test_unknown_symbol(self):
+        service = self.service()
+
+        with self.assertRaises(UnknownSymbol):
+            service.quotes(["AAPL", "NOPE"])
+        self.assertEqual(
+            service.quotes(["AAPL", "NOPE"], strict=False), {"AAPL": Decimal("150.25")}
+        )
+
+    def test_concurrent_refresh_is_single_flight(self):
+        feed = CSVReplayFeed(self.path)
+        replay = feed.fetch
+        release = threading.Event()
+
+        def slow_fetch(symbols):
+            release.wait(5)
+            return replay(symbols)
+
+        feed.fetch = slow_fetch
+        service = self.service(feed)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service.quote("AAPL")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [Decimal("150.25")] * 8)
+        service.feed.fetch.assert_called_once_with(["AAPL"])
+
+
+@override_settings(EVENTS={"BROKER": "api.events.LocalBroker", "OPTIONS": {}})
+class EventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("events@example.com", "Events", "pw")
+        self.other = User.objects.create_user("payee@example.com", "Payee", "pw")
+        self.account = Account.objects.create(
+            user=self.user, balance=100, account_type="CHECKING", currency="USD"
+        )
+        self.payee = Account.objects.create(
+            user=self.other, balance=0, account_type="CHECKING", currency="USD"
+        )
+
+    def send(self, rollback=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    tx = transfer(
+                        self.account.id, self.payee.id, Decimal("25.00"), self.user
+                    )
+                    if rollback:
+                        raise RuntimeError
+            except RuntimeError:
+                return None
+        return tx
+
+    async def receive(self, subscription):
+        message = await subscription.get(1)
+        return json.loads(message) if message else None
+
+    async def test_committed_transfer_is_delivered(self):
+        broker = events.get_broker()
+        payee = await broker.subscribe(str(self.other.pk))
+        sender = await broker.subscribe(str(self.user.pk))
+
+        tx = await sync_to_async(self.send)()
+
+        self.assertEqual(
+            await self.receive(sender),
+            {"type": "balance.changed", "accounts": [str(self.account.id)]},
+        )
+        self.assertEqual(
+            await self.receive(payee),
+            {"type": "balance.changed", "accounts": [str(self.payee.id)]},
+        )
+        self.assertEqual(
+            await self.receive(payee),
+            {
+                "type": "transfer.received",
+                "transfers": [
+                    {
+                        "id": str(tx.id),
+                        "account": str(self.payee.id),
+                        "amount": "25.00",
+                        "currency": "USD",
+                    }
+                ],
+            },
+        )
+        await payee.close()
+        await sender.close()
+
+    async def test_rolled_back_transfer_sends_nothing(self):
+        subscription = await events.get_broker().subscribe(str(self.other.pk))
+
+        await sync_to_async(self.send)(rollback=True)
+
+        self.assertIsNone(await subscription.get(0.1))
+        await subscription.close()
+
+    async def test_slow_subscriber_gets_resync(self):
+        broker = events.LocalBroker(queue_size=2)
+        subscription = await broker.subscribe("1")
+        for n in range(3):
+            broker.publish("1", json.dumps({"type": "balance.changed", "n": n}))
+
+        self.assertEqual(await subscription.get(1), events.RESYNC)
+        self.assertIsNone(await subscription.get(0.05))
+        await subscription.close()
+        self.assertEqual(broker.subscriptions, {})
+
+
+class HoldingBackfillTests(TestCase):
+    def test_legacy_purchases_become_holdings(self):
+        user = User.objects.create_user("legacy@example.com", "Legacy", "pw")
+        account = Account.objects.create(
+            user=user, balance=0, account_type="INVESTMENT", currency="USD"
+        )
+        Account.objects.create(
+            user=user, balance=0, account_type="INVESTMENT", currency="USD"
+        )
+        Purchase.objects.create(user=user, stock_symbol="AAPL", quantity=5)
+        Purchase.objects.create(user=user, stock_symbol="MSFT", quantity=0)
+
+        self.assertEqual(holdings.backfill(), (1, 0))
+        self.assertEqual(holdings.backfill(), (0, 0))
+
+        self.assertEqual(
+            list(Holding.objects.values_list("account_id", "stock_symbol", "quantity")),
+            [(account.id, "AAPL", 5)],
+        )
+        self.assertFalse(Purchase.objects.filter(account__isnull=True).exists())
+
+
+class CachedResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("cached@example.com", "Cached", "pw")
+        self.payer = User.objects.create_user("payer@example.com", "Payer", "pw")
+        self.account = Account.objects.create(
+            user=self.user, balance=10, account_type="CHECKING", currency="USD"
+        )
+        self.source = Account.objects.create(
+            user=self.payer, balance=100, account_type="CHECKING", currency="USD"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(reverse("user-accounts"), **headers)
+
+    def test_etag_answers_not_modified(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+
+        again = self.get(first["ETag"])
+
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+
+    def test_transfer_invalidates_the_receiver(self):
+        first = self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer(self.source.id, self.account.id, Decimal("5.00"), self.payer)
+
+        after = self.get(first["ETag"])
+
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after["ETag"], first["ETag"])
+        self.assertEqual(Decimal(after.data["results"][0]["balance"]), Decimal("15.00"))
+
+    def test_evicted_version_is_not_reused(self):
+        before = user_version(self.user.pk)
+        cache.delete(_version_key(self.user.pk))
+
+        self.assertGreater(user_version(self.user.pk), before)
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        self.store = throttling.LocalBucketStore()
+        patcher = mock.patch.object(throttling, "_store", self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = 1000.0
+        patcher = mock.patch(
+            "api.throttling.time.monotonic", side_effect=lambda: self.clock
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def drain(self, key, capacity, rate):
+        taken = 0
+        while self.store.take(key, capacity, rate)[0]:
+            taken += 1
+        return taken
+
+    def test_bucket_allows_a_burst_then_refills(self):
+        self.assertEqual(self.drain("key", 3, 1.0), 3)
+        self.assertEqual(self.store.take("key", 3, 1.0), (False, 1.0))
+
+        self.clock += 0.5
+        allowed, wait = self.store.take("key", 3, 1.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 0.5)
+
+        self.clock += 0.5
+        self.assertEqual(self.store.take("key", 3, 1.0), (True, 0.0))
+
+        self.clock += 3600
+        self.assertEqual(self.drain("key", 3, 1.0), 3)
+
+    def test_buckets_are_independent_and_bounded(self):
+        store = throttling.LocalBucketStore(max_keys=2)
+        for key in ("a", "b", "c"):
+            store.take(key, 1, 1.0)
+
+        self.assertEqual(list(store.buckets), ["b", "c"])
+        self.assertTrue(store.take("a", 1, 1.0)[0])
+        self.assertFalse(store.take("c", 1, 1.0)[0])
+
+    @override_settings(THROTTLING_ENABLED=True)
+    def test_each_configured_scope_empties_at_its_rate(self):
+        user = User.objects.create_user("scope@example.com", "Scope", "pw")
+        request = mock.Mock(method="GET", user=user)
+        for scope, rate in settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"].items():
+            with self.subTest(scope):
+                throttle = throttling.BucketThrottle()
+                capacity, duration = throttle.parse_rate(rate)
+                view = mock.Mock(throttle_scope=scope, throttle_view=None)
+
+                for _ in range(capacity):
+                    self.assertTrue(throttle.allow_request(request, view))
+                self.assertFalse(throttle.allow_request(request, view))
+                self.assertAlmostEqual(throttle.wait(), duration / capacity)
+
+    @override_settings(THROTTLING_ENABLED=True)
+    def test_empty_bucket_answers_429_with_retry_after(self):
+        rate = settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]["directory"]
+        capacity, duration = throttling.BucketThrottle().parse_rate(rate)
+        client = Client()
+        for _ in range(capacity):
+            self.assertEqual(client.get(reverse("user-list")).status_code, 200)
+
+        response = client.get(reverse("user-list"))
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response["Retry-After"]), math.ceil(duration / capacity))
+
+    @override_settings(THROTTLING_ENABLED=False)
+    def test_disabled_throttling_allows_everything(self):
+        request = mock.Mock(method="GET", user=AnonymousUser())
+        view = mock.Mock(throttle_scope="money", throttle_view=None)
+
+        throttle = throttling.BucketThrottle()
+        for _ in range(100):
+            self.assertTrue(throttle.allow_request(request, view))
+        self.assertFalse(self.store.buckets)
+
+
+class AsyncThrottleTests(TestCase):
+    @override_settings(
+        THROTTLING_ENABLED=True,
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"history": "2/min"},
+        },
+    )
+    def test_async_twin_shares_the_sync_budget(self):
+        user = User.objects.create_user("throttle@example.com", "Throttle", "pw")
+        client = Client(headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"})
+
+        for _ in range(2):
+            self.assertEqual(client.get(reverse("user-transactions")).status_code, 200)
+        response = client.get(reverse("async-user-transactions"))
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("metrics@example.com", "Metrics", "pw")
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def scrape(self):
+        response = Client().get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    @override_settings(METRICS={**settings.METRICS, "N_PLUS_ONE_THRESHOLD": 1})
+    def test_prometheus_output(self):
+        with self.assertLogs("api.metrics", "WARNING"):
+            Client(headers=self.headers).get(reverse("user-accounts"))
+
+        body = self.scrape()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertRegex(
+            body,
+            r'http_request_duration_seconds_bucket\{view="user-accounts",le="\+Inf"\} \d+',
+        )
+        self.assertRegex(body, r'n_plus_one_total\{view="user-accounts"\} \d+')
+
+    def test_async_chain_stays_async(self):
+        response = async_to_sync(AsyncClient().get)(
+            reverse("async-user-accounts"), headers=self.headers
+        )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(iscoroutinefunction(MetricsMiddleware(AsyncMock())))
+        key = ("db_queries_per_request", (("view", "async-user-accounts"),))
+        self.assertGreater(registry.histograms[key].sum, 0)
+
+
+class PrimaryPinningTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seen = []
+
+    def middleware(self, asynchronous=False):
+        def view(request):
+            self.seen.append(use_primary.get())
+            return HttpResponse()
+
+        async def async_view(request):
+            return view(request)
+
+        middleware = PrimaryPinningMiddleware(async_view if asynchronous else view)
+        middleware.enabled = True
+        middleware.window = 5
+        if asynchronous:
+            return async_to_sync(middleware)
+        return middleware
+
+    def requests(self, middleware, *methods, client="Bearer pin"):
+        factory = RequestFactory(headers={"Authorization": client})
+        for method in methods:
+            middleware(factory.generic(method, "/"))
+
+    def test_write_pins_the_client_to_the_primary(self):
+        for asynchronous in (False, True):
+            with self.subTest(asynchronous=asynchronous):
+                cache.clear()
+                self.seen = []
+                middleware = self.middleware(asynchronous)
+                self.requests(middleware, "GET", "POST", "GET")
+                self.requests(middleware, "GET", client="Bearer other")
+
+                self.assertEqual(self.seen, [False, True, True, False])
+
+    def test_pin_expires(self):
+        middleware = self.middleware()
+        self.requests(middleware, "POST")
+        later = time.time() + 6
+        with mock.patch("django.core.cache.backends.locmem.time.time") as now:
+            now.return_value = later
+            self.requests(middleware, "GET")
+
+        self.assertEqual(self.seen, [True, False])
+
+    def test_router_follows_the_pin(self):
+        router = PrimaryReplicaRouter()
+        with mock.patch.object(connections["default"], "in_atomic_block", False):
+            self.assertEqual(router.db_for_read(Account), "replica")
+            token = use_primary.set(True)
+            try:
+                self.assertEqual(router.db_for_read(Account), "default")
+            finally:
+                use_primary.reset(token)
+        self.assertEqual(router.db_for_read(Account), "default")
+        self.assertEqual(router.db_for_write(Account), "default")
+
+
+class BenchmarkTests(TestCase):
+    def test_every_named_route_is_benchmarked(self):
+        benchmark.check_coverage()
+
+    def test_write_routes_run_in_the_documented_order(self):
+        labels = [route[0] for route in benchmark.ROUTES]
+        writes = [route[0] for route in benchmark.ROUTES if route[2] != "GET"]
+
+        self.assertEqual(
+            writes,
+            [
+                "accounts create",
+                "account-preferences create",
+                "transactions",
+                "transactions/batch",
+                "stocks/buy",
+                "stocks/sell",
+                "loans create",
+                "loans/pay",
+            ],
+        )
+        # Sells draw on the shares the buys before them added.
+        self.assertLess(labels.index("stocks/buy"), labels.index("stocks/sell"))
+
+    def test_database_info_records_the_aliases(self):
+        info = benchmark.database_info()
+
+        self.assertEqual(info["vendor"], connection.vendor)
+        self.assertEqual((info["read"], info["write"]), ("default", "default"))
+        self.assertNotIn("password", {key.lower() for key in info})
+        password = connection.settings_dict.get("PASSWORD")
+        if password:
+            self.assertNotIn(password, json.dumps(info))
+
+    @override_settings(DATABASE_ROUTERS=["api.routers.PrimaryReplicaRouter"])
+    def test_database_info_follows_the_router(self):
+        with mock.patch.object(connections["default"], "in_atomic_block", False):
+            info = benchmark.database_info()
+
+        self.assertEqual((info["read"], info["write"]), ("replica", "default"))
+
+
+class AsyncViewTests(TestCase):
+    def test_no_sync_only_middleware(self):
+        self.assertEqual(sync_only_middleware(), [])
+
+    def test_event_stream_accepts_query_tokens(self):
+        user = User.objects.create_user("stream@example.com", "Stream", "pw")
+        for token in (AccessToken.for_user(user), SlidingToken.for_user(user)):
+            with self.subTest(token=type(token).__name__):
+                request = RequestFactory().get("/", {"token": str(token)})
+                found = async_to_sync(EventStreamView().authenticate)(request)
+
+                self.assertEqual(found.pk, user.pk)
+
+
+class LoanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("loan@example.com", "Loan", "pw")
+        self.account = Account.objects.create(
+            user=self.user, balance=1000, account_type="CHECKING", currency="USD"
+        )
+
+    def installments(self, loan):
+        return list(
+            loan.installments.order_by("number").values_list(
+                "paid_amount", "penalty", "status"
+            )
+        )
+
+    def test_schedule_sums_to_principal(self):
+        principal, interest = loans.amortize(Decimal("1000.00"), Decimal("0.065"), 12)
+
+        self.assertEqual(principal.sum(), 100000)
+        self.assertTrue((interest > 0).all())
+        self.assertTrue((interest[1:] <= interest[:-1]).all())
+
+    def test_last_installment_absorbs_rounding(self):
+        principal, _ = loans.amortize(Decimal("100.00"), Decimal("0"), 3)
+        yen, _ = loans.amortize(Decimal("1000"), Decimal("0"), 3, "JPY")
+
+        self.assertEqual(principal.tolist(), [3333, 3333, 3334])
+        self.assertEqual(yen.tolist(), [33300, 33300, 33400])
+
+    def test_payment_is_applied_to_the_oldest_installments(self):
+        loan = loans.originate(self.account, Decimal("1200.00"), 12, Decimal("0"))
+
+        loan = loans.pay(loan.id, self.user, Decimal("150.00"))
+
+        self.assertEqual(loan.loan_amount, Decimal("1050.00"))
+        self.assertEqual(
+            self.installments(loan)[:3],
+            [
+                (Decimal("100.00"), Decimal("0.00"), "PAID"),
+                (Decimal("50.00"), Decimal("0.00"), "PENDING"),
+                (Decimal("0.00"), Decimal("0.00"), "PENDING"),
+            ],
+        )
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("2050.00"))
+
+    def test_rejected_payments(self):
+        loan = loans.originate(self.account, Decimal("120.00"), 12, Decimal("0"))
+        other = User.objects.create_user("payer@example.com", "Payer", "pw")
+
+        with self.assertRaises(loans.LoanError):
+            loans.pay(loan.id, self.user, Decimal("120.01"))
+        with self.assertRaises(loans.LoanNotFound):
+            loans.pay(loan.id, other, Decimal("10.00"))
+        self.assertEqual(
+            LoanInstallment.objects.filter(paid_amount__gt=0).count(), 0
+        )
+
+        loan = loans.pay(loan.id, self.user, Decimal("120.00"))
+        self.assertEqual((loan.status, loan.loan_amount), ("PAID", Decimal("0.00")))
+
+    def test_yen_amounts_are_whole(self):
+        account = Account.objects.create(
+            user=self.user, balance=0, account_type="CHECKING", currency="JPY"
+        )
+        loan = loans.originate(account, Decimal("100000"), 12)
+
+        amounts = list(loan.installments.values_list("amount", flat=True))
+        self.assertEqual(amounts, [amount.to_integral_value() for amount in amounts])
+        with self.assertRaises(loans.LoanError):
+            loans.pay(loan.id, self.user, Decimal("10.50"))
+        with self.assertRaises(loans.LoanError):
+            loans.originate(account, Decimal("1000.50"), 12)
+
+        today = datetime.date.today()
+        loan.installments.filter(number=1).update(
+            status="OVERDUE", accrued_on=today - datetime.timedelta(days=7)
+        )
+        loans.accrue_penalties(today)
+        penalty = loan.installments.get(number=1).penalty
+        self.assertGreater(penalty, 0)
+        self.assertEqual(penalty, penalty.to_integral_value())
+
+    def test_penalties_accrue_once_per_day(self):
+        daily_rate = Decimal(settings.LOANS["PENALTY_RATE"]) / 365
+        for _ in range(2):
+            loans.originate(self.account, Decimal("300.00"), 3, Decimal("0"))
+        today = datetime.date.today() + datetime.timedelta(days=100)
+        overdue = LoanInstallment.objects.filter(due_date__lt=today).order_by("pk")
+
+        result = loans.accrue(today, batch_size=2)
+
+        self.assertEqual(result["installments_overdue"], overdue.count())
+        self.assertEqual(result["installments_accrued"], overdue.count())
+        self.assertEqual(result["loans_overdue"], 2)
+        for installment in overdue.all():
+            days = (today - installment.due_date).days
+            self.assertEqual(
+                installment.penalty,
+                ledger.quantize(installment.amount * daily_rate * days),
+            )
+
+        penalties = list(overdue.values_list("penalty", flat=True))
+        self.assertEqual(loans.accrue_penalties(today, batch_size=2), 0)
+        self.assertEqual(list(overdue.values_list("penalty", flat=True)), penalties)
+
+        tomorrow = today + datetime.timedelta(days=1)
+        self.assertEqual(loans.accrue_penalties(tomorrow, batch_size=1), overdue.count())
+        for installment, before in zip(overdue.all(), penalties):
+            self.assertEqual(
+                installment.penalty,
+                ledger.quantize(before + (installment.amount + before) * daily_rate),
+            )
+
+
+class ScoringTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        user = User.objects.create_user("score@example.com", "Score", "pw")
+        self.accounts = [
+            Account.objects.create(
+                user=user, balance=100, account_type="CHECKING", currency="USD"
+            )
+            for _ in range(4)
+        ]
+        earlier = self.now - datetime.timedelta(days=2)
+        Account.objects.update(credit_score=700, updated_at=earlier)
+        LedgerEntry.objects.update(created_at=earlier)
+        ScoringRun.objects.create(
+            started_at=self.now - datetime.timedelta(hours=1),
+            finished_at=self.now - datetime.timedelta(hours=1),
+        )
+
+    def pay(self, sender, receiver, timestamp):
+        Transaction.objects.create(
+            sender=sender, receiver=receiver, amount=30, timestamp=timestamp
+        )
+
+    def scores(self):
+        return [
+            Account.objects.get(id=account.id).credit_score for account in self.accounts
+        ]
+
+    def test_features_and_score(self):
+        a, b = self.accounts[:2]
+        self.pay(a, b, self.now)
+        self.pay(a, b, self.now - scoring.SCORING_WINDOW - datetime.timedelta(days=1))
+
+        f = scoring.features([a.id, b.id], np.array([100.0, 100.0]), self.now)
+
+        self.assertEqual(f["outflow"].tolist(), [30, 0])
+        self.assertEqual(f["inflow"].tolist(), [0, 30])
+        self.assertEqual(f["transfers"].tolist(), [1, 1])
+        scores = scoring.score(f)
+        self.assertGreater(scores[1], scores[0])
+        idle = {name: np.zeros(1) for name in f}
+        self.assertEqual(scoring.score(idle).tolist(), [scoring.BASE_SCORE])
+        self.assertLess(scoring.score({**idle, "overdue": np.ones(1)})[0], 600)
+
+    def test_incremental_run_skips_untouched_accounts(self):
+        a, b, c, d = self.accounts
+        self.pay(a, b, self.now)
+
+        self.assertEqual(scoring.run().accounts_scored, 2)
+        self.assertEqual(self.scores()[2:], [700, 700])
+        self.assertNotIn(700, self.scores()[:2])
+
+    def test_activity_leaving_the_window_rescores_idle_accounts(self):
+        a, b, c, d = self.accounts
+        aged = self.now - scoring.SCORING_WINDOW - datetime.timedelta(minutes=10)
+        self.pay(c, d, aged)
+
+        self.assertEqual(scoring.run().accounts_scored, 2)
+        self.assertEqual(
+            self.scores(), [700, 700, scoring.BASE_SCORE, scoring.BASE_SCORE]
+        )
+
+
+class RendererTests(TestCase):
+    def test_matches_drf_json_renderer(self):
+        utc = datetime.timezone.utc
+        data = {
+            "rates_as_of": datetime.datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=utc),
+            "offset": datetime.datetime(
+                2024, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=3))
+            ),
+            "naive": datetime.datetime(2024, 5, 1, 12, 0),
+            "date": datetime.date(2024, 1, 2),
+            "time": datetime.time(3, 4, 5),
+            "elapsed": datetime.timedelta(seconds=90),
+            "amount": Decimal("12.30"),
+            "id": uuid.UUID("4c871ce1-5f77-4d12-9ae3-30c175635501"),
+            1: "integer key",
+            "rows": [{"flag": True, None: 2.5}],
+            "text": "caf\u00e9 \u2028",
+        }
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class LedgerAuditTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ledger@example.com", "Ledger", "pw")
+        self.accounts = [
+            Account.objects.create(
+                user=self.user, balance=100, account_type="CHECKING", currency="USD"
+            )
+            for _ in range(4)
+        ]
+
+    def move(self):
+        for sender, receiver in zip(self.accounts, self.accounts[1:]):
+            transfer(sender.id, receiver.id, Decimal("1.25"), self.user)
+
+    def test_recompute_runs_a_fixed_number_of_queries(self):
+        self.move()
+        with mock.patch.object(ledger, "CHECKPOINT_LAG", datetime.timedelta(0)):
+            self.assertEqual(ledger.checkpoint(), 4)
+        self.move()
+
+        with self.assertNumQueries(3):
+            self.assertEqual(ledger.recompute(), {})
+        self.assertEqual(ledger.recompute(full=True), {})
+
+    def test_recompute_reports_drift(self):
+        self.move()
+        drifted = self.accounts[0]
+        Account.objects.filter(id=drifted.id).update(balance=F("balance") + 1)
+
+        self.assertEqual(
+            ledger.recompute(),
+            {drifted.id: (Decimal("99.75"), Decimal("98.75"))},
+        )
+
+
+class AnonymousAccessTests(TestCase):
+    def test_user_scoped_lists_require_authentication(self):
+        for name in ("user-transactions", "accountpreferences"):
+            with self.subTest(name):
+                self.assertEqual(APIClient().get(reverse(name)).status_code, 401)
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Refill, take and store in one round trip; TIME keeps every app server on
+# the Redis clock. Returns {allowed, seconds to wait} (the latter as a
+# string, since Lua numbers come back truncated to integers).
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+
+class LocalBucketStore:
+    """Token buckets in process memory, bounded to ``max_keys`` (LRU)."""
+
+    def __init__(self, max_keys=10000):
+        self.buckets = OrderedDict()
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        now = time.monotonic()
+        with self.lock:
+            tokens, ts = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * rate)
+            if tokens >= cost:
+                tokens, allowed, wait = tokens - cost, True, 0.0
+            else:
+                allowed, wait = False, (cost - tokens) / rate
+            self.buckets[key] = (tokens, now)
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return allowed, wait
+
+
+class RedisBucketStore:
+    """Token buckets shared by every process through one atomic Lua script.
+
+    If Redis is unreachable the bucket is taken from a local store instead,
+    so an outage degrades limits to per-process rather than failing requests.
+    """
+
+    key_prefix = "throttle:"
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+        self.fallback = LocalBucketStore()
+
+    def take(self, key, capacity, rate, cost=1):
+        try:
+            allowed, wait = self.script(
+                keys=[self.key_prefix + key], args=[capacity, rate, cost]
+            )
+        except redis.RedisError:
+            logger.warning("Throttle store unavailable; using in-process buckets.")
+            return self.fallback.take(key, capacity, rate, cost)
+        return bool(allowed), float(wait)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            config = settings.CACHES["default"]
+            if redis is not None and config["BACKEND"].endswith("RedisCache"):
+                _store = RedisBucketStore(config["LOCATION"])
+            else:
+                _store = LocalBucketStore()
+        return _store
+
+
+@receiver(setting_changed)
+def reset_bucket_store(setting, **kwargs):
+    global _store
+    if setting == "CACHES":
+        _store = None
+
+
+class BucketThrottle(SimpleRateThrottle):
+    """Token-bucket throttle keyed by scope, view class and user (or IP).
+
+    Views pick a budget with ``throttle_scope``, either a scope name or a
+    ``{method: scope}`` mapping; other views fall back to the ``user`` or
+    ``anon`` scope. A rate of ``N/period`` is a bucket holding N requests
+    that refills at N per period, so short bursts pass but floods do not.
+    Rates come from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]. A view that
+    serves the same data as another, such as an async twin, names it in
+    ``throttle_view`` to draw from the same bucket.
+    """
+
+    def __init__(self):
+        # Rates are resolved per request in allow_request().
+        pass
+
+    def get_scope(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if isinstance(scope, dict):
+            scope = scope.get(request.method)
+        if scope:
+            return scope
+        return "user" if request.user and request.user.is_authenticated else "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        name = getattr(view, "throttle_view", None) or type(view).__name__
+        return f"{self.scope}:{name}:{ident}"
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLING_ENABLED:
+            return True
+        self.scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if rate is None:
+            return True
+        num_requests, duration = self.parse_rate(rate)
+        allowed, self.wait_seconds = get_bucket_store().take(
+            self.get_cache_key(request, view), num_requests, num_requests / duration
+        )
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import serializers, tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+
+# Longest access token lifetime allowed when revocations stay in one
+# process's cache.
+UNSHARED_CACHE_MAX_LIFETIME = timedelta(seconds=30)
+
+
+def revoked_key(jti):
+    return f"jwt-revoked:{jti}"
+
+
+def _remaining(token):
+    seconds = (datetime_from_epoch(token["exp"]) - aware_utcnow()).total_seconds()
+    return max(int(seconds), 1)
+
+
+class CachedBlacklistMixin:
+    """Answer blacklist checks from the cache before the token_blacklist tables.
+
+    Blacklisting writes through to the cache, so with a shared cache a
+    revoked token is rejected everywhere at once. "Not blacklisted" is only
+    remembered for AUTH_CACHE["BLACKLIST_TTL"] seconds, which bounds how
+    long a per-process cache can miss a revocation made elsewhere.
+    """
+
+    def check_blacklist(self):
+        key = revoked_key(self.payload[api_settings.JTI_CLAIM])
+        revoked = cache.get(key)
+        if revoked is None:
+            revoked = BlacklistedToken.objects.filter(
+                token__jti=self.payload[api_settings.JTI_CLAIM]
+            ).exists()
+            timeout = _remaining(self) if revoked else settings.AUTH_CACHE["BLACKLIST_TTL"]
+            cache.set(key, revoked, timeout)
+        if revoked:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        cache.set(revoked_key(self.payload[api_settings.JTI_CLAIM]), True, _remaining(self))
+        return result
+
+
+class RefreshToken(CachedBlacklistMixin, tokens.RefreshToken):
+    pass
+
+
+class SlidingToken(CachedBlacklistMixin, tokens.SlidingToken):
+    pass
+
+
+def revoke(token):
+    """Revoke a validated token until it expires.
+
+    Refresh and sliding tokens go on the blacklist. Access tokens have no
+    database record, so they are revoked in the cache only; their lifetime
+    bounds the damage if the cache is flushed, and check_access_lifetime()
+    keeps it short unless the cache is shared.
+    """
+    if isinstance(token, CachedBlacklistMixin):
+        token.blacklist()
+    else:
+        cache.set(revoked_key(token[api_settings.JTI_CLAIM]), True, _remaining(token))
+
+
+def _shared_cache():
+    backend = settings.CACHES["default"]["BACKEND"]
+    return not backend.endswith(("LocMemCache", "DummyCache"))
+
+
+@checks.register(checks.Tags.security)
+def check_access_lifetime(app_configs, **kwargs):
+    lifetime = api_settings.ACCESS_TOKEN_LIFETIME
+    if lifetime <= UNSHARED_CACHE_MAX_LIFETIME or _shared_cache():
+        return []
+    return [
+        checks.Error(
+            f"Access tokens live {int(lifetime.total_seconds())}s but revocations "
+            "are kept in a per-process cache, so a logged-out token stays valid "
+            "on other workers until it expires.",
+            hint="Set REDIS_URL, or JWT_ACCESS_TOKEN_LIFETIME to 30 or less.",
+            id="api.E001",
+        )
+    ]
+
+
+class TokenObtainPairSerializer(serializers.TokenObtainPairSerializer):
+    token_class = RefreshToken
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+class TokenObtainSlidingSerializer(serializers.TokenObtainSlidingSerializer):
+    token_class = SlidingToken
+
+
+class TokenRefreshSlidingSerializer(serializers.TokenRefreshSlidingSerializer):
+    token_class = SlidingToken
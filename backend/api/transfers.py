@@ -0,0 +1,298 @@
+import uuid
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+
+from . import events, fraud, ledger
+from .caching import invalidate_users
+from .fx import FxError, get_fx_service
+from .models import Account, LedgerEntry, Transaction
+
+
+BATCH_MAX_ROWS = 100000
+BATCH_CHUNK_SIZE = 1000
+RATE_PLACES = Decimal("1e-10")
+
+
+class TransferError(Exception):
+    status_code = 400
+
+
+class AccountNotFound(TransferError):
+    status_code = 404
+
+
+class InsufficientBalance(TransferError):
+    pass
+
+
+def _check_amount(amount, currency):
+    if amount != ledger.quantize(amount, currency):
+        raise TransferError(f"Amount has more decimal places than {currency} allows")
+
+
+def _convert(amount, source, target):
+    """Return the amount the receiver gets and the rate used (None if none)."""
+    if source == target:
+        return amount, None
+    try:
+        rates = get_fx_service().current()
+        received = rates.convert(amount, source, target)
+        rate = rates.rate(source, target)
+    except FxError as e:
+        raise TransferError(str(e))
+    if received <= 0:
+        raise TransferError("Amount is too small to convert")
+    return received, rate.quantize(RATE_PLACES)
+
+
+def _legs(sender_id, receiver_id, source, target, amount, received):
+    """Ledger legs for a transfer; conversions go through the FX book."""
+    if source == target:
+        return [
+            (sender_id, "CUSTOMER", source, -amount),
+            (receiver_id, "CUSTOMER", target, amount),
+        ]
+    return [
+        (sender_id, "CUSTOMER", source, -amount),
+        (None, "FX", source, amount),
+        (None, "FX", target, -received),
+        (receiver_id, "CUSTOMER", target, received),
+    ]
+
+
+def _publish(owners, received):
+    """Queue push events for a committed set of transfers.
+
+    ``owners`` maps every changed account to its user; ``received`` holds
+    ``(transaction, receiver_id, amount, currency)`` per transfer. Each user
+    gets at most one event of each kind.
+    """
+    changed = {}
+    for account_id, user_id in owners.items():
+        changed.setdefault(user_id, []).append(account_id)
+    arrivals = {}
+    for tx, receiver_id, amount, currency in received:
+        arrivals.setdefault(owners[receiver_id], []).append(
+            {"id": tx.id, "account": receiver_id, "amount": amount, "currency": currency}
+        )
+    for user_id, account_ids in changed.items():
+        events.publish(user_id, "balance.changed", accounts=account_ids)
+    for user_id, transfers in arrivals.items():
+        events.publish(user_id, "transfer.received", transfers=transfers)
+
+
+def _parse_account_id(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise AccountNotFound("Sender or receiver not found")
+
+
+def transfer(sender_id, receiver_id, amount, user, details=""):
+    """Move amount from one of ``user``'s accounts in a single transaction.
+
+    Both rows are locked in primary key order so that concurrent transfers
+    touching the same pair of accounts cannot deadlock, and each leg is a
+    single conditional UPDATE instead of a fetch followed by save(). The
+    matching ledger entries are appended in the same transaction. Between
+    accounts in different currencies the receiver is credited the amount
+    converted at the current rate. A sender that is not ``user``'s is
+    reported as not found. The fraud rules run while the rows are
+    locked; their hits are recorded but never stop the transfer.
+    """
+    sender_id = _parse_account_id(sender_id)
+    receiver_id = _parse_account_id(receiver_id)
+    if sender_id == receiver_id:
+        raise TransferError("Sender and receiver must be different accounts")
+
+    with transaction.atomic():
+        locked = {
+            account_id: (currency, user_id)
+            for account_id, currency, user_id in Account.objects.select_for_update()
+            .filter(Q(id=sender_id, user_id=user.pk) | Q(id=receiver_id))
+            .order_by("id")
+            .values_list("id", "currency", "user_id")
+        }
+        if len(locked) != 2:
+            raise AccountNotFound("Sender or receiver not found")
+        source, target = locked[sender_id][0], locked[receiver_id][0]
+        _check_amount(amount, source)
+        received, rate = _convert(amount, source, target)
+
+        if not ledger.debit(sender_id, amount):
+            raise InsufficientBalance("Insufficient balance")
+        ledger.credit(receiver_id, received)
+
+        tx = Transaction.objects.create(
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            amount=amount,
+            received_amount=received if rate else None,
+            fx_rate=rate,
+            details=details,
+        )
+        ledger.append_entries(
+            _legs(sender_id, receiver_id, source, target, amount, received),
+            transaction=tx,
+        )
+        fraud.evaluate(
+            [
+                fraud.Transfer(
+                    tx.id,
+                    sender_id,
+                    receiver_id,
+                    locked[sender_id][1],
+                    locked[receiver_id][1],
+                    amount,
+                    source,
+                )
+            ]
+        )
+        invalidate_users(*(user_id for _, user_id in locked.values()))
+        _publish(
+            {account_id: user_id for account_id, (_, user_id) in locked.items()},
+            [(tx, receiver_id, received, target)],
+        )
+        return tx
+
+
+def _parse_batch_row(row):
+    if not isinstance(row, dict):
+        raise TransferError("Each transfer must be an object")
+    try:
+        sender_id = uuid.UUID(str(row.get("account")))
+        receiver_id = uuid.UUID(str(row.get("receiver")))
+    except ValueError:
+        raise TransferError("Valid sender and receiver IDs are required")
+    if sender_id == receiver_id:
+        raise TransferError("Sender and receiver must be different accounts")
+    try:
+        amount = ledger.parse_amount(row.get("amount"))
+    except ValueError as e:
+        raise TransferError(str(e))
+    if amount <= 0:
+        raise TransferError("Amount must be greater than zero")
+    return sender_id, receiver_id, amount, row.get("details", "")
+
+
+def _chunks(items, size=None):
+    size = size or BATCH_CHUNK_SIZE
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def transfer_batch(rows, user):
+    """Apply a list of transfers with a fixed number of statements per chunk.
+
+    Rows are validated up front, every referenced account is locked once,
+    and the accepted rows are folded into one net delta per account which
+    is written with a CASE expression. Rows that fail validation or would
+    overdraw their sender are reported back and skipped; all accepted rows
+    commit together. Senders must belong to ``user``.
+    """
+    if len(rows) > BATCH_MAX_ROWS:
+        raise TransferError(f"A batch may contain at most {BATCH_MAX_ROWS} transfers")
+
+    results = [None] * len(rows)
+    parsed = []
+    for index, row in enumerate(rows):
+        try:
+            parsed.append((index, *_parse_batch_row(row)))
+        except TransferError as e:
+            results[index] = {"index": index, "status": "rejected", "error": str(e)}
+
+    with transaction.atomic():
+        account_ids = sorted({p[1] for p in parsed} | {p[2] for p in parsed})
+        accounts = {}
+        for chunk in _chunks(account_ids):
+            for account_id, balance, user_id, currency in (
+                Account.objects.select_for_update()
+                .filter(id__in=chunk)
+                .order_by("id")
+                .values_list("id", "balance", "user_id", "currency")
+            ):
+                accounts[account_id] = [balance, user_id, currency]
+
+        deltas = {}
+        transactions = []
+        entries = []
+        received_rows = []
+        checked = []
+        for index, sender_id, receiver_id, amount, details in parsed:
+            error = None
+            if sender_id not in accounts or receiver_id not in accounts:
+                error = "Sender or receiver not found"
+            elif accounts[sender_id][1] != user.pk:
+                error = "Sender account does not belong to the user"
+            elif accounts[sender_id][0] < amount:
+                error = "Insufficient balance"
+            else:
+                source, target = accounts[sender_id][2], accounts[receiver_id][2]
+                try:
+                    _check_amount(amount, source)
+                    received, rate = _convert(amount, source, target)
+                except TransferError as e:
+                    error = str(e)
+            if error:
+                results[index] = {"index": index, "status": "rejected", "error": error}
+                continue
+
+            accounts[sender_id][0] -= amount
+            accounts[receiver_id][0] += received
+            deltas[sender_id] = deltas.get(sender_id, Decimal("0")) - amount
+            deltas[receiver_id] = deltas.get(receiver_id, Decimal("0")) + received
+            tx = Transaction(
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                amount=amount,
+                received_amount=received if rate else None,
+                fx_rate=rate,
+                details=details,
+            )
+            transactions.append(tx)
+            received_rows.append((tx, receiver_id, received, target))
+            checked.append(
+                fraud.Transfer(
+                    tx.id,
+                    sender_id,
+                    receiver_id,
+                    accounts[sender_id][1],
+                    accounts[receiver_id][1],
+                    amount,
+                    source,
+                )
+            )
+            entries.extend(
+                ledger.build_entries(
+                    _legs(sender_id, receiver_id, source, target, amount, received),
+                    transaction=tx,
+                )
+            )
+            results[index] = {
+                "index": index,
+                "status": "accepted",
+                "transaction_id": tx.id,
+            }
+
+        now = timezone.now()
+        for chunk in _chunks(list(deltas.items())):
+            Account.objects.filter(id__in=[account_id for account_id, _ in chunk]).update(
+                balance=F("balance")
+                + Case(
+                    *[When(id=account_id, then=Value(delta)) for account_id, delta in chunk],
+                    output_field=DecimalField(max_digits=16, decimal_places=2),
+                ),
+                updated_at=now,
+            )
+        Transaction.objects.bulk_create(transactions, batch_size=BATCH_CHUNK_SIZE)
+        LedgerEntry.objects.bulk_create(entries, batch_size=BATCH_CHUNK_SIZE)
+        fraud.evaluate(checked)
+        invalidate_users(*(accounts[account_id][1] for account_id in deltas))
+        _publish(
+            {account_id: accounts[account_id][1] for account_id in deltas}, received_rows
+        )
+
+    return results
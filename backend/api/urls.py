@@ -1,11 +1,23 @@
 from django.urls import path
 from .views import *
+from .async_views import (
+    AsyncLoanView,
+    EventStreamView,
+    AsyncPortfolioView,
+    AsyncUserAccountListView,
+    AsyncUserTransactionView,
+)
 
 urlpatterns = [
     path("users/", UserListView.as_view(), name="user-list"),
     path("users/accounts/", UserAccountListView.as_view(), name="user-accounts"),
     path("accounts/", AccountCreateView.as_view(), name="account-create"),
     path("accounts/<uuid:id>/", AccountRetrieveView.as_view(), name="account-retrieve"),
+    path(
+        "accounts/<uuid:id>/statement/",
+        AccountStatementView.as_view(),
+        name="account-statement",
+    ),
     path(
         "account-transactions/",
         AccountTransactionView.as_view(),
@@ -22,9 +34,38 @@ urlpatterns = [
         name="accountpreferences",
     ),
     path("transactions/", TransactionView.as_view(), name="transactions"),
+    path(
+        "transactions/batch/",
+        TransactionBatchView.as_view(),
+        name="transactions-batch",
+    ),
     path("stocks/buy/", BuyStockView.as_view(), name="buystocks"),
     path("stocks/sell/", SellStockView.as_view(), name="sellstocks"),
     path("stocks/portfolio/", PortfolioView.as_view(), name="portfolio"),
+    path("users/net-worth/", NetWorthView.as_view(), name="net-worth"),
+    path("dashboard/", DashboardView.as_view(), name="dashboard"),
     path("loans/", LoanView.as_view(), name="loans"),
     path("loans/pay/", LoanPaymentView.as_view(), name="loan-payment"),
+    path(
+        "loans/<uuid:id>/installments/",
+        LoanInstallmentView.as_view(),
+        name="loan-installments",
+    ),
+    path(
+        "async/users/accounts/",
+        AsyncUserAccountListView.as_view(),
+        name="async-user-accounts",
+    ),
+    path(
+        "async/user-transactions/",
+        AsyncUserTransactionView.as_view(),
+        name="async-user-transactions",
+    ),
+    path(
+        "async/stocks/portfolio/",
+        AsyncPortfolioView.as_view(),
+        name="async-portfolio",
+    ),
+    path("async/loans/", AsyncLoanView.as_view(), name="async-loans"),
+    path("events/", EventStreamView.as_view(), name="events"),
 ]
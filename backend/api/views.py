@@ -7,31 +7,67 @@ from .serializers import *
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-
-from django.db.models import Sum
-from django.http import JsonResponse
+from rest_framework.parsers import JSONParser
+from rest_framework_simplejwt import views as jwt_views
+from . import events, holdings, loans, statements
+from .caching import cached_response, invalidate_users
+from .filters import filter_history
+from .fx import FxError, get_fx_service
+from .holdings import HoldingError
+from .idempotency import idempotent
+from .loans import LoanError
+from .pagination import ArchiveKeysetPagination, KeysetPagination
+from .parsers import NDJSONParser
+from .prices import UnknownSymbol, get_price_service
+from .ledger import append_entries, credit, debit, parse_amount, parse_decimal, quantize
+from .tokens import RefreshToken, SlidingToken, revoke
+from .transfers import transfer, transfer_batch, TransferError
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
 
 
 class CreateUserView(generics.CreateAPIView):
+    throttle_scope = "auth"
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
 
 
 class LogoutView(APIView):
+    throttle_scope = "auth"
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
         try:
             refresh_token = request.data.get("refresh")
-            token = RefreshToken(refresh_token)
-            token.blacklist()
+            # Sessions using a sliding token have no separate refresh token.
+            if refresh_token or not isinstance(request.auth, SlidingToken):
+                RefreshToken(refresh_token).blacklist()
+            revoke(request.auth)
             return Response({"detail": "Logout successful"}, status=204)
         except Exception as e:
             return Response(f"error: {e}", status=400)
 
 
+class TokenObtainPairView(jwt_views.TokenObtainPairView):
+    throttle_scope = "auth"
+
+
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    throttle_scope = "auth"
+
+
+class TokenObtainSlidingView(jwt_views.TokenObtainSlidingView):
+    throttle_scope = "auth"
+
+
+class TokenRefreshSlidingView(jwt_views.TokenRefreshSlidingView):
+    throttle_scope = "auth"
+
+
 class AccountCreateView(generics.CreateAPIView):
     queryset = Account.objects.all()
     serializer_class = AccountSerializer
@@ -39,56 +75,142 @@ class AccountCreateView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        invalidate_users(self.request.user.pk)
 
 
-class AccountRetrieveView(generics.ListAPIView):
+class ValuesListMixin:
+    """List GETs served from ``.values()`` rows through ValuesSerializer."""
+
+    def list(self, request, *args, **kwargs):
+        serializer = ValuesSerializer.for_serializer(self.get_serializer_class())
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(serializer.to_representation(list(queryset)))
+        return self.get_paginated_response(serializer.to_representation(page))
+
+
+class AccountRetrieveView(ValuesListMixin, generics.ListAPIView):
+    throttle_scope = "history"
     serializer_class = AccountSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         user_id = self.kwargs.get("id")
-        return Account.objects.filter(user_id=user_id)
+        return filter_history(
+            Account.objects.filter(user_id=user_id),
+            self.request.query_params,
+            date_field="created_at",
+            type_field="account_type",
+        )
 
 
-class UserListView(generics.ListAPIView):
+class UserListView(ValuesListMixin, generics.ListAPIView):
+    throttle_scope = "directory"
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("id",)
 
     def get_queryset(self):
         return User.objects.all()
 
 
-class UserAccountListView(generics.ListAPIView):
+class UserAccountListView(ValuesListMixin, generics.ListAPIView):
+    throttle_scope = "history"
     serializer_class = AccountSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
+
+    @cached_response()
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Account.objects.filter(user=self.request.user)
+        return filter_history(
+            Account.objects.filter(user=self.request.user),
+            self.request.query_params,
+            date_field="created_at",
+            type_field="account_type",
+        )
 
 
-class UserTransactionView(generics.ListAPIView):
+class UserTransactionView(ValuesListMixin, generics.ListAPIView):
+    throttle_scope = "history"
     serializer_class = UserTransactionSerializer
-    permission_classes = [AllowAny]
+    permission_classes = [IsAuthenticated]
+    pagination_class = ArchiveKeysetPagination
+    history_filters = {"type_field": "transaction_type"}
 
     def get_queryset(self):
-        return UserTransaction.objects.filter(user=self.request.user)
+        return filter_history(
+            UserTransaction.objects.filter(user=self.request.user),
+            self.request.query_params,
+            **self.history_filters,
+        )
+
+    def get_archive_match(self):
+        return {"user_id": self.request.user.pk}
 
 
-class AccountTransactionView(generics.ListAPIView):
+class AccountTransactionView(ValuesListMixin, generics.ListAPIView):
+    throttle_scope = "history"
     serializer_class = AccountTransactionSerializer
-    permission_classes = [AllowAny]
+    permission_classes = [IsAuthenticated]
+    pagination_class = ArchiveKeysetPagination
+    history_filters = {"type_field": "transaction_type", "account_field": "account_id"}
 
     def get_queryset(self):
-        return AccountTransaction.objects.all()
+        return filter_history(
+            AccountTransaction.objects.filter(account__user=self.request.user),
+            self.request.query_params,
+            **self.history_filters,
+        )
+
+    def get_archive_match(self):
+        accounts = Account.objects.filter(user=self.request.user)
+        return {"account_id": set(accounts.values_list("id", flat=True))}
+
+
+class AccountStatementView(APIView):
+    throttle_scope = "history"
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id):
+        output = request.query_params.get("output", "csv")
+        if output not in statements.FORMATS:
+            return Response(
+                {"error": "Output must be one of: csv, ndjson."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        account = Account.objects.filter(id=id, user=request.user).first()
+        if account is None:
+            return Response(
+                {"error": "Account not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        content_type, chunks = statements.render_statement(
+            account, request.query_params, output
+        )
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="statement-{account.id}.{output}"'
+        )
+        return response
 
 
 class TransactionView(generics.CreateAPIView):
+    throttle_scope = "money"
     serializer_class = TransactionSerializer
-    permission_classes = [AllowAny]
+    permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return Transaction.objects.all()
 
+    @idempotent
     def post(self, request):
         try:
             data = request.data
@@ -103,9 +225,9 @@ class TransactionView(generics.CreateAPIView):
                 )
 
             try:
-                amount = float(amount)
-            except ValueError:
-                return Response({"error": "Amount must be a number"}, status=400)
+                amount = parse_amount(amount)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
 
             if amount <= 0:
                 return Response(
@@ -113,31 +235,21 @@ class TransactionView(generics.CreateAPIView):
                 )
 
             try:
-                sender = Account.objects.get(id=sender_id)
-                receiver = Account.objects.get(id=receiver_id)
-            except Account.DoesNotExist:
-                return Response({"error": "Sender or receiver not found"}, status=404)
-
-            if sender.balance < amount:
-                return Response({"error": "Insufficient balance"}, status=400)
-
-            sender.balance -= amount
-            receiver.balance += amount
-            sender.save()
-            receiver.save()
-
-            transaction = Transaction.objects.create(
-                sender=sender,
-                receiver=receiver,
-                amount=amount,
-                details=data.get("details", ""),
-            )
+                tx = transfer(
+                    sender_id,
+                    receiver_id,
+                    amount,
+                    request.user,
+                    details=data.get("details", ""),
+                )
+            except TransferError as e:
+                return Response({"error": str(e)}, status=e.status_code)
 
             if save_account:
 
                 preferences, created = AccountPreference.objects.get_or_create(
-                    user=sender.user,
-                    receiver=receiver,
+                    user_id=request.user.pk,
+                    receiver_id=receiver_id,
                     defaults={"alias": alias},
                 )
 
@@ -146,7 +258,7 @@ class TransactionView(generics.CreateAPIView):
                     preferences.save()
 
             return Response(
-                {"detail": "Transaction successful", "transaction_id": transaction.id},
+                {"detail": "Transaction successful", "transaction_id": tx.id},
                 status=status.HTTP_201_CREATED,
             )
         except Exception as e:
@@ -156,9 +268,43 @@ class TransactionView(generics.CreateAPIView):
             )
 
 
+class TransactionBatchView(APIView):
+    throttle_scope = "money"
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    @idempotent
+    def post(self, request):
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get("transfers")
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {"error": "A non-empty list of transfers is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            results = transfer_batch(rows, request.user)
+        except TransferError as e:
+            return Response({"error": str(e)}, status=e.status_code)
+
+        accepted = sum(1 for result in results if result["status"] == "accepted")
+        return Response(
+            {
+                "accepted": accepted,
+                "rejected": len(results) - accepted,
+                "results": results,
+            },
+            status=status.HTTP_201_CREATED if accepted else status.HTTP_400_BAD_REQUEST,
+        )
+
+
 class AccountPreferenceView(generics.ListCreateAPIView):
     serializer_class = AccountPreferenceSerializer
-    permission_classes = [AllowAny]
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("id",)
 
     def get_queryset(self):
         return AccountPreference.objects.filter(user=self.request.user)
@@ -167,19 +313,29 @@ class AccountPreferenceView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
+def _check_trading_currency(account):
+    # Quotes are not converted: holdings keep their cost basis in the
+    # quote currency so portfolio P&L compares like with like.
+    currency = settings.MARKET_DATA.get("CURRENCY", "USD")
+    if account.currency != currency:
+        return f"Stocks are traded in {currency}; use a {currency} investments account."
+    return None
+
+
 class BuyStockView(APIView):
+    throttle_scope = "money"
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request):
         user = request.user
         symbol = request.data.get("symbol")
         quantity = request.data.get("quantity")
         account_id = request.data.get("account_id")
-        price = request.data.get("price")
 
-        if not symbol or not quantity or not account_id or not price:
+        if not symbol or not quantity or not account_id:
             return Response(
-                {"error": "Symbol, quantity, account_id, and price are required."},
+                {"error": "Symbol, quantity and account_id are required."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
@@ -187,10 +343,9 @@ class BuyStockView(APIView):
             quantity = int(quantity)
             if quantity <= 0:
                 raise ValueError("Quantity must be positive.")
-            price = float(price)
-            if price <= 0:
-                raise ValueError("Price must be positive.")
-        except ValueError as e:
+            symbol = str(symbol).upper()
+            price = get_price_service().quote(symbol)
+        except (ValueError, UnknownSymbol) as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
@@ -206,27 +361,28 @@ class BuyStockView(APIView):
                 {"error": "You need to use your investments account to buy stocks."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        error = _check_trading_currency(account)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        total_price = quantity * price
+        total_price = quantize(quantity * price)
 
-        if account.balance < total_price:
-            return Response(
-                {"error": "Insufficient balance in the account."},
-                status=status.HTTP_400_BAD_REQUEST,
+        with transaction.atomic():
+            if not debit(account.id, total_price):
+                return Response(
+                    {"error": "Insufficient balance in the account."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            append_entries(
+                [
+                    (account.id, "CUSTOMER", account.currency, -total_price),
+                    (None, "MARKET", account.currency, total_price),
+                ]
             )
 
-        account.balance -= total_price
-        account.save()
-
-        purchase, created = Purchase.objects.get_or_create(
-            user=user, stock_symbol=symbol
-        )
-        if created:
-            purchase.quantity = quantity
-        else:
-            purchase.quantity += quantity
-
-        purchase.save()
+            holdings.buy(user, account, symbol, quantity, price, total_price)
+            invalidate_users(user.pk)
+            events.publish(user.pk, "balance.changed", accounts=[account.id])
 
         return Response(
             {"message": f"Successfully purchased {quantity} of {symbol}."},
@@ -235,18 +391,19 @@ class BuyStockView(APIView):
 
 
 class SellStockView(APIView):
+    throttle_scope = "money"
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request):
         user = request.user
         symbol = request.data.get("symbol")
         quantity = request.data.get("quantity")
         account_id = request.data.get("account_id")
-        price = request.data.get("price")
 
-        if not symbol or not quantity or not account_id or not price:
+        if not symbol or not quantity or not account_id:
             return Response(
-                {"error": "Symbol, quantity, account_id, and price are required."},
+                {"error": "Symbol, quantity and account_id are required."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
@@ -254,14 +411,13 @@ class SellStockView(APIView):
             quantity = int(quantity)
             if quantity <= 0:
                 raise ValueError("Quantity must be positive.")
-            price = float(price)
-            if price <= 0:
-                raise ValueError("Price must be positive.")
-        except ValueError as e:
+            symbol = str(symbol).upper()
+            price = get_price_service().quote(symbol)
+        except (ValueError, UnknownSymbol) as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            account = Account.objects.get(id=account_id)
+            account = Account.objects.get(id=account_id, user=user)
         except Account.DoesNotExist:
             return Response(
                 {"error": "Account not found or does not belong to the user."},
@@ -273,52 +429,144 @@ class SellStockView(APIView):
                 {"error": "You need to use your investments account to sell stocks."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        error = _check_trading_currency(account)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        total_price = quantity * price
+        total_price = quantize(quantity * price)
 
         try:
-            purchase = Purchase.objects.get(user=user, stock_symbol=symbol)
-            if purchase.quantity < quantity:
-                return Response(
-                    {"error": "Not enough shares to sell."},
-                    status=status.HTTP_400_BAD_REQUEST,
+            with transaction.atomic():
+                holdings.sell(user, account, symbol, quantity, price, total_price)
+                credit(account.id, total_price)
+                append_entries(
+                    [
+                        (None, "MARKET", account.currency, -total_price),
+                        (account.id, "CUSTOMER", account.currency, total_price),
+                    ]
                 )
+                invalidate_users(user.pk)
+                events.publish(user.pk, "balance.changed", accounts=[account.id])
+        except HoldingError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {"message": f"Successfully sold {quantity} of {symbol}."},
+            status=status.HTTP_200_OK,
+        )
 
-            if purchase.quantity == quantity:
-                purchase.delete()
-            else:
-                purchase.quantity -= quantity
-                purchase.save()
 
-            account.balance += total_price
-            account.save()
+class PortfolioView(APIView):
+    throttle_scope = "history"
+    permission_classes = [IsAuthenticated]
 
-        except Purchase.DoesNotExist:
+    @cached_response(timeout=settings.MARKET_DATA.get("TTL", 15))
+    def get(self, request):
+        user = request.user
+        portfolio = list(holdings.portfolio_queryset(user))
+        prices = get_price_service().quotes(
+            [position["stock_symbol"] for position in portfolio], strict=False
+        )
+        holdings.value_positions(portfolio, prices)
+        return Response(portfolio, status=status.HTTP_200_OK)
+
+
+class NetWorthView(APIView):
+    throttle_scope = "history"
+    permission_classes = [IsAuthenticated]
+
+    @cached_response(timeout=settings.FX.get("TTL", 300))
+    def get(self, request):
+        currency = request.query_params.get("currency", settings.FX["BASE"]).upper()
+        if currency not in dict(Account.CURRENCIES):
             return Response(
-                {"error": "You do not own any shares of this stock."},
+                {"error": f"Unknown currency: {currency}."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        rows = list(
+            Account.objects.filter(user=request.user).values_list("currency", "balance")
+        )
+        rates = get_fx_service().current()
+        try:
+            total = rates.total(
+                [row[0] for row in rows], [row[1] for row in rows], currency
+            )
+        except FxError as e:
+            return Response({"error": str(e)}, status=e.status_code)
+
         return Response(
-            {"message": f"Successfully sold {quantity} of {symbol}."},
+            {
+                "currency": currency,
+                "net_worth": str(total),
+                "accounts": len(rows),
+                "rates_as_of": rates.as_of,
+            },
             status=status.HTTP_200_OK,
         )
 
 
-class PortfolioView(APIView):
+class DashboardView(APIView):
+    """Every account with its loans and holdings, the valued portfolio and
+    recent activity in one response.
+
+    Related rows come from Prefetch lookups, so the view runs the same five
+    queries however many accounts, loans or holdings the user has.
+    """
+
+    throttle_scope = "history"
     permission_classes = [IsAuthenticated]
+    recent_activity = 10
 
+    @cached_response(timeout=settings.MARKET_DATA.get("TTL", 15))
     def get(self, request):
         user = request.user
-        portfolio = (
-            Purchase.objects.filter(user=user)
-            .values("stock_symbol")
-            .annotate(total_quantity=Sum("quantity"))
+        accounts = list(
+            Account.objects.filter(user=user)
+            .order_by("-created_at", "-id")
+            .prefetch_related(
+                Prefetch("loans", queryset=Loan.objects.order_by("-created_at")),
+                Prefetch(
+                    "loans__installments",
+                    queryset=LoanInstallment.objects.exclude(status="PAID").order_by(
+                        "number"
+                    ),
+                    to_attr="open_installments",
+                ),
+                Prefetch(
+                    "holdings",
+                    queryset=Holding.objects.filter(quantity__gt=0).order_by(
+                        "stock_symbol"
+                    ),
+                    to_attr="positions",
+                ),
+            )
+        )
+        portfolio = holdings.positions_from(
+            holding for account in accounts for holding in account.positions
+        )
+        prices = get_price_service().quotes(
+            [position["stock_symbol"] for position in portfolio], strict=False
+        )
+        holdings.value_positions(portfolio, prices)
+        activity = UserTransaction.objects.filter(user=user).order_by(
+            "-timestamp", "-id"
+        )[: self.recent_activity]
+
+        return Response(
+            {
+                "accounts": DashboardAccountSerializer(accounts, many=True).data,
+                "portfolio": portfolio,
+                "recent_activity": UserTransactionSerializer(activity, many=True).data,
+            },
+            status=status.HTTP_200_OK,
         )
-        return Response(portfolio, status=status.HTTP_200_OK)
 
 
 class LoanView(APIView):
+    throttle_scope = {"GET": "history", "POST": "money"}
+
+    @cached_response()
     def get(self, request):
         account_id = request.query_params.get("account_id")
         if not account_id:
@@ -327,14 +575,17 @@ class LoanView(APIView):
             )
 
         try:
-            loans = Loan.objects.filter(account_id=account_id)
-            serializer = LoanSerializer(loans, many=True)
+            account_loans = Loan.objects.filter(
+                account_id=account_id, account__user=request.user
+            )
+            serializer = LoanSerializer(account_loans, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Account.DoesNotExist:
             return Response(
                 {"error": "Account not found."}, status=status.HTTP_404_NOT_FOUND
             )
 
+    @idempotent
     def post(self, request):
 
         loan_amount = request.data.get("loan_amount")
@@ -351,7 +602,7 @@ class LoanView(APIView):
             )
 
         try:
-            account = Account.objects.get(id=account_id)
+            account = Account.objects.get(id=account_id, user=request.user)
         except Account.DoesNotExist:
             return Response(
                 {"error": "Account not found."}, status=status.HTTP_404_NOT_FOUND
@@ -362,22 +613,33 @@ class LoanView(APIView):
                 {"error": "Credit score is too low for a loan application."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        if float(loan_amount) > float(monthly_income) * 10:
+        try:
+            loan_amount = parse_amount(loan_amount)
+            monthly_income = parse_decimal(monthly_income, "Monthly income")
+            loan_duration = int(loan_duration)
+            if loan_amount <= 0 or loan_duration <= 0:
+                raise ValueError("Loan amount and duration must be positive.")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if loan_amount > monthly_income * 10:
             return Response(
                 {"error": "Loan amount exceeds 10x your monthly income."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        loan = Loan.objects.create(
-            account=account,
-            loan_amount=loan_amount,
-            loan_duration=loan_duration,
-        )
+        try:
+            loan = loans.originate(account, loan_amount, loan_duration)
+        except LoanError as e:
+            return Response({"error": str(e)}, status=e.status_code)
         serializer = LoanSerializer(loan)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 class LoanPaymentView(APIView):
+    throttle_scope = "money"
+
+    @idempotent
     def post(self, request):
 
         loan_id = request.data.get("loan_id")
@@ -390,27 +652,20 @@ class LoanPaymentView(APIView):
             )
 
         try:
-            loan = Loan.objects.get(id=loan_id)
-        except Loan.DoesNotExist:
-            return Response(
-                {"error": "Loan not found."}, status=status.HTTP_404_NOT_FOUND
-            )
+            payment_amount = parse_amount(payment_amount)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if float(payment_amount) <= 0:
+        if payment_amount <= 0:
             return Response(
                 {"error": "Payment amount must be greater than 0."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        remaining_balance = float(loan.loan_amount)
-        if float(payment_amount) > remaining_balance:
-            return Response(
-                {"error": "Payment amount exceeds the remaining loan balance."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        loan.loan_amount = remaining_balance - float(payment_amount)
-        loan.save()
+        try:
+            loan = loans.pay(loan_id, request.user, payment_amount)
+        except LoanError as e:
+            return Response({"error": str(e)}, status=e.status_code)
 
         return Response(
             {
@@ -420,3 +675,16 @@ class LoanPaymentView(APIView):
             },
             status=status.HTTP_200_OK,
         )
+
+
+class LoanInstallmentView(ValuesListMixin, generics.ListAPIView):
+    throttle_scope = "history"
+    serializer_class = LoanInstallmentSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("number",)
+
+    def get_queryset(self):
+        return LoanInstallment.objects.filter(
+            loan_id=self.kwargs["id"], loan__account__user=self.request.user
+        )
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 import os
 
@@ -38,16 +39,52 @@ AUTH_USER_MODEL = "api.User"
 # Application definition
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    # Token buckets per user (or IP), view and scope; see api.throttling.
+    # Views choose a scope with throttle_scope, others use user/anon.
+    "DEFAULT_THROTTLE_CLASSES": ["api.throttling.BucketThrottle"],
+    "DEFAULT_THROTTLE_RATES": {
+        "money": os.getenv("THROTTLE_MONEY", "30/min"),
+        "history": os.getenv("THROTTLE_HISTORY", "300/min"),
+        "auth": os.getenv("THROTTLE_AUTH", "20/min"),
+        "directory": os.getenv("THROTTLE_DIRECTORY", "30/min"),
+        "user": os.getenv("THROTTLE_USER", "600/min"),
+        "anon": os.getenv("THROTTLE_ANON", "120/min"),
+    },
 }
 
+# Turn off to benchmark raw handler throughput.
+THROTTLING_ENABLED = os.getenv("THROTTLING_ENABLED", "1") == "1"
+
+# Token lifetimes are in seconds. Longer access tokens mean fewer refreshes;
+# logout revokes them through the cache (api.tokens), which only reaches
+# every worker when the cache is shared. Without REDIS_URL access tokens
+# keep a 30 second lifetime, and the api.E001 check refuses a longer one.
 SIMPLE_JWT = {
-    "ACCESS_TOKEN_LIFETIME": timedelta(seconds=30),
-    "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "ACCESS_TOKEN_LIFETIME": timedelta(
+        seconds=int(
+            os.getenv(
+                "JWT_ACCESS_TOKEN_LIFETIME", 15 * 60 if os.getenv("REDIS_URL") else 30
+            )
+        )
+    ),
+    "REFRESH_TOKEN_LIFETIME": timedelta(
+        seconds=int(os.getenv("JWT_REFRESH_TOKEN_LIFETIME", 24 * 60 * 60))
+    ),
+    "SLIDING_TOKEN_LIFETIME": timedelta(
+        seconds=int(os.getenv("JWT_SLIDING_TOKEN_LIFETIME", 15 * 60))
+    ),
+    "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(
+        seconds=int(os.getenv("JWT_SLIDING_TOKEN_REFRESH_LIFETIME", 24 * 60 * 60))
+    ),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
     "ALGORITHM": "HS256",
@@ -56,10 +93,24 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
     "USER_ID_FIELD": "id",
     "USER_ID_CLAIM": "user_id",
-    "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "AUTH_TOKEN_CLASSES": (
+        "rest_framework_simplejwt.tokens.AccessToken",
+        "api.tokens.SlidingToken",
+    ),
     "TOKEN_TYPE_CLAIM": "token_type",
     "JTI_CLAIM": "jti",
     "SLIDING_TOKEN_REFRESH_EXP_CLAIM": "refresh_exp",
+    "TOKEN_OBTAIN_SERIALIZER": "api.tokens.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "api.tokens.TokenRefreshSerializer",
+    "SLIDING_TOKEN_OBTAIN_SERIALIZER": "api.tokens.TokenObtainSlidingSerializer",
+    "SLIDING_TOKEN_REFRESH_SERIALIZER": "api.tokens.TokenRefreshSlidingSerializer",
+}
+
+# Seconds that authenticated users, and "not blacklisted" answers for
+# refresh/sliding tokens, are kept in the cache.
+AUTH_CACHE = {
+    "USER_TTL": int(os.getenv("AUTH_USER_CACHE_TTL", 60)),
+    "BLACKLIST_TTL": int(os.getenv("AUTH_BLACKLIST_CACHE_TTL", 60)),
 }
 INSTALLED_APPS = [
     "django.contrib.admin",
@@ -79,7 +130,9 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.PrimaryPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -113,12 +166,77 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# DB_ENGINE=postgresql switches to PostgreSQL configured from the DB_*
+# variables below; anything else keeps the local SQLite file. Setting
+# DB_REPLICA_HOST adds a read replica that api.routers sends reads to.
+
+if os.getenv("DB_ENGINE") == "postgresql":
+    _primary = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("DB_NAME", "vault"),
+        "USER": os.getenv("DB_USER", "vault"),
+        "PASSWORD": os.getenv("DB_PASSWORD", ""),
+        "HOST": os.getenv("DB_HOST", "localhost"),
+        "PORT": os.getenv("DB_PORT", "5432"),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
+    }
+    if os.getenv("DB_POOL_MAX_SIZE"):
+        # Django's connection pool needs psycopg 3 ("psycopg[pool]") and
+        # replaces persistent connections.
+        _primary["CONN_MAX_AGE"] = 0
+        _primary["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE")),
+            "timeout": 10,
+        }
+    DATABASES = {"default": _primary}
+
+    if os.getenv("DB_REPLICA_HOST"):
+        DATABASES["replica"] = {
+            **_primary,
+            "HOST": os.getenv("DB_REPLICA_HOST"),
+            "PORT": os.getenv("DB_REPLICA_PORT", _primary["PORT"]),
+            "OPTIONS": dict(_primary["OPTIONS"]),
+            "TEST": {"MIRROR": "default"},
+        }
+        DATABASE_ROUTERS = ["api.routers.PrimaryReplicaRouter"]
+        REPLICA_LAG_SECONDS = int(os.getenv("DB_REPLICA_LAG_SECONDS", "5"))
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                # WAL lets readers run alongside the single writer, and
+                # IMMEDIATE transactions take the write lock up front instead
+                # of failing when a read lock cannot be upgraded.
+                "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+            },
+        }
+    }
+
+
+# Cache
+# Set REDIS_URL to share cached read models, quotes and counters between
+# processes; without it each process keeps a local in-memory cache.
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
     }
-}
 
 
 # Password validation
@@ -163,5 +281,115 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+# Audit events are queued in api.OutboxEvent and written by the
+# drain_outbox management command. When enabled, the outbox is also drained
+# in-process right after each commit (OUTBOX_INLINE=1), which is convenient
+# for development but puts the drain on the request path.
+OUTBOX_INLINE = os.getenv("OUTBOX_INLINE", "0") == "1"
+
+# Server-side stock quotes. The feed is any api.prices.PriceFeed subclass;
+# the bundled CSV replay feed keeps development and tests offline.
+MARKET_DATA = {
+    # Currency of the quotes; only investment accounts in it can trade.
+    "CURRENCY": "USD",
+    "FEED": "api.prices.CSVReplayFeed",
+    "OPTIONS": {"path": BASE_DIR / "api" / "data" / "prices.csv"},
+    "TTL": 15,
+    "SYMBOL_TTL": {},
+}
+
+LOANS = {
+    "ANNUAL_RATE": os.getenv("LOAN_ANNUAL_RATE", "0.0650"),
+    # Annual rate charged on the unpaid part of overdue installments.
+    "PENALTY_RATE": os.getenv("LOAN_PENALTY_RATE", "0.2000"),
+}
+
+# Exchange rates (api.fx), quoted as units per one BASE unit. The
+# load_fx_rates command stores a set from the feed; each process rereads
+# the latest set every TTL seconds.
+FX = {
+    "BASE": "USD",
+    "FEED": "api.fx.CSVRateFeed",
+    "OPTIONS": {"path": BASE_DIR / "api" / "data" / "fx_rates.csv"},
+    "TTL": int(os.getenv("FX_TTL", 300)),
+}
+
+# Server-sent events (api.events) streamed at /api/events/. The local broker
+# reaches only clients connected to the same process; with REDIS_URL events
+# go through Redis pub/sub and any ASGI worker can deliver them.
+EVENTS = {
+    "BROKER": "api.events.LocalBroker",
+    "OPTIONS": {},
+    "HEARTBEAT": 15,
+    "RETRY_MS": 3000,
+}
+if os.getenv("REDIS_URL"):
+    EVENTS["BROKER"] = "api.events.RedisBroker"
+    EVENTS["OPTIONS"] = {"url": os.getenv("REDIS_URL")}
+
+# Transfers and history rows older than HOT_MONTHS are moved to gzipped
+# NDJSON files under DIR by the archive_history command; statements and
+# history lists read them back transparently. Keep HOT_MONTHS longer than
+# the credit scoring window. On PostgreSQL, partition_history splits the
+# same tables into monthly partitions and keeps PARTITIONS_AHEAD months
+# created in advance.
+ARCHIVE = {
+    "DIR": os.getenv("ARCHIVE_DIR", BASE_DIR / "archive"),
+    "HOT_MONTHS": int(os.getenv("ARCHIVE_HOT_MONTHS", 12)),
+    "PARTITIONS_AHEAD": int(os.getenv("PARTITIONS_AHEAD", 3)),
+}
+
+# Fraud and velocity rules (api.fraud) run on every transfer against
+# counters kept in the default cache, so they are shared between processes
+# when REDIS_URL is set. Hits are queued in the outbox as FRAUD_ALERT events
+# and stored as api.FraudAlert rows; transfers are never blocked. Amounts
+# are in FX["BASE"], transfers being converted before they count, and
+# windows in seconds.
+FRAUD = {
+    "ENABLED": os.getenv("FRAUD_RULES_ENABLED", "1") == "1",
+    "RULES": [
+        {
+            "CLASS": "api.fraud.SenderVelocity",
+            "OPTIONS": {
+                "name": "sender_minute",
+                "window": 60,
+                "max_count": 10,
+                "max_amount": "10000.00",
+            },
+        },
+        {
+            "CLASS": "api.fraud.SenderVelocity",
+            "OPTIONS": {
+                "name": "sender_hour",
+                "window": 3600,
+                "max_count": 60,
+                "max_amount": "50000.00",
+            },
+        },
+        {
+            "CLASS": "api.fraud.NewReceiverBurst",
+            "OPTIONS": {"name": "new_receivers", "window": 600, "limit": 5},
+        },
+        {
+            "CLASS": "api.fraud.RoundTrip",
+            "OPTIONS": {"name": "round_trip", "window": 3600},
+        },
+    ],
+}
+
+# Seconds an Idempotency-Key is remembered; expired keys are removed by the
+# purge_idempotency_keys management command.
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+# Per-process request metrics (api.metrics), served in Prometheus text
+# format at /metrics to ALLOWED_IPS only.
+METRICS = {
+    "ENABLED": os.getenv("METRICS_ENABLED", "1") == "1",
+    "ALLOWED_IPS": os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(","),
+    # Flag requests that run one query shape at least this many times.
+    "N_PLUS_ONE_THRESHOLD": int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", 10)),
+}
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOWS_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
@@ -1,14 +1,28 @@
 from django.contrib import admin
 from django.urls import path, include
-from api.views import CreateUserView, LogoutView
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from api.metrics import metrics_view
+from api.views import (
+    CreateUserView,
+    LogoutView,
+    TokenObtainPairView,
+    TokenObtainSlidingView,
+    TokenRefreshSlidingView,
+    TokenRefreshView,
+)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("user/register/", CreateUserView.as_view(), name="register"),
     path("token/", TokenObtainPairView.as_view(), name="get_token"),
     path("token/refresh/", TokenRefreshView.as_view(), name="refresh"),
+    path("token/sliding/", TokenObtainSlidingView.as_view(), name="get_sliding_token"),
+    path(
+        "token/sliding/refresh/",
+        TokenRefreshSlidingView.as_view(),
+        name="refresh_sliding",
+    ),
     path("auth/", include("rest_framework.urls")),
     path("api/", include("api.urls")),
     path("logout/", LogoutView.as_view(), name="logout"),
+    path("metrics", metrics_view, name="metrics"),
 ]
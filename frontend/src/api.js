@@ -11,6 +11,11 @@ api.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`
     }
+    // One key per logical request; retries reuse the same config and key,
+    // so the server runs the write at most once.
+    if (config.method === 'post' && !config.headers['Idempotency-Key']) {
+      config.headers['Idempotency-Key'] = crypto.randomUUID()
+    }
     return config
   },
   error => {
@@ -18,7 +23,9 @@ api.interceptors.request.use(
   }
 )
 
-const refreshAccessToken = async () => {
+let pendingRefresh = null
+
+const requestAccessToken = async () => {
   const refreshToken = localStorage.getItem(REFRESH_TOKEN)
   if (!refreshToken) {
     throw new Error('No refresh token available')
@@ -34,6 +41,17 @@ const refreshAccessToken = async () => {
   return newAccessToken
 }
 
+// Requests that fail together share one refresh instead of each sending
+// their own to token/refresh/.
+export const refreshAccessToken = () => {
+  if (!pendingRefresh) {
+    pendingRefresh = requestAccessToken().finally(() => {
+      pendingRefresh = null
+    })
+  }
+  return pendingRefresh
+}
+
 api.interceptors.response.use(
   response => response,
   async error => {
@@ -58,4 +76,45 @@ api.interceptors.response.use(
   }
 )
 
+// Server-sent events for the signed-in user; returns a function that closes
+// the stream. EventSource cannot send headers, so the access token goes in
+// the query string. The browser reconnects by itself after network errors;
+// a refused stream (an expired token) is reopened once with a fresh token.
+// After any reconnect a 'resync' event tells the caller to refetch, since
+// events sent meanwhile were missed.
+export const subscribeToEvents = onEvent => {
+  let source = null
+  let closed = false
+  let connected = false
+  let refreshed = false
+
+  const open = () => {
+    const token = localStorage.getItem(ACCESS_TOKEN)
+    if (!token || closed) return
+    const url = new URL('/api/events/', import.meta.env.VITE_API_URL)
+    url.searchParams.set('token', token)
+    source = new EventSource(url)
+    source.onopen = () => {
+      if (connected) onEvent({ type: 'resync' })
+      connected = true
+      refreshed = false
+    }
+    source.onmessage = message => onEvent(JSON.parse(message.data))
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED && !refreshed) {
+        refreshed = true
+        refreshAccessToken()
+          .then(open)
+          .catch(error => console.error('Event stream closed', error))
+      }
+    }
+  }
+
+  open()
+  return () => {
+    closed = true
+    source?.close()
+  }
+}
+
 export default api
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react'
 import {
+  Badge,
   Box,
   Typography,
   List,
@@ -13,34 +14,36 @@ import NotificationsIcon from '@mui/icons-material/Notifications'
 import CheckCircleIcon from '@mui/icons-material/CheckCircle'
 import HighlightOffIcon from '@mui/icons-material/HighlightOff'
 import CircleNotificationsIcon from '@mui/icons-material/CircleNotifications'
-const NotificationsDropdown = ({ anchorEl, onClose }) => {
-  const [notifications, setNotifications] = useState([])
-  const [loading, setLoading] = useState(true)
-
-  const open = Boolean(anchorEl)
+import { subscribeToEvents } from '../api'
 
-  // API'den bildirimleri çekme
-  const fetchNotifications = async () => {
-    setLoading(true)
-    try {
-      const response = await fetch('/api/notifications') // API endpoint
-      if (!response.ok) {
-        throw new Error('Failed to fetch notifications')
-      }
-      const data = await response.json()
-      setNotifications(data)
-    } catch (error) {
-      console.error('Error fetching notifications:', error)
-    } finally {
-      setLoading(false)
+// Pushed events worth telling the user about; balance changes only refresh
+// the views showing them.
+const toNotification = event => {
+  const date = new Date().toISOString()
+  if (event.type === 'transfer.received') {
+    const message = event.transfers
+      .map(transfer => `${transfer.amount} ${transfer.currency}`)
+      .join(', ')
+    return { title: 'Transfer received', message, date, read: false }
+  }
+  if (event.type === 'loan.payment') {
+    return {
+      title: 'Loan payment posted',
+      message: `${event.amount} paid, ${event.remaining} remaining`,
+      date,
+      read: false
     }
   }
+  return null
+}
 
-  useEffect(() => {
-    if (open) {
-      fetchNotifications()
-    }
-  }, [open])
+const NotificationsDropdown = ({
+  anchorEl,
+  onClose,
+  notifications,
+  setNotifications
+}) => {
+  const open = Boolean(anchorEl)
 
   // Bildirimi "Okundu" olarak işaretleme
   const markAsRead = index => {
@@ -76,9 +79,7 @@ const NotificationsDropdown = ({ anchorEl, onClose }) => {
           Notifications
         </Typography>
 
-        {loading ? (
-          <Typography variant='body1'>Loading notifications...</Typography>
-        ) : notifications.length === 0 ? (
+        {notifications.length === 0 ? (
           <Typography variant='body1' color='text.secondary'>
             No notifications available.
           </Typography>
@@ -138,6 +139,19 @@ const NotificationsDropdown = ({ anchorEl, onClose }) => {
 
 const NotificationsButton = () => {
   const [anchorEl, setAnchorEl] = useState(null)
+  const [notifications, setNotifications] = useState([])
+
+  useEffect(
+    () =>
+      subscribeToEvents(event => {
+        const notification = toNotification(event)
+        if (notification) {
+          setNotifications(prev => [notification, ...prev])
+        }
+      }),
+    []
+  )
+
   const darkMode = localStorage.getItem('darkMode') === 'true'
   const handleOpen = event => {
     setAnchorEl(event.currentTarget)
@@ -150,11 +164,21 @@ const NotificationsButton = () => {
   return (
     <Box>
       <IconButton onClick={handleOpen}>
-        <CircleNotificationsIcon
-          sx={{ color: darkMode ? '#ffffff' : 'black' }}
-        />
+        <Badge
+          badgeContent={notifications.filter(n => !n.read).length}
+          color='error'
+        >
+          <CircleNotificationsIcon
+            sx={{ color: darkMode ? '#ffffff' : 'black' }}
+          />
+        </Badge>
       </IconButton>
-      <NotificationsDropdown anchorEl={anchorEl} onClose={handleClose} />
+      <NotificationsDropdown
+        anchorEl={anchorEl}
+        onClose={handleClose}
+        notifications={notifications}
+        setNotifications={setNotifications}
+      />
     </Box>
   )
 }
@@ -1,7 +1,7 @@
 import { Navigate } from 'react-router-dom'
 import { jwtDecode } from 'jwt-decode'
-import api from '../api'
-import { REFRESH_TOKEN, ACCESS_TOKEN } from '../constants'
+import { refreshAccessToken } from '../api'
+import { ACCESS_TOKEN } from '../constants'
 import { useState, useEffect } from 'react'
 
 function ProtectedRoute ({ children }) {
@@ -12,17 +12,9 @@ function ProtectedRoute ({ children }) {
   }, [])
 
   const refreshToken = async () => {
-    const refreshToken = localStorage.getItem(REFRESH_TOKEN)
     try {
-      const res = await api.post('token/refresh/', {
-        refresh: refreshToken
-      })
-      if (res.status === 200) {
-        localStorage.setItem(ACCESS_TOKEN, res.data.access)
-        setIsAuthorized(true)
-      } else {
-        setIsAuthorized(false)
-      }
+      await refreshAccessToken()
+      setIsAuthorized(true)
     } catch (error) {
       console.log(error)
       setIsAuthorized(false)
@@ -28,7 +28,7 @@ const Accounts = () => {
   const fetchAccounts = () => {
     api
       .get('/api/users/accounts/')
-      .then(res => res.data)
+      .then(res => res.data.results)
       .then(data => {
         setAccounts(data)
         setLoading(false)
@@ -4,7 +4,7 @@ import Chart from 'react-apexcharts'
 import { PieChart } from '@mui/x-charts/PieChart'
 import GlobalContainer from '../components/GlobalContainer'
 import colors from '../styles/colors'
-import api from '../api'
+import api, { subscribeToEvents } from '../api'
 
 const Dashboard = () => {
   const [darkMode, setDarkMode] = useState(false)
@@ -25,8 +25,9 @@ const Dashboard = () => {
   const themeColors = darkMode ? colors.dark : colors.light
 
   useEffect(() => {
-    getAccounts()
-    getTransactions()
+    getDashboard()
+    // Refetch only when the server reports a change instead of polling.
+    return subscribeToEvents(getDashboard)
   }, [])
 
   const pieParams = {
@@ -40,10 +41,12 @@ const Dashboard = () => {
     setTabValue(newValue)
   }
 
-  const getAccounts = async () => {
+  // Accounts and recent activity in one request.
+  const getDashboard = async () => {
     try {
-      const res = await api.get('/api/users/accounts/')
-      const data = res.data
+      const res = await api.get('/api/dashboard/')
+      const data = res.data.accounts
+      setTransactions(res.data.recent_activity)
 
       const exchangeRates = {
         USD: 1,
@@ -94,15 +97,6 @@ const Dashboard = () => {
     }
   }
 
-  const getTransactions = async () => {
-    try {
-      const res = await api.get('/api/user-transactions/')
-      setTransactions(res.data)
-    } catch (err) {
-      console.error('Error fetching transactions:', err)
-    }
-  }
-
   return (
     <GlobalContainer>
       {/* Tabs */}
@@ -47,20 +47,13 @@ const Investments = () => {
     const storedDarkMode = localStorage.getItem('darkMode')
     setDarkMode(storedDarkMode === 'true')
 
+    // Portfolio and accounts in one request.
     api
-      .get('/api/stocks/portfolio/')
+      .get('/api/dashboard/')
       .then(response => {
-        setPortfolio(response.data)
-      })
-      .catch(err => {
-        console.error('Error fetching portfolio:', err)
-      })
-
-    api
-      .get('/api/users/accounts/')
-      .then(response => {
-        setAccounts(response.data)
-        const hasInvestmentAccount = response.data.some(
+        setPortfolio(response.data.portfolio)
+        setAccounts(response.data.accounts)
+        const hasInvestmentAccount = response.data.accounts.some(
           account => account.account_type === 'INVESTMENT'
         )
         if (!hasInvestmentAccount) {
@@ -68,7 +61,7 @@ const Investments = () => {
         }
       })
       .catch(err => {
-        console.error('Error fetching accounts:', err)
+        console.error('Error fetching dashboard:', err)
       })
   }, [])
 
@@ -105,13 +98,12 @@ const Investments = () => {
       })
       .then(() => {
         api
-          .get('/api/stocks/portfolio/')
-          .then(response => setPortfolio(response.data))
-          .catch(err => console.error('Error refreshing portfolio:', err))
-        api
-          .get('/api/users/accounts/')
-          .then(response => setAccounts(response.data))
-          .catch(err => console.error('Error refreshing accounts:', err))
+          .get('/api/dashboard/')
+          .then(response => {
+            setPortfolio(response.data.portfolio)
+            setAccounts(response.data.accounts)
+          })
+          .catch(err => console.error('Error refreshing dashboard:', err))
 
         setError('')
         setSnackbar({
@@ -159,13 +151,12 @@ const Investments = () => {
       })
       .then(() => {
         api
-          .get('/api/stocks/portfolio/')
-          .then(response => setPortfolio(response.data))
-          .catch(err => console.error('Error refreshing portfolio:', err))
-        api
-          .get('/api/users/accounts/')
-          .then(response => setAccounts(response.data))
-          .catch(err => console.error('Error refreshing accounts:', err))
+          .get('/api/dashboard/')
+          .then(response => {
+            setPortfolio(response.data.portfolio)
+            setAccounts(response.data.accounts)
+          })
+          .catch(err => console.error('Error refreshing dashboard:', err))
 
         setError('')
         setSnackbar({
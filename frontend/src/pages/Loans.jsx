@@ -34,28 +34,28 @@ const Loans = () => {
   const [creditScore, setCreditScore] = useState('')
   const [error, setError] = useState('')
   const [loadingAccounts, setLoadingAccounts] = useState(false)
-  const [loadingLoans, setLoadingLoans] = useState(false)
   const [loadingApply, setLoadingApply] = useState(false)
   const [loadingPayment, setLoadingPayment] = useState(false) // Added loading state for payments
   const [loans, setLoans] = useState([])
 
+  // The dashboard returns every account with its loans, so switching
+  // accounts needs no further request.
+  const fetchAccounts = async () => {
+    const response = await api.get('/api/dashboard/')
+    setAccounts(response.data.accounts)
+  }
+
   useEffect(() => {
-    const fetchAccounts = async () => {
-      try {
-        setLoadingAccounts(true)
-        const response = await api.get('/api/users/accounts/')
-        setAccounts(response.data)
-      } catch (error) {
+    setLoadingAccounts(true)
+    fetchAccounts()
+      .catch(error => {
         console.error('Failed to fetch accounts:', error)
         setError('Failed to load accounts. Please try again.')
-      } finally {
-        setLoadingAccounts(false)
-      }
-    }
-    fetchAccounts()
+      })
+      .finally(() => setLoadingAccounts(false))
   }, [])
 
-  const handleAccountChange = async accountId => {
+  const handleAccountChange = accountId => {
     setSelectedAccount(accountId)
     setError('')
     const selected = accounts.find(account => account.id === accountId)
@@ -65,22 +65,11 @@ const Loans = () => {
       setCreditScore('')
     }
 
-    try {
-      setLoadingLoans(true)
-      const response = await api.get(`/api/loans/?account_id=${accountId}`)
-      setLoans(response.data)
-
-      const totalCurrentLoan = response.data.reduce(
-        (sum, loan) => sum + parseFloat(loan.loan_amount),
-        0
-      )
-      setCurrentLoan(totalCurrentLoan)
-    } catch (error) {
-      console.error('Failed to fetch loans:', error)
-      setError('Failed to load loans for this account.')
-    } finally {
-      setLoadingLoans(false)
-    }
+    const accountLoans = selected?.loans || []
+    setLoans(accountLoans)
+    setCurrentLoan(
+      accountLoans.reduce((sum, loan) => sum + parseFloat(loan.loan_amount), 0)
+    )
   }
 
   const handleApplyForLoan = async () => {
@@ -129,6 +118,9 @@ const Loans = () => {
       )
       setCurrentLoan(totalCurrentLoan)
 
+      fetchAccounts().catch(error =>
+        console.error('Failed to refresh accounts:', error)
+      )
       setOpenDialog(false)
       setLoanAmount('')
       setIncome('')
@@ -177,6 +169,9 @@ const Loans = () => {
       )
       setCurrentLoan(totalCurrentLoan)
 
+      fetchAccounts().catch(error =>
+        console.error('Failed to refresh accounts:', error)
+      )
       setOpenPaymentDialog(false)
       setPaymentAmount('')
       setError('')
@@ -277,7 +272,7 @@ const Loans = () => {
             </Box>
 
             {/* Loans List */}
-            {loadingLoans ? (
+            {loadingAccounts ? (
               <Box sx={{ textAlign: 'center', marginTop: '50px' }}>
                 <CircularProgress />
                 <Typography variant='body1'>Loading loans...</Typography>
@@ -333,7 +328,7 @@ const Loans = () => {
                 variant='contained'
                 color='primary'
                 onClick={() => setOpenDialog(true)}
-                disabled={!selectedAccount || loadingLoans}
+                disabled={!selectedAccount || loadingAccounts}
               >
                 Apply for New Loan
               </Button>
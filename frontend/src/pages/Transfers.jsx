@@ -40,7 +40,7 @@ const TransfersPage = () => {
     api
       .get('api/users/accounts/')
       .then(response => {
-        setAccounts(response.data)
+        setAccounts(response.data.results)
       })
       .catch(error => {
         console.error('Error fetching accounts:', error)
@@ -50,7 +50,7 @@ const TransfersPage = () => {
     api
       .get('api/account-preferences/')
       .then(response => {
-        setPreferredReceivers(response.data)
+        setPreferredReceivers(response.data.results)
       })
       .catch(error => {
         console.error('Error fetching preferred receivers:', error)
@@ -107,7 +107,7 @@ const TransfersPage = () => {
         api
           .get('api/users/accounts/')
           .then(response => {
-            setAccounts(response.data)
+            setAccounts(response.data.results)
           })
           .catch(error => {
             console.error('Error updating accounts:', error)